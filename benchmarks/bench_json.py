@@ -0,0 +1,73 @@
+""" Compare the json module with json_codec on the payloads this project handles.
+
+    python benchmarks/bench_json.py [records]
+
+Times encoding processed history records (compact and indented), decoding JSON Lines
+and decoding API responses with each library. The log preview make_request used to
+build for every response is timed on its own, since it's now only built at DEBUG level.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import json_codec
+
+def make_records(count: int) -> list[dict]:
+    """Synthetic records shaped like the processed streaming history"""
+    return [{
+        'ts': f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:{i % 60:02d}:00Z",
+        'ms_played': 1000 * (i % 300),
+        'master_metadata_track_name': f"Track {i % 5000}",
+        'master_metadata_album_artist_name': f"Artist {i % 800}",
+        'master_metadata_album_album_name': f"Album {i % 2000}",
+        'spotify_track_uri': f"spotify:track:{i % 5000:022d}",
+        'reason_start': 'trackdone',
+        'shuffle': i % 2 == 0,
+        'skipped': None,
+        'genres': ['indie rock', 'dream pop'][:i % 3]
+    } for i in range(count)]
+
+def best_of(function, repeat: int = 5) -> float:
+    """Fastest of several runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def preview(data) -> str:
+    text = str(data)
+    return text[:200] + '...' if len(text) > 200 else text
+
+def main(count: int) -> None:
+    records = make_records(count)
+    lines = [json.dumps(record) for record in records]
+    response = json.dumps({'items': records[:1000]}).encode('utf-8')
+    compact = json.JSONEncoder(separators=(',', ':')).encode
+
+    cases = [
+        ('encode compact', lambda: [compact(record) for record in records], lambda: [json_codec.dumps(record) for record in records]),
+        ('encode indent=2', lambda: json.dumps(records, indent=2), lambda: json_codec.dumps(records, indent=2)),
+        ('decode jsonl', lambda: [json.loads(line) for line in lines], lambda: [json_codec.loads(line) for line in lines]),
+        ('decode response', lambda: [json.loads(response) for _ in range(20)], lambda: [json_codec.loads(response) for _ in range(20)])
+    ]
+
+    print(f"{count} records, json_codec backend: {json_codec.BACKEND}")
+    print(f"{'case':<28}{'json':>10}{'json_codec':>12}{'speedup':>10}")
+    for name, baseline, candidate in cases:
+        baseline_seconds = best_of(baseline)
+        candidate_seconds = best_of(candidate)
+        print(f"{name:<28}{baseline_seconds:>9.3f}s{candidate_seconds:>11.3f}s{baseline_seconds / candidate_seconds:>9.1f}x")
+
+    # What building the preview costs for the same 20 responses, saved below DEBUG whichever library decodes
+    decoded = json_codec.loads(response)
+    preview_seconds = best_of(lambda: [preview(decoded) for _ in range(20)])
+    print(f"{'response preview, DEBUG only':<28}{preview_seconds:>9.3f}s saved below DEBUG")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
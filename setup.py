@@ -9,4 +9,10 @@ setup(
         "requests",
         "spotipy",
     ],
+    extras_require={
+        # Faster JSON for large exports and API responses, json_codec falls back to the json module
+        "fast": ["orjson"],
+        # Vectorized nearest-neighbour queries and sparse co-listening products
+        "similarity": ["numpy", "scipy"],
+    },
 ) 
\ No newline at end of file
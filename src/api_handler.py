@@ -1,19 +1,39 @@
-import requests
 import logging
+import os
+import re
+import threading
 import time
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 from datetime import datetime, timedelta
 
+from batch_endpoints import NOT_FOUND, BatchEndpoint, BatchResult, get_batch_endpoint
 from config import Config
+from data_loader import DataLoader
+import json_codec
+from metrics import METRICS
+from response_cache import ResponseCache, request_key
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/spotify_api.log')
-    ]
-)
+# requests and spotipy take about a quarter of a second to import, so they're imported
+# the first time a request is made instead of here. Local-only commands that import
+# this module for the client type never pay for them.
+
+LOG_PATH = 'logs/spotify_api.log'
+_logging_configured = False
+
+def configure_logging() -> None:
+    """Send API logs to logs/spotify_api.log, once per process, the first time a client is created"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_PATH)
+        ]
+    )
 
 class RateLimiter:
     def __init__(self, requests_per_day: int) -> None:
@@ -29,8 +49,16 @@ class RateLimiter:
         self.requests_made_today = 0
         self.day_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         self.tokens_per_second = self.requests_per_day / (24 * 3600)  # Pre-calculate rate
+        self._lock = threading.Lock()  # Shared across worker threads
     
     def acquire(self):
+        # Time spent waiting here, for the lock or a rate limit sleep, is reported as a metric
+        started = time.perf_counter()
+        with self._lock:
+            self._acquire()
+        METRICS.increment('rate_limiter_wait_seconds_total', time.perf_counter() - started)
+
+    def _acquire(self):
         now = datetime.now()
         
         # Reset daily counter if it's a new day
@@ -51,6 +79,7 @@ class RateLimiter:
         if self.tokens < 1:
             sleep_time = (1 - self.tokens) * (24 * 3600) / self.requests_per_day
             logging.warning(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds")
+            METRICS.increment('rate_limiter_sleeps_total')
             time.sleep(sleep_time)
             self.tokens = 1
             
@@ -77,51 +106,238 @@ class RateLimiter:
             "last_request_time": self.last_updated.strftime("%Y-%m-%d %H:%M:%S")
         }
 
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on the number of requests in flight. While latency stays near its usual
+    level the limit grows by about one per window of requests; a 429, a timeout or a
+    latency spike multiplies it by backoff_factor. Requests sent under the old limit
+    don't decrease it again, so a burst of 429s from one window counts once.
+    """
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 16, backoff_factor: float = 0.5, latency_tolerance: float = 2.0, min_spike_seconds: float = 0.1) -> None:
+        """
+        Args:
+            initial_limit: Requests allowed in flight at the start
+            min_limit: The limit never drops below this
+            max_limit: The limit never grows above this
+            backoff_factor: Multiplier applied to the limit when the server pushes back
+            latency_tolerance: Latency above this multiple of the usual latency is a spike
+            min_spike_seconds: A spike also has to be at least this much above the usual latency
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.min_spike_seconds = min_spike_seconds
+        self.in_flight = 0
+        self.baseline_latency = None
+        self.paused_until = 0.0
+        self.decreases = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        """
+        Wait for a free slot (and for any Retry-After pause to end).
+
+        Returns:
+            int: Ticket to pass to release
+        """
+        started = time.perf_counter()
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    self._condition.wait()
+            self.in_flight += 1
+            ticket = self.decreases
+        METRICS.increment('concurrency_limiter_wait_seconds_total', time.perf_counter() - started)
+        return ticket
+
+    def release(self, ticket: int, latency: float = None, overloaded: bool = False) -> None:
+        """
+        Free a slot and adjust the limit.
+
+        Args:
+            ticket: Value returned by acquire
+            latency: Seconds the request took, None if it never completed
+            overloaded: Whether the server pushed back (429, timeout, connection error)
+        """
+        with self._condition:
+            self.in_flight -= 1
+
+            spike = (
+                latency is not None and self.baseline_latency is not None
+                and latency > max(self.baseline_latency * self.latency_tolerance, self.baseline_latency + self.min_spike_seconds)
+            )
+            if overloaded or spike:
+                # Only requests started under the current limit can lower it
+                if ticket == self.decreases:
+                    self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+                    self.decreases += 1
+                    METRICS.increment('concurrency_limiter_decreases_total', reason='spike' if spike else 'overloaded')
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            # Follow the usual latency slowly, so a lasting change becomes the new normal
+            if latency is not None and not overloaded:
+                self.baseline_latency = latency if self.baseline_latency is None else 0.9 * self.baseline_latency + 0.1 * latency
+
+            self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every new request for the given time, e.g. a 429's Retry-After"""
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def get_status(self) -> dict:
+        """
+        Get the current concurrency status.
+
+        Returns:
+            dict: Current limit (and the fractional window it comes from), requests in
+                 flight, usual latency and any remaining Retry-After pause
+        """
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "window": round(self.limit, 3),
+                "in_flight": self.in_flight,
+                "baseline_latency_ms": round(self.baseline_latency * 1000, 1) if self.baseline_latency is not None else None,
+                "decreases": self.decreases,
+                "paused_for_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3)
+            }
+
+class TokenProvider:
+    """
+    Access token shared by every client that uses the same auth manager. The token is
+    refreshed refresh_margin seconds before it expires, and when several workers need
+    a new token at once only one refreshes while the others wait for it.
+    """
+    REFRESH_MARGIN_SECONDS = 300
+
+    def __init__(self, auth_manager=None, refresh_margin: int = REFRESH_MARGIN_SECONDS) -> None:
+        """
+        Args:
+            auth_manager: Object providing get_cached_token/get_access_token (and ideally
+                refresh_access_token), defaults to SpotifyApiClient.create_auth_manager()
+            refresh_margin: Seconds before expires_at that the token is replaced
+        """
+        self._auth_manager = auth_manager
+        self.refresh_margin = refresh_margin
+        self.token_info = None
+        self.refreshes = 0
+        self._force_refresh = False
+        self._lock = threading.Lock()
+
+    @property
+    def auth_manager(self):
+        with self._lock:
+            if self._auth_manager is None:
+                self._auth_manager = SpotifyApiClient.create_auth_manager()
+            return self._auth_manager
+
+    def get_token(self) -> str:
+        """Current access token, refreshed first if it's about to expire"""
+        # Most calls find a good token and never take the lock
+        token_info = self.token_info
+        if token_info is not None and not self._expiring(token_info):
+            return token_info['access_token']
+
+        with self._lock:
+            # Another worker may have refreshed it while this one waited
+            if self.token_info is None or self._force_refresh or self._expiring(self.token_info):
+                self.token_info = self._fetch_token()
+                self._force_refresh = False
+            return self.token_info['access_token']
+
+    def invalidate(self, access_token: str = None) -> None:
+        """
+        Mark the token as rejected so the next get_token replaces it. Pass the token
+        that was rejected, so a 401 for a token that was already replaced is ignored.
+        """
+        with self._lock:
+            if self.token_info is None:
+                return
+            if access_token is None or self.token_info['access_token'] == access_token:
+                self._force_refresh = True
+                self.token_info = {**self.token_info, 'expires_at': 0}
+
+    def _expiring(self, token_info: dict) -> bool:
+        expires_at = token_info.get('expires_at')
+        return expires_at is not None and expires_at - time.time() < self.refresh_margin
+
+    def _fetch_token(self) -> dict:
+        auth_manager = self._auth_manager if self._auth_manager is not None else SpotifyApiClient.create_auth_manager()
+        self._auth_manager = auth_manager
+        self.refreshes += 1
+
+        # The cache (.spotify_cache for SpotifyOAuth) is read once here for every client
+        token_info = None if self._force_refresh else auth_manager.get_cached_token()
+        refresh_token = (token_info or self.token_info or {}).get('refresh_token')
+        if (token_info is None or self._expiring(token_info)) and refresh_token and hasattr(auth_manager, 'refresh_access_token'):
+            logging.info("Refreshing the access token before it expires")
+            token_info = auth_manager.refresh_access_token(refresh_token)
+        if not token_info:
+            token_info = auth_manager.get_access_token()
+        return token_info
+
 class SpotifyErrorHandler:
     @staticmethod
     def handle_response(response, rate_limiter=None):
         """Handle different response status codes from Spotify API"""
-        if response.status_code in [200, 201]:  # Add 201 as a success code
+        import requests
+
+        if response.status_code in [200, 201, 204]:  # 204 is returned by follow/save endpoints
             logging.info(f"Successfully made request with status code {response.status_code}")
             return True
 
         elif response.status_code == 429:
-            retry_after = response.headers.get('Retry-After', 'unknown')
+            retry_after = retry_after_seconds(response)
             remaining = response.headers.get('X-RateLimit-Remaining', 'unknown')
             limit = response.headers.get('X-RateLimit-Limit', 'unknown')
             
             error_msg = (
                 f"Rate limit exceeded (429). Too many requests.\n"
-                f"Retry after: {int(retry_after) // 3600}h {(int(retry_after) % 3600) // 60}m"
+                f"Retry after: {int(retry_after) // 3600}h {(int(retry_after) % 3600) // 60}m {int(retry_after) % 60}s"
             )
             if rate_limiter:
                 error_msg += f"\nCurrent token count: {rate_limiter.tokens:.2f}"
             
             logging.error(error_msg)
-            raise requests.exceptions.HTTPError(error_msg)
+            raise requests.exceptions.HTTPError(error_msg, response=response)
 
         elif response.status_code == 403:
             error_msg = "Forbidden - Bad OAuth request (403)"
             logging.error(error_msg)
-            raise requests.exceptions.HTTPError(error_msg)
+            raise requests.exceptions.HTTPError(error_msg, response=response)
 
         elif response.status_code == 401:
             error_msg = "Unauthorized - The access token has expired (401)"
             logging.error(error_msg)
-            raise requests.exceptions.HTTPError(error_msg)
+            raise requests.exceptions.HTTPError(error_msg, response=response)
 
         else:
             error_msg = f"HTTP error occurred: {response.status_code}"
             if response.text:
                 error_msg += f"\nResponse text: {response.text}"
-            raise requests.exceptions.HTTPError(error_msg)
+            raise requests.exceptions.HTTPError(error_msg, response=response)
 
 class SpotifyApiClient:
     # Class-level constants
+    BASE_URL = "https://api.spotify.com/v1/"
     TOKEN_URL = "https://accounts.spotify.com/api/token"
     AUTH_URL = "https://accounts.spotify.com/authorize"
     REDIRECT_URI = "http://localhost:8888/callback"
     MAX_RETRIES = 3
+    # 429s asking for a longer wait than this are raised instead of waited out
+    MAX_RETRY_AFTER_SECONDS = 60
+    # Batch failures that are caused by the IDs in the batch
+    BISECT_STATUS_CODES = (400, 404)
     DAILY_REQUEST_LIMIT = 1000
     SCOPES = [
         "user-follow-modify",
@@ -131,34 +347,80 @@ class SpotifyApiClient:
         "playlist-modify-private"
     ]
     
-    def __init__(self, max_retries: int = MAX_RETRIES) -> None:
-        self.base_url = "https://api.spotify.com/v1/"
+    def __init__(self, max_retries: int = MAX_RETRIES, base_url: str = BASE_URL, auth_manager=None, token_provider: 'TokenProvider' = None, response_cache: ResponseCache = None) -> None:
+        """
+        Initialize the API client.
+
+        Args:
+            max_retries: Maximum number of retries for a failed request
+            base_url: Root URL that relative endpoints are resolved against (e.g. a local mock server)
+            auth_manager: Object providing get_cached_token/get_access_token, defaults to SpotifyOAuth
+            token_provider: TokenProvider to share with other clients, defaults to the
+                process-wide one (or a new one for the given auth_manager)
+            response_cache: ResponseCache for GET requests, None to always fetch
+        """
+        configure_logging()
+
+        self.base_url = base_url
         self.rate_limiter = RateLimiter(self.DAILY_REQUEST_LIMIT)
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter()
         self.max_retries = max_retries
         self.error_handler = SpotifyErrorHandler()
-        
-        # Create SpotifyOAuth manager during initialization
-        self.auth_manager = SpotifyOAuth(
+        self.response_cache = response_cache
+
+        # The OAuth manager, token and HTTP session are all created on the first request,
+        # so constructing a client never touches the network or the token cache
+        if token_provider is None and auth_manager is not None:
+            token_provider = TokenProvider(auth_manager)
+        self._token_provider = token_provider
+        self._session = None
+        self._data_loader = None
+
+    @classmethod
+    def create_auth_manager(cls):
+        """SpotifyOAuth for the app in config.yaml, with the token cached in .spotify_cache"""
+        from spotipy.oauth2 import SpotifyOAuth
+        return SpotifyOAuth(
             client_id=Config.get('client_id'),
             client_secret=Config.get('client_secret'),
-            redirect_uri=self.REDIRECT_URI,
-            scope=' '.join(self.SCOPES),
+            redirect_uri=cls.REDIRECT_URI,
+            scope=' '.join(cls.SCOPES),
             cache_path='.spotify_cache'
         )
-        
-        # Set initial tokens
-        self._refresh_token()
-        self._session = requests.Session()  # Add persistent session
+
+    @property
+    def token_provider(self) -> 'TokenProvider':
+        if self._token_provider is None:
+            self._token_provider = get_default_token_provider()
+        return self._token_provider
+
+    @property
+    def auth_manager(self):
+        return self.token_provider.auth_manager
+
+    @auth_manager.setter
+    def auth_manager(self, auth_manager) -> None:
+        self._token_provider = TokenProvider(auth_manager)
+
+    @property
+    def session(self):
+        # Persistent session, reused across requests
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    @property
+    def data_loader(self) -> DataLoader:
+        # One loader per client, so everything sharing the client shares its lookups
+        if self._data_loader is None:
+            self._data_loader = DataLoader(self)
+        return self._data_loader
 
     def _refresh_token(self):
-        """Refresh the access token using the auth manager"""
-        token_info = self.auth_manager.get_cached_token()
-        if not token_info:
-            token_info = self.auth_manager.get_access_token()
-        
-        self.access_token = token_info['access_token']
-        self.refresh_token = token_info.get('refresh_token')
-        self.headers = {"Authorization": f"Bearer {self.access_token}"}
+        """Force a new access token, e.g. after the current one was rejected"""
+        self.token_provider.invalidate()
+        return self.token_provider.get_token()
 
     def authenticate_user(self):
         """
@@ -167,6 +429,9 @@ class SpotifyApiClient:
         Returns:
             spotipy.Spotify: An authenticated Spotify client instance
         """
+        import spotipy
+        from spotipy.oauth2 import SpotifyOAuth
+
         # Create SpotifyOAuth manager 
         self.auth_manager = SpotifyOAuth(
             client_id=Config.get('client_id'),
@@ -206,23 +471,64 @@ class SpotifyApiClient:
             dict: Parsed JSON response data
         """
 
+        import requests
+
         logging.info(f"Making {method} request to: {endpoint if endpoint.startswith('http') else f'{self.base_url}{endpoint}'}")
         
         url = endpoint if endpoint.startswith('http') else f"{self.base_url}{endpoint}"
-        
-        request_headers = {**self.headers, **(headers or {})} if auth_required else headers or {}
-        
-        self.rate_limiter.acquire()
+        endpoint_label = _endpoint_label(url, self.base_url)
+
+        # A cached copy inside its freshness window is used without a request, an older
+        # one with validators makes this a conditional request
+        cache_key = cached_entry = None
+        if method == 'GET' and self.response_cache is not None:
+            cache_key = request_key(url, limit, offset)
+            cached_entry = self.response_cache.lookup(cache_key)
+            if cached_entry is not None and self.response_cache.is_fresh(cached_entry, endpoint_label):
+                METRICS.cache_lookup('http_cache', True)
+                return cached_entry['data']
+
+        # The provider refreshes the token before it expires, so no request is spent
+        # finding out it has
+        access_token = None
+        if auth_required:
+            access_token = self.token_provider.get_token()
+            request_headers = {"Authorization": f"Bearer {access_token}", **(headers or {})}
+        else:
+            request_headers = headers or {}
+        if cached_entry is not None:
+            request_headers = {**request_headers, **self.response_cache.conditional_headers(cached_entry)}
         
         try:
-            response = self._session.request(
-                method=method,
-                url=url,
-                headers=request_headers,
-                json=data if method in ['POST', 'PUT', 'DELETE'] else None,
-                timeout=10,
-                params={'limit': limit, 'offset': offset} if limit or offset else None
-            )
+            # The concurrency limiter decides how many requests are in flight at once,
+            # the rate limiter how many are sent per day
+            ticket = self.concurrency_limiter.acquire()
+            try:
+                self.rate_limiter.acquire()
+                started = time.perf_counter()
+                response = self.session.request(
+                    method=method,
+                    url=url,
+                    headers=request_headers,
+                    json=data if method in ['POST', 'PUT', 'DELETE'] else None,
+                    timeout=10,
+                    params={'limit': limit, 'offset': offset} if limit or offset else None
+                )
+            except requests.exceptions.RequestException:
+                # Timeouts and dropped connections are a sign of overload too
+                self.concurrency_limiter.release(ticket, overloaded=True)
+                raise
+            latency = time.perf_counter() - started
+            self.concurrency_limiter.release(ticket, latency, overloaded=response.status_code == 429)
+
+            METRICS.observe('spotify_api_request_seconds', latency, endpoint=endpoint_label, method=method)
+            METRICS.increment('spotify_api_requests_total', endpoint=endpoint_label, method=method, status=response.status_code)
+
+            # Not modified, the stored copy is still current
+            if response.status_code == 304 and cached_entry is not None:
+                METRICS.cache_lookup('http_cache', True)
+                self.response_cache.mark_validated(cache_key, cached_entry)
+                return cached_entry['data']
             
             self.error_handler.handle_response(response, self.rate_limiter)
             
@@ -230,58 +536,178 @@ class SpotifyApiClient:
             if not response.content:
                 return {}
             
-            response_data = response.json()
-            # Log preview of response data
-            preview = str(response_data)[:200] + '...' if len(str(response_data)) > 200 else str(response_data)
-            logging.info(f"Response preview: {preview}")
+            with METRICS.timer('spotify_api_decode_seconds', endpoint=endpoint_label):
+                response_data = json_codec.loads(response.content)
+
+            # Only build the preview when it will be logged, it costs as much as the decode
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                preview = str(response_data)
+                if len(preview) > 200:
+                    preview = preview[:200] + '...'
+                logging.debug(f"Response preview: {preview}")
+
+            if cache_key is not None:
+                METRICS.cache_lookup('http_cache', False)
+                self.response_cache.store(cache_key, endpoint_label, response.headers, response_data)
             
             return response_data
             
         except requests.exceptions.HTTPError as e:
             if "401" in str(e) and auth_required and retry_count < self.max_retries:
                 logging.info(f"Access token expired, attempting refresh {retry_count + 1}/{self.max_retries}")
-                self._refresh_token()  # New method to handle token refresh
-                return self.make_request(endpoint, method, headers, data, auth_required, retry_count + 1)
+                METRICS.increment('spotify_api_retries_total', endpoint=endpoint_label, reason='token_refresh')
+                # Revoked early, only the first worker to see it refreshes
+                self.token_provider.invalidate(access_token)
+                return self.make_request(endpoint, method, headers, data, auth_required, retry_count + 1, limit, offset)
+
+            # Wait out short rate limits. Every request holds off, not just this one.
+            if getattr(e.response, 'status_code', None) == 429 and retry_count < self.max_retries:
+                retry_after = retry_after_seconds(e.response)
+                if retry_after <= self.MAX_RETRY_AFTER_SECONDS:
+                    logging.warning(f"Rate limited, retrying in {retry_after}s {retry_count + 1}/{self.max_retries}")
+                    METRICS.increment('spotify_api_retries_total', endpoint=endpoint_label, reason='rate_limited')
+                    self.concurrency_limiter.pause(retry_after)
+                    return self.make_request(endpoint, method, headers, data, auth_required, retry_count + 1, limit, offset)
             raise e
             
         except requests.exceptions.RequestException as e:
+            METRICS.increment('spotify_api_requests_total', endpoint=endpoint_label, method=method, status='error')
             if retry_count < self.max_retries:
                 logging.warning(f"Request failed, attempting retry {retry_count + 1}/{self.max_retries}")
+                METRICS.increment('spotify_api_retries_total', endpoint=endpoint_label, reason='request_error')
                 time.sleep(2 ** retry_count)  # Exponential backoff
-                return self.make_request(endpoint, method, headers, data, auth_required, retry_count + 1)
+                return self.make_request(endpoint, method, headers, data, auth_required, retry_count + 1, limit, offset)
             
             # Let the error handler handle the final failure
             error_msg = f"Request failed after {self.max_retries} retries: {str(e)}"
             logging.error(error_msg)
             raise requests.exceptions.HTTPError(error_msg)
 
-    def make_batch_request(self, items: list, max_batch_size: int, endpoint_template: str, method: str = 'GET', headers: dict = None, data: dict = None, auth_required: bool = True, key: str = None) -> list:
+    def make_batch_request(self, items: list, endpoint: str, headers: dict = None, auth_required: bool = True, max_batch_size: int = None, path_parameters: dict = None) -> BatchResult:
         """
-        Make batch requests to the Spotify API, replacing failed items with "N/A"
+        Make batch requests to one of the bulk endpoints in BATCH_ENDPOINTS. The endpoint
+        decides how many IDs go in each request and whether they're sent in the URL or
+        the body.
+
+        Invalid IDs are skipped before anything is sent. A batch that Spotify rejects
+        because of its contents is split in half and retried until the bad IDs are
+        isolated, so one bad ID doesn't cost the rest of its batch.
+
+        Args:
+            items: IDs to send
+            endpoint: Name of the endpoint in BATCH_ENDPOINTS, e.g. 'albums'
+            max_batch_size: Optional lower cap on the IDs per request
+            path_parameters: Values for placeholders in the endpoint path, e.g. {'playlist_id': ...}
+
+        Returns:
+            BatchResult: One result per item in order, None with an error for items that failed
         """
-        results = []
-        batches = [items[i:i + max_batch_size] for i in range(0, len(items), max_batch_size)]
-        
-        for batch in batches:
-            try:
-                endpoint = endpoint_template.format(','.join(batch))
-                batch_result = self.make_request(
-                    endpoint=endpoint,
-                    method=method,
-                    headers=headers,
-                    data=data,
-                    auth_required=auth_required
-                )
-                
-                if isinstance(batch_result, list):
-                    results.extend(batch_result)
-                elif key and isinstance(batch_result, dict):
-                    results.extend(batch_result[key])
-                else:
-                    results.append(batch_result)
-                
-            except Exception as e:
-                logging.warning(f"Batch request failed: {str(e)}, replacing {len(batch)} items with N/A")
-                results.extend(["N/A"] * len(batch))
-        
-        return results
\ No newline at end of file
+        batch_endpoint = get_batch_endpoint(endpoint)
+        result = BatchResult(items)
+
+        # Only well-formed IDs are sent, remembering where each one came from
+        positions = []
+        for position, item in enumerate(result.ids):
+            if batch_endpoint.is_valid(item):
+                positions.append(position)
+            else:
+                result.set_error(position, f"Invalid Spotify ID: {item!r}")
+        valid_ids = [result.ids[position] for position in positions]
+
+        start = 0
+        for batch, batch_path, body in batch_endpoint.pack(valid_ids, self.base_url, max_batch_size, path_parameters):
+            self._send_batch(batch_endpoint, batch, positions[start:start + len(batch)], batch_path, body, result, headers, auth_required, path_parameters)
+            start += len(batch)
+
+        if result.errors:
+            logging.warning(f"Batch request to {endpoint} failed for {len(result.errors)} of {len(result)} items")
+        return result
+
+    def _send_batch(self, batch_endpoint: BatchEndpoint, batch: list, positions: list[int], batch_path: str, body: dict, result: BatchResult, headers: dict, auth_required: bool, path_parameters: dict) -> None:
+        try:
+            response = self.make_request(
+                endpoint=batch_path,
+                method=batch_endpoint.method,
+                headers=headers,
+                data=body,
+                auth_required=auth_required
+            )
+        except Exception as e:
+            status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+
+            # A 400 or 404 is about the IDs, so halve the batch to find the ones at fault.
+            # Anything else (rate limits, outages) would fail the halves too.
+            if len(batch) > 1 and status_code in self.BISECT_STATUS_CODES:
+                METRICS.increment('spotify_api_batch_bisections_total', endpoint=batch_endpoint.path)
+                middle = len(batch) // 2
+                for half, half_positions in ((batch[:middle], positions[:middle]), (batch[middle:], positions[middle:])):
+                    _, half_path, half_body = batch_endpoint.pack(half, self.base_url, path_parameters=path_parameters)[0]
+                    self._send_batch(batch_endpoint, half, half_positions, half_path, half_body, result, headers, auth_required, path_parameters)
+                return
+
+            for position in positions:
+                result.set_error(position, str(e))
+            return
+
+        # Read endpoints return one item per ID, null for IDs Spotify doesn't know
+        if isinstance(response, list):
+            values = response
+        elif batch_endpoint.response_key and isinstance(response, dict):
+            values = response[batch_endpoint.response_key]
+        else:
+            values = [True] * len(batch)
+
+        for position, value in zip(positions, values):
+            if value is None:
+                result.set_error(position, NOT_FOUND)
+            else:
+                result.results[position] = value
+
+def retry_after_seconds(response) -> int:
+    """Seconds from a 429's Retry-After header, 1 when it's missing or not a number"""
+    try:
+        return max(0, int(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return 1
+
+_ID_SEGMENT = re.compile(r'^[0-9A-Za-z]{22}$')
+
+def _endpoint_label(url: str, base_url: str) -> str:
+    """Endpoint path with the query string dropped and IDs replaced, e.g. 'playlists/{id}/tracks'"""
+    path = url.split('?', 1)[0]
+    if path.startswith(base_url):
+        path = path[len(base_url):]
+    segments = path.strip('/').split('/')
+    return '/'.join(
+        '{id}' if _ID_SEGMENT.match(segment) or (i and segments[i - 1] == 'users') else segment
+        for i, segment in enumerate(segments)
+    )
+
+_default_token_provider = None
+_default_token_provider_lock = threading.Lock()
+
+def get_default_token_provider() -> TokenProvider:
+    """
+    Get the process-wide TokenProvider for the app in config.yaml. Every client without
+    its own auth manager uses it, so the token cache is read and refreshed once for all of them.
+    """
+    global _default_token_provider
+    with _default_token_provider_lock:
+        if _default_token_provider is None:
+            _default_token_provider = TokenProvider()
+        return _default_token_provider
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client() -> 'SpotifyApiClient':
+    """
+    Get the process-wide SpotifyApiClient, creating it on first use. Everything that
+    talks to the API shares it, so there's one session, one rate limiter and one token.
+    Responses are only cached when the http_cache section of config.yaml enables it.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = SpotifyApiClient(response_cache=ResponseCache.from_config())
+        return _shared_client
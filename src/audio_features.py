@@ -0,0 +1,254 @@
+""" Audio features for library tracks and a nearest-neighbour index over them.
+
+Spotify's audio features (energy, valence, tempo, ...) describe how a track sounds,
+which works for tracks whose artists have no genres. The features are fetched once,
+100 tracks per request, and kept in a cached matrix so similarity queries never need
+the API again:
+
+    matrix = AudioFeatureMatrix().load()
+    matrix.update(track_ids, metadata_enricher)     # only fetches tracks not cached yet
+    index = SimilarityIndex(matrix, track_ids)
+    index.most_similar([seed_id], 20)               # [(track_id, similarity), ...]
+
+numpy is used for the index when it's installed and plain Python lists otherwise.
+"""
+
+import heapq
+import logging
+import math
+import os
+
+import json_codec
+from metrics import METRICS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Columns of the matrix, in order
+FEATURE_NAMES = ('danceability', 'energy', 'valence', 'tempo', 'loudness', 'acousticness', 'instrumentalness', 'speechiness', 'liveness')
+
+class AudioFeatureMatrix:
+    """
+    Audio features of every track fetched so far, one row of FEATURE_NAMES values per
+    track, stored in CACHE_PATH. Tracks Spotify has no features for (local files,
+    podcasts) are remembered too, so they aren't requested again.
+    """
+    CACHE_PATH = 'data/cache/audio_features.json'
+
+    def __init__(self, cache_path: str = CACHE_PATH) -> None:
+        self.cache_path = cache_path
+        self.ids = []
+        self.rows = []
+        self.unavailable = set()
+        # track ID -> row number
+        self._positions = {}
+
+    def load(self) -> 'AudioFeatureMatrix':
+        """Read the cache file, if there is one. A cache written for other features is ignored."""
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json_codec.load(f)
+            if tuple(data['features']) == FEATURE_NAMES:
+                self.ids = data['ids']
+                self.rows = data['rows']
+                self.unavailable = set(data['unavailable'])
+                self._positions = {track_id: position for position, track_id in enumerate(self.ids)}
+        return self
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({
+                'features': list(FEATURE_NAMES),
+                'ids': self.ids,
+                'rows': self.rows,
+                'unavailable': sorted(self.unavailable)
+            }, f)
+        os.replace(temp_path, self.cache_path)
+
+    def missing(self, track_ids: list[str], retry_unavailable: bool = False) -> list[str]:
+        """Track IDs that aren't cached yet, without duplicates"""
+        missing = {}
+        for track_id in track_ids:
+            if track_id is None or track_id in self._positions:
+                continue
+            if track_id in self.unavailable and not retry_unavailable:
+                continue
+            missing[track_id] = True
+        return list(missing)
+
+    def update(self, track_ids: list[str], metadata_enricher, retry_unavailable: bool = False) -> int:
+        """
+        Fetch the features of the tracks that aren't cached and save the cache.
+
+        Args:
+            track_ids: Tracks that should be in the matrix
+            metadata_enricher: MetadataEnricher the features are fetched through
+            retry_unavailable: Also request tracks that had no features last time
+
+        Only tracks Spotify answered with null are remembered as unavailable. Tracks
+        whose request failed are left out and requested again next time.
+
+        Returns:
+            int: Number of tracks requested
+        """
+        missing = self.missing(track_ids, retry_unavailable)
+        METRICS.increment('cache_requests_total', len(track_ids) - len(missing), cache='audio_features', result='hit')
+        METRICS.increment('cache_requests_total', len(missing), cache='audio_features', result='miss')
+        if not missing:
+            return 0
+
+        features_data = metadata_enricher.get_audio_features(missing)
+        not_found = set(features_data.not_found())
+        failed = 0
+        for track_id, features in zip(missing, features_data):
+            if features is not None:
+                self.unavailable.discard(track_id)
+                self.add(track_id, features)
+            elif track_id in not_found:
+                self.unavailable.add(track_id)
+            else:
+                failed += 1
+
+        if failed:
+            logging.warning(f"Audio features couldn't be fetched for {failed} tracks, they'll be requested again")
+
+        self.save()
+        return len(missing)
+
+    def add(self, track_id: str, features: dict) -> None:
+        """Add or replace the row for one track from its audio-features object"""
+        row = [float(features.get(name) or 0.0) for name in FEATURE_NAMES]
+        position = self._positions.get(track_id)
+        if position is None:
+            self._positions[track_id] = len(self.ids)
+            self.ids.append(track_id)
+            self.rows.append(row)
+        else:
+            self.rows[position] = row
+
+    def row(self, track_id: str) -> list[float]:
+        """Feature values for a track, or None if it isn't in the matrix"""
+        position = self._positions.get(track_id)
+        return None if position is None else self.rows[position]
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._positions
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class SimilarityIndex:
+    """
+    Cosine similarity over standardized audio features.
+
+    Every feature is scaled to zero mean and unit variance across the indexed tracks,
+    so tempo and loudness don't outweigh the 0-1 features, then every row is scaled to
+    unit length. A query is then one matrix-vector product.
+    """
+
+    def __init__(self, matrix: AudioFeatureMatrix, track_ids: list[str] = None) -> None:
+        """
+        Args:
+            matrix: Audio features to index
+            track_ids: Tracks that can be returned, every track in the matrix when None
+        """
+        self.matrix = matrix
+        candidates = matrix.ids if track_ids is None else track_ids
+        self.ids = list(dict.fromkeys(track_id for track_id in candidates if track_id in matrix))
+        # track ID -> row of the index, for masking out the seeds
+        self._positions = {track_id: position for position, track_id in enumerate(self.ids)}
+        rows = [matrix.row(track_id) for track_id in self.ids]
+
+        # The implementation is fixed when the index is built, the vectors are stored for it
+        self._use_numpy = np is not None
+        if self._use_numpy:
+            array = np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_NAMES))
+            # Column means and standard deviations, constant columns are left unscaled
+            self.means = array.mean(axis=0) if rows else np.zeros(len(FEATURE_NAMES))
+            self.scales = array.std(axis=0) if rows else np.ones(len(FEATURE_NAMES))
+            self.scales[self.scales == 0] = 1.0
+            self._vectors = self._normalize_array(array).astype(np.float32)
+        else:
+            count = len(rows) or 1
+            self.means = [0.0] * len(FEATURE_NAMES)
+            self.scales = [1.0] * len(FEATURE_NAMES)
+            for position, column in enumerate(zip(*rows)):
+                mean = sum(column) / count
+                self.means[position] = mean
+                self.scales[position] = math.sqrt(sum((value - mean) ** 2 for value in column) / count) or 1.0
+            self._vectors = [self._normalize(row) for row in rows]
+
+    def most_similar(self, seed_ids: list[str], count: int, exclude_seeds: bool = True) -> list[tuple[str, float]]:
+        """
+        Tracks closest to the average of the seed tracks.
+
+        Args:
+            seed_ids: One or more tracks to start from, they need features but don't have to be indexed
+            count: Number of tracks to return
+            exclude_seeds: Leave the seed tracks themselves out of the results
+
+        Returns:
+            list: (track_id, cosine similarity) pairs, most similar first
+
+        Raises:
+            ValueError: If none of the seeds are in the feature matrix
+        """
+        seed_rows = [self.matrix.row(seed_id) for seed_id in seed_ids if seed_id in self.matrix]
+        if not seed_rows:
+            raise ValueError("None of the seed tracks have audio features")
+
+        excluded = set(seed_ids) if exclude_seeds else set()
+        with METRICS.timer('similarity_query_seconds'):
+            if self._use_numpy:
+                return self._most_similar_numpy(seed_rows, count, excluded)
+            return self._most_similar_python(seed_rows, count, excluded)
+
+    def _most_similar_numpy(self, seed_rows: list[list[float]], count: int, excluded: set) -> list[tuple[str, float]]:
+        # Average the normalized seeds, then normalize again so scores are cosines
+        query = self._normalize_array(np.array(seed_rows, dtype=np.float64)).mean(axis=0)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self._vectors @ query.astype(np.float32)
+
+        excluded_positions = [self._positions[track_id] for track_id in excluded if track_id in self._positions]
+        scores[excluded_positions] = -np.inf
+
+        # Partial sort for the top count, then order just those
+        count = min(count, len(self.ids) - len(excluded_positions))
+        if count <= 0:
+            return []
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.ids[position], float(scores[position])) for position in top]
+
+    def _most_similar_python(self, seed_rows: list[list[float]], count: int, excluded: set) -> list[tuple[str, float]]:
+        # Average the normalized seeds, then normalize again so scores are cosines
+        seed_vectors = [self._normalize(row) for row in seed_rows]
+        query = [sum(values) / len(seed_vectors) for values in zip(*seed_vectors)]
+        length = math.sqrt(sum(value * value for value in query)) or 1.0
+        query = [value / length for value in query]
+
+        scores = (
+            (sum(a * b for a, b in zip(vector, query)), track_id)
+            for track_id, vector in zip(self.ids, self._vectors)
+            if track_id not in excluded
+        )
+        return [(track_id, score) for score, track_id in heapq.nlargest(count, scores, key=lambda item: item[0])]
+
+    def _normalize_array(self, rows):
+        # Standardize every column, then scale every row to unit length
+        standardized = (rows - self.means) / self.scales
+        lengths = np.linalg.norm(standardized, axis=1, keepdims=True)
+        lengths[lengths == 0] = 1.0
+        return standardized / lengths
+
+    def _normalize(self, row: list[float]) -> list[float]:
+        standardized = [(value - mean) / scale for value, mean, scale in zip(row, self.means, self.scales)]
+        length = math.sqrt(sum(value * value for value in standardized)) or 1.0
+        return [value / length for value in standardized]
+
+    def __len__(self) -> int:
+        return len(self.ids)
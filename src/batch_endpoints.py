@@ -0,0 +1,151 @@
+""" Limits for the Spotify endpoints that take many IDs in one request.
+
+Each endpoint has its own maximum number of IDs and takes them either in the URL
+(?ids=a,b,c) or in the JSON body. make_batch_request looks the endpoint up here, so
+callers only name the endpoint and every bulk call uses as few requests as it can.
+"""
+
+import re
+
+# A Spotify ID is 22 base62 characters, playlist items are track or episode URIs
+SPOTIFY_ID = re.compile(r'[0-9A-Za-z]{22}')
+SPOTIFY_ITEM_URI = re.compile(r'spotify:(?:track|episode):[0-9A-Za-z]{22}')
+# Error for IDs the API answered with null, as opposed to requests that failed
+NOT_FOUND = "Not found"
+
+class BatchEndpoint:
+    """
+    One bulk endpoint.
+
+    Args:
+        path: Endpoint path, may contain {} placeholders filled from path_parameters
+        max_ids: Most IDs Spotify accepts in one request
+        method: HTTP method
+        ids_in: 'query' to send the IDs as ?ids=..., 'body' to send them as JSON
+        body_field: Body field holding the IDs when ids_in is 'body'
+        response_key: Response field holding the list of results, if any
+        id_pattern: Pattern every ID has to match before it's sent
+    """
+    __slots__ = ('path', 'max_ids', 'method', 'ids_in', 'body_field', 'response_key', 'id_pattern')
+
+    def __init__(self, path: str, max_ids: int, method: str = 'GET', ids_in: str = 'query', body_field: str = 'ids', response_key: str = None, id_pattern: re.Pattern = SPOTIFY_ID) -> None:
+        if ids_in not in ('query', 'body'):
+            raise ValueError(f"Invalid ids_in: {ids_in}")
+        self.path = path
+        self.max_ids = max_ids
+        self.method = method
+        self.ids_in = ids_in
+        self.body_field = body_field
+        self.response_key = response_key
+        self.id_pattern = id_pattern
+
+    def is_valid(self, item) -> bool:
+        # None (local files, removed tracks) and malformed IDs fail the whole request they're in
+        return isinstance(item, str) and self.id_pattern.fullmatch(item) is not None
+
+    def pack(self, ids: list[str], base_url: str = '', max_batch_size: int = None, path_parameters: dict = None) -> list[tuple[list[str], str, dict]]:
+        """
+        Split IDs into as few requests as the endpoint allows. Query batches are also
+        closed early when the next ID would make the URL longer than MAX_URL_LENGTH.
+
+        Args:
+            ids: IDs to send, in order
+            base_url: API base URL, counted towards the URL length
+            max_batch_size: Optional lower cap on the IDs per request
+            path_parameters: Values for the placeholders in the path
+
+        Returns:
+            list: (batch IDs, endpoint, body) for each request
+        """
+        path = self.path.format(**path_parameters) if path_parameters else self.path
+        batch_size = min(self.max_ids, max_batch_size) if max_batch_size else self.max_ids
+
+        if self.ids_in == 'body':
+            return [
+                (ids[i:i + batch_size], path, {self.body_field: ids[i:i + batch_size]})
+                for i in range(0, len(ids), batch_size)
+            ]
+
+        # Characters before the first ID, e.g. '<base_url>artists?ids='
+        prefix = f"{path}{'&' if '?' in path else '?'}ids="
+        prefix_length = len(base_url) + len(prefix)
+
+        requests = []
+        batch = []
+        url_length = prefix_length
+        for item in ids:
+            # One more ID costs its length plus a comma
+            added_length = len(item) + (1 if batch else 0)
+            if batch and (len(batch) == batch_size or url_length + added_length > MAX_URL_LENGTH):
+                requests.append((batch, prefix + ','.join(batch), None))
+                batch = []
+                url_length = prefix_length
+                added_length = len(item)
+            batch.append(item)
+            url_length += added_length
+
+        if batch:
+            requests.append((batch, prefix + ','.join(batch), None))
+        return requests
+
+# Longest URL to send. Spotify's own limit is higher, this leaves room for proxies.
+MAX_URL_LENGTH = 4000
+
+# Named bulk endpoints, with the limits from Spotify's Web API reference
+BATCH_ENDPOINTS = {
+    'tracks': BatchEndpoint('tracks', 50, response_key='tracks'),
+    'artists': BatchEndpoint('artists', 50, response_key='artists'),
+    'albums': BatchEndpoint('albums', 20, response_key='albums'),
+    'audio-features': BatchEndpoint('audio-features', 100, response_key='audio_features'),
+    'saved-tracks-contains': BatchEndpoint('me/tracks/contains', 50),
+    'save-tracks': BatchEndpoint('me/tracks', 50, method='PUT', ids_in='body'),
+    'remove-saved-tracks': BatchEndpoint('me/tracks', 50, method='DELETE', ids_in='body'),
+    'followed-artists-contains': BatchEndpoint('me/following/contains?type=artist', 50),
+    'follow-artists': BatchEndpoint('me/following?type=artist', 50, method='PUT', ids_in='body'),
+    'unfollow-artists': BatchEndpoint('me/following?type=artist', 50, method='DELETE', ids_in='body'),
+    'add-playlist-items': BatchEndpoint('playlists/{playlist_id}/tracks', 100, method='POST', ids_in='body', body_field='uris', id_pattern=SPOTIFY_ITEM_URI)
+}
+
+class BatchResult:
+    """
+    Results of make_batch_request, one per requested ID and in the same order.
+    Iterating gives the results, with None for every ID that failed, and errors maps
+    those IDs to the reason. Endpoints that don't return anything per ID give True.
+    """
+    __slots__ = ('ids', 'results', 'errors')
+
+    def __init__(self, ids: list) -> None:
+        self.ids = list(ids)
+        self.results = [None] * len(self.ids)
+        self.errors = {}
+
+    def set_error(self, position: int, message: str) -> None:
+        self.results[position] = None
+        self.errors[self.ids[position]] = message
+
+    def not_found(self) -> list:
+        """IDs the API returned null for, the only failures that will fail again"""
+        return [item for item, error in self.errors.items() if error == NOT_FOUND]
+
+    def by_id(self) -> dict:
+        """Successful results keyed by ID"""
+        return {item: result for item, result in zip(self.ids, self.results) if result is not None}
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    def __repr__(self) -> str:
+        failed = sum(result is None for result in self.results)
+        return f"BatchResult({len(self.results) - failed} ok, {failed} failed)"
+
+def get_batch_endpoint(name: str) -> BatchEndpoint:
+    try:
+        return BATCH_ENDPOINTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown batch endpoint: {name}") from None
@@ -0,0 +1,368 @@
+""" Non-interactive entry point for scripting and cron jobs.
+
+Each command prints one JSON line with its result. Several commands can be chained
+with '+' so they run in one process and share the loaded history and API client:
+
+    python src/cli.py ingest + clean + analyze top --entity artists --start 2024-01-01 --end 2025-01-01
+    python src/cli.py sync-library tracks + sync-library duplicates + playlists genre --name Grunge --genres grunge
+    python src/cli.py playlists similar --name 'More like this' --seeds 4uLU6hMCjMI75M1A2tKUQC
+
+Put --metrics FILE before the first command to write timings and counters for the
+run, as JSON (.json) or Prometheus text (anything else).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from file_handler import FileHandler
+from history_analyzer import HistoryAnalyzer
+import json_codec
+from metrics import METRICS
+
+ENTITY_TYPES = ('tracks', 'artists', 'albums')
+
+class CliContext:
+    """
+    Objects shared by every command in one run. Each is created the first time a
+    command needs it, so a chain of local commands never authenticates and the
+    listening history is loaded once however many analyses run.
+    """
+    def __init__(self) -> None:
+        self._file_handler = None
+        self._modify_data_exports = None
+        self._history_analyzer = None
+        self._library_analyzer = None
+        self._playlist_generator = None
+
+    @property
+    def file_handler(self) -> FileHandler:
+        if self._file_handler is None:
+            self._file_handler = FileHandler()
+        return self._file_handler
+
+    @property
+    def modify_data_exports(self):
+        # Needs config.yaml, so it's imported only by the commands that clean data
+        if self._modify_data_exports is None:
+            from modify_data_exports import ModifyDataExports
+            self._modify_data_exports = ModifyDataExports()
+        return self._modify_data_exports
+
+    @property
+    def history_analyzer(self) -> HistoryAnalyzer:
+        if self._history_analyzer is None:
+            self._history_analyzer = HistoryAnalyzer()
+        return self._history_analyzer
+
+    @property
+    def library_analyzer(self):
+        if self._library_analyzer is None:
+            from library_analyzer import LibraryAnalyzer
+            self._library_analyzer = LibraryAnalyzer()
+        return self._library_analyzer
+
+    @property
+    def playlist_generator(self):
+        if self._playlist_generator is None:
+            from playlist_generator import PlaylistGenerator
+            self._playlist_generator = PlaylistGenerator(self.library_analyzer.spotify_api_handler)
+            self._playlist_generator.library_analyzer = self.library_analyzer
+            self._playlist_generator.history_analyzer = self.history_analyzer
+        return self._playlist_generator
+
+    def history_changed(self) -> None:
+        # The processed history was rewritten, later commands have to reload it
+        self._history_analyzer = None
+        if self._playlist_generator is not None:
+            self._playlist_generator.history_analyzer = None
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cli.py',
+        description="Spotify automation commands. Chain commands with ' + ' to run them in one process."
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Data processing
+    ingest = commands.add_parser('ingest', help="Combine the raw export files into one file")
+    ingest.add_argument('--append', action='store_true', help="Append plays newer than the processed history instead")
+
+    clean = commands.add_parser('clean', help="Build the processed history from the raw exports")
+    clean.add_argument('--parallel', action='store_true', help="Clean each export file in its own process")
+    clean.add_argument('--workers', type=int, default=None, help="Number of worker processes with --parallel")
+    clean.add_argument('--examples', action='store_true', help="Also write the example and test files")
+
+    # History analysis
+    analyze = commands.add_parser('analyze', help="Analyze the processed listening history")
+    reports = analyze.add_subparsers(dest='report', required=True)
+
+    top = reports.add_parser('top', help="Top tracks, artists or albums for a date range")
+    top.add_argument('--entity', choices=ENTITY_TYPES, default='tracks')
+    top.add_argument('--start', type=parse_date, required=True, help="First day (YYYY-MM-DD)")
+    top.add_argument('--end', type=parse_date, required=True, help="Day to stop at (YYYY-MM-DD, not included)")
+    top.add_argument('-n', '--quantity', type=int, default=10)
+    top.add_argument('--by', choices=('plays', 'seconds'), default='plays')
+    top.add_argument('--approximate', action='store_true', help="Use constant-memory approximate counts")
+    top.add_argument('--epsilon', type=float, default=None, help="Error bound for --approximate")
+
+    new = reports.add_parser('new', help="Top items first heard in a year")
+    new.add_argument('--entity', choices=ENTITY_TYPES, default='tracks')
+    new.add_argument('--year', type=int, required=True)
+    new.add_argument('-n', '--quantity', type=int, default=10)
+
+    stats = reports.add_parser('stats', help="Sessions, skips, heatmap and streaks")
+    stats.add_argument('--start', type=parse_date, default=None)
+    stats.add_argument('--end', type=parse_date, default=None)
+    stats.add_argument('--entity', choices=ENTITY_TYPES, default=None, help="Include per-entity stats")
+    stats.add_argument('--session-gap', type=int, default=30, help="Idle minutes that end a session")
+
+    recommend = reports.add_parser('recommend', help="Tracks played in the same sessions as the seed tracks")
+    recommend.add_argument('--seeds', required=True, help="Comma-separated track IDs")
+    recommend.add_argument('-n', '--quantity', type=int, default=20)
+
+    sql = reports.add_parser('sql', help="Run a SQL query (tables: plays, library_tracks, artist_genres)")
+    sql.add_argument('query')
+
+    # Metadata
+    enrich = commands.add_parser('enrich', help="Look up metadata for Spotify IDs")
+    enrich.add_argument('field', choices=('artist-ids', 'album-ids', 'genres', 'artist-artwork', 'album-artwork'),
+                        help="artist-ids/album-ids take track IDs, genres/artist-artwork take artist IDs, album-artwork takes album IDs")
+    enrich.add_argument('ids', nargs='+')
+
+    # Library
+    library = commands.add_parser('sync-library', help="Fetch and maintain the saved-tracks library")
+    actions = library.add_subparsers(dest='action', required=True)
+    actions.add_parser('count', help="Number of saved tracks")
+    actions.add_parser('tracks', help="Fetch every saved track into data/processed")
+    actions.add_parser('artists', help="Artists in the saved library")
+    actions.add_parser('albums', help="Albums in the saved library")
+    actions.add_parser('duplicates', help="Find duplicate saved tracks")
+    remove = actions.add_parser('remove-duplicates', help="Remove the duplicates found by 'duplicates'")
+    remove.add_argument('--keep-policy', choices=('earliest_added', 'most_played', 'first'), default='earliest_added')
+    remove.add_argument('--yes', action='store_true', help="Required, confirms the removal")
+    actions.add_parser('restore', help="Restore tracks removed as duplicates")
+    actions.add_parser('followed', help="Followed artists")
+    actions.add_parser('unfollowed', help="Library artists that aren't followed")
+    follow = actions.add_parser('follow', help="Follow every unfollowed library artist")
+    follow.add_argument('--yes', action='store_true', help="Required, confirms the follows")
+    genres = actions.add_parser('genres', help="Genre counts across the library")
+    genres.add_argument('--top', type=int, default=None)
+    genres.add_argument('--no-inferred', action='store_true', help="Only count Spotify's own genres")
+
+    # Playlists
+    playlists = commands.add_parser('playlists', help="Create playlists")
+    kinds = playlists.add_subparsers(dest='kind', required=True)
+    genre = kinds.add_parser('genre', help="Random library tracks matching any of the genres")
+    genre.add_argument('--name', required=True)
+    genre.add_argument('--tracks', type=int, default=20)
+    genre.add_argument('--genres', required=True, help="Comma-separated genres")
+    genre.add_argument('--no-inferred', action='store_true', help="Skip artists whose genres were inferred")
+    similar = kinds.add_parser('similar', help="Library tracks that sound most like the seed tracks")
+    similar.add_argument('--name', required=True)
+    similar.add_argument('--tracks', type=int, default=20)
+    similar.add_argument('--seeds', required=True, help="Comma-separated track IDs")
+    more_like_this = kinds.add_parser('more-like-this', help="Tracks played in the same sessions as the seed tracks")
+    more_like_this.add_argument('--name', required=True)
+    more_like_this.add_argument('--tracks', type=int, default=20)
+    more_like_this.add_argument('--seeds', required=True, help="Comma-separated track IDs")
+
+    return parser
+
+def run_ingest(args, context: CliContext):
+    if args.append:
+        count = context.modify_data_exports.append_exports(context.file_handler.list_raw_export_files())
+        context.history_changed()
+        return {'appended': count}
+
+    context.file_handler.combine_spotify_exports()
+    return {'export_files': len(context.file_handler.list_raw_export_files())}
+
+def run_clean(args, context: CliContext):
+    modify_data_exports = context.modify_data_exports
+    if args.parallel:
+        filter_results = modify_data_exports.process_exports_parallel(args.workers)
+    else:
+        filter_results = modify_data_exports.process_exports()
+    context.history_changed()
+
+    if args.examples:
+        file_handler = context.file_handler
+        file_handler.create_example_file(file_handler.iter_modified_data(), 'combined_spotify_data_modified_example.json', 'processed')
+        file_handler.create_test_file(file_handler.iter_modified_data(), 'combined_spotify_data_modified_test.json')
+
+    return {'filter_results': filter_results}
+
+def run_analyze(args, context: CliContext):
+    history_analyzer = context.history_analyzer
+
+    if args.report == 'top':
+        if args.by == 'seconds':
+            return history_analyzer.get_top_items(args.entity, args.quantity, args.start, args.end, by='seconds')
+        get_top = {
+            'tracks': history_analyzer.get_top_tracks,
+            'artists': history_analyzer.get_top_artists,
+            'albums': history_analyzer.get_top_albums
+        }[args.entity]
+        return get_top(args.quantity, args.start, args.end, approximate=args.approximate, epsilon=args.epsilon)
+
+    if args.report == 'new':
+        get_top_new = {
+            'tracks': history_analyzer.get_top_new_tracks_of_the_year,
+            'artists': history_analyzer.get_top_new_artists_of_the_year,
+            'albums': history_analyzer.get_top_new_albums_of_the_year
+        }[args.entity]
+        return get_top_new(args.quantity, args.year)
+
+    if args.report == 'stats':
+        return history_analyzer.get_listening_stats(args.start, args.end, entity_type=args.entity, session_gap_minutes=args.session_gap)
+
+    if args.report == 'recommend':
+        return history_analyzer.get_similar_tracks([seed.strip() for seed in args.seeds.split(',')], args.quantity)
+
+    from history_database import HistoryDatabase
+    history_database = HistoryDatabase()
+    history_database.file_handler = history_analyzer.file_handler
+    return history_database.query(args.query)
+
+def run_enrich(args, context: CliContext):
+    metadata_enricher = context.library_analyzer.metadata_enricher
+    if args.field == 'artist-ids':
+        return metadata_enricher.get_ids(args.ids, 'artist')
+    if args.field == 'album-ids':
+        return metadata_enricher.get_ids(args.ids, 'album')
+    if args.field == 'genres':
+        return dict(zip(args.ids, metadata_enricher.get_artist_genres(args.ids)))
+    if args.field == 'artist-artwork':
+        return dict(zip(args.ids, metadata_enricher.get_artist_artwork(args.ids)))
+    return dict(zip(args.ids, metadata_enricher.get_album_artwork(args.ids)))
+
+def run_sync_library(args, context: CliContext):
+    library_analyzer = context.library_analyzer
+
+    if args.action == 'count':
+        return {'tracks': library_analyzer.get_library_track_count()}
+    if args.action == 'tracks':
+        library_analyzer.get_library_tracks()
+        return {'saved_to': library_analyzer.LIBRARY_TRACKS_PATH}
+    if args.action == 'artists':
+        return library_analyzer.load_library_artists()
+    if args.action == 'albums':
+        return library_analyzer.load_library_albums()
+    if args.action == 'duplicates':
+        library_analyzer.find_duplicate_library_tracks()
+        with open('data/processed/duplicate_library_tracks.json', 'r', encoding='utf-8') as f:
+            return json_codec.load(f)
+    if args.action == 'remove-duplicates':
+        if not args.yes:
+            raise ValueError("remove-duplicates changes your library, pass --yes to confirm")
+        with open('data/processed/duplicate_library_tracks.json', 'r', encoding='utf-8') as f:
+            duplicate_tracks = json_codec.load(f)
+        return library_analyzer.remove_duplicate_library_tracks(duplicate_tracks, args.keep_policy)
+    if args.action == 'restore':
+        return {'restored': library_analyzer.restore_removed_library_tracks()}
+    if args.action == 'followed':
+        return library_analyzer.get_followed_artists()
+    if args.action == 'unfollowed':
+        return library_analyzer.find_unfollowed_library_artists()
+    if args.action == 'follow':
+        if not args.yes:
+            raise ValueError("follow changes your followed artists, pass --yes to confirm")
+        library_analyzer.follow_library_artists()
+        return {'followed': True}
+    return library_analyzer.get_library_genres(args.top, include_inferred=not args.no_inferred)
+
+def run_playlists(args, context: CliContext):
+    if args.kind in ('similar', 'more-like-this'):
+        seeds = [seed.strip() for seed in args.seeds.split(',')]
+        if args.kind == 'similar':
+            tracks = context.playlist_generator.generate_similar_playlist(args.name, args.tracks, seeds)
+        else:
+            tracks = context.playlist_generator.generate_more_like_this_playlist(args.name, args.tracks, seeds)
+        return {'name': args.name, 'tracks': len(tracks), 'seeds': seeds}
+
+    genres = [genre.strip() for genre in args.genres.split(',')]
+    context.playlist_generator.generate_playlist(args.name, args.tracks, genres, include_inferred=not args.no_inferred)
+    return {'name': args.name, 'tracks': args.tracks, 'genres': genres}
+
+COMMANDS = {
+    'ingest': run_ingest,
+    'clean': run_clean,
+    'analyze': run_analyze,
+    'enrich': run_enrich,
+    'sync-library': run_sync_library,
+    'playlists': run_playlists
+}
+
+def split_chain(argv: list[str]) -> list[list[str]]:
+    # 'a + b + c' -> [['a'], ['b'], ['c']]
+    chain = [[]]
+    for arg in argv:
+        if arg == '+':
+            chain.append([])
+        else:
+            chain[-1].append(arg)
+    return [command for command in chain if command]
+
+def run(argv: list[str], context: CliContext = None, output=None) -> list[dict]:
+    """
+    Parse and run a chain of commands, writing one JSON line per command to output.
+
+    Every command is parsed before any runs, so a typo late in the chain doesn't leave
+    it half done. The chain stops at the first command that fails.
+
+    Returns:
+        list: The {'command', 'result'} or {'command', 'error'} record of each command that ran
+    """
+    parser = build_parser()
+    context = context or CliContext()
+    output = output or sys.stdout
+
+    parsed_commands = [(' '.join(command_argv), parser.parse_args(command_argv)) for command_argv in split_chain(argv)]
+    if not parsed_commands:
+        parser.error('no command given')
+
+    records = []
+    for command_line, args in parsed_commands:
+        try:
+            # Progress messages go to stderr so stdout stays machine-readable
+            with contextlib.redirect_stdout(sys.stderr):
+                record = {'command': command_line, 'result': COMMANDS[args.command](args, context)}
+        except Exception as e:
+            record = {'command': command_line, 'error': f"{type(e).__name__}: {e}"}
+
+        output.write(json.dumps(record, default=str) + '\n')
+        output.flush()
+        records.append(record)
+        if 'error' in record:
+            break
+
+    return records
+
+def main(argv: list[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # --metrics FILE applies to the whole chain, so it comes before the first command
+    metrics_path = None
+    if len(argv) >= 2 and argv[0] == '--metrics':
+        metrics_path = argv[1]
+        argv = argv[2:]
+        METRICS.enable()
+
+    try:
+        records = run(argv)
+    finally:
+        if metrics_path:
+            METRICS.write(metrics_path)
+    return 1 if records and 'error' in records[-1] else 0
+
+if __name__ == '__main__':
+    # Relative data paths assume the repo root is the working directory
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(main())
@@ -0,0 +1,237 @@
+""" Item-item similarity from which tracks are played in the same listening sessions.
+
+The history is split into sessions on idle gaps, like ListeningAnalytics. Each session
+is one column of a sparse track x session matrix X, and two tracks are as similar as
+the cosine of their rows:
+
+    similarity(i, j) = sessions with both / sqrt(sessions with i * sessions with j)
+
+X X^T is computed a row (or a block of rows) at a time, so only the sessions and a
+few rows of co-occurrence counts are in memory, never a tracks x tracks matrix. Only the top k
+neighbours of each track are kept. scipy.sparse is used for the products when it's
+installed and collections.Counter otherwise.
+"""
+
+import heapq
+import math
+import os
+from collections import Counter
+
+import json_codec
+from metrics import METRICS
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+def split_sessions(events, session_gap_seconds: int = 30 * 60, skip_threshold_seconds: int = 30):
+    """
+    Group time-sorted plays into listening sessions. Skips don't say much about what
+    goes together, so plays shorter than skip_threshold_seconds are left out.
+
+    Yields:
+        list[PlayEvent]: The plays of one session
+    """
+    session_gap_ms = session_gap_seconds * 1000
+    skip_threshold_ms = skip_threshold_seconds * 1000
+    session = []
+    last_end_ms = None
+
+    for event in events:
+        # Spotify's timestamp marks when a play stopped
+        end_ms = event.timestamp * 1000
+        start_ms = end_ms - event.duration_ms
+        if last_end_ms is not None and start_ms - last_end_ms > session_gap_ms and session:
+            yield session
+            session = []
+        last_end_ms = max(end_ms, last_end_ms or end_ms)
+
+        if event.duration_ms >= skip_threshold_ms:
+            session.append(event)
+
+    if session:
+        yield session
+
+def top_k_cosine(baskets: list[list[int]], item_count: int, k: int, min_co_count: int = 1) -> list[list[tuple[int, float]]]:
+    """
+    Top k cosine neighbours of every item from baskets of co-occurring items.
+
+    Args:
+        baskets: Item numbers in each basket (session), without duplicates
+        item_count: Number of distinct items, numbered from 0
+        k: Neighbours to keep per item
+        min_co_count: Baskets two items have to share to be neighbours
+
+    Returns:
+        list: For every item, (item, similarity) pairs, most similar first
+    """
+    if sparse is not None:
+        return _top_k_cosine_scipy(baskets, item_count, k, min_co_count)
+    return _top_k_cosine_python(baskets, item_count, k, min_co_count)
+
+def _top_k_cosine_python(baskets: list[list[int]], item_count: int, k: int, min_co_count: int) -> list[list[tuple[int, float]]]:
+    # Rows of X as basket numbers
+    item_baskets = [[] for _ in range(item_count)]
+    for basket_number, basket in enumerate(baskets):
+        for item in basket:
+            item_baskets[item].append(basket_number)
+
+    neighbors = []
+    for item, basket_numbers in enumerate(item_baskets):
+        # Row item of X X^T: how often every other item shares a basket with it
+        co_counts = Counter()
+        for basket_number in basket_numbers:
+            co_counts.update(baskets[basket_number])
+        del co_counts[item]
+
+        item_total = len(basket_numbers)
+        # Ties go to the lower item number, like the scipy version
+        scores = (
+            (count / math.sqrt(item_total * len(item_baskets[other])), -other)
+            for other, count in co_counts.items()
+            if count >= min_co_count
+        )
+        neighbors.append([(-negated_other, score) for score, negated_other in heapq.nlargest(k, scores)])
+    return neighbors
+
+def _top_k_cosine_scipy(baskets: list[list[int]], item_count: int, k: int, min_co_count: int, block_size: int = 2048) -> list[list[tuple[int, float]]]:
+    # X as a binary items x baskets matrix
+    rows = [item for basket in baskets for item in basket]
+    columns = [basket_number for basket_number, basket in enumerate(baskets) for _ in basket]
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(item_count, len(baskets)))
+    # Scores in double precision, so ties break the same way as the Counter version
+    item_totals = np.asarray(matrix.sum(axis=1), dtype=np.float64).ravel()
+    transposed = matrix.T.tocsc()
+
+    neighbors = []
+    # A block of rows of X X^T at a time keeps memory bounded
+    for block_start in range(0, item_count, block_size):
+        block = (matrix[block_start:block_start + block_size] @ transposed).tocsr()
+        for row in range(block.shape[0]):
+            item = block_start + row
+            start, end = block.indptr[row], block.indptr[row + 1]
+            others = block.indices[start:end]
+            counts = block.data[start:end]
+
+            keep = (others != item) & (counts >= min_co_count)
+            others, counts = others[keep], counts[keep]
+            scores = counts.astype(np.float64) / np.sqrt(item_totals[item] * item_totals[others])
+
+            # Rows are sparse, so sorting them whole is cheap. Ties go to the lower item number.
+            top = np.lexsort((others, -scores))[:k]
+            neighbors.append([(int(others[position]), float(scores[position])) for position in top])
+    return neighbors
+
+class TrackNeighbors:
+    """
+    Precomputed top-k co-listening neighbours of every track in the history, saved to
+    FILE_NAME so recommendations don't need the history again.
+    """
+    FILE_NAME = 'track_neighbors.json'
+    # Neighbours kept per track
+    DEFAULT_K = 50
+
+    def __init__(self, neighbors: dict = None, names: dict = None, k: int = DEFAULT_K) -> None:
+        """
+        Args:
+            neighbors: track ID -> [(track ID, similarity), ...], most similar first
+            names: track ID -> 'Track - Artist'
+            k: Neighbours kept per track
+        """
+        self.neighbors = neighbors or {}
+        self.names = names or {}
+        self.k = k
+
+    @classmethod
+    def build(cls, events, k: int = DEFAULT_K, session_gap_seconds: int = 30 * 60, skip_threshold_seconds: int = 30,
+              min_co_sessions: int = 2, max_session_tracks: int = 100) -> 'TrackNeighbors':
+        """
+        Build the neighbour table from time-sorted plays.
+
+        Args:
+            events: PlayEvents in time order
+            k: Neighbours to keep per track
+            session_gap_seconds: Idle time that ends a session
+            skip_threshold_seconds: Plays shorter than this are ignored
+            min_co_sessions: Sessions two tracks have to share to be neighbours
+            max_session_tracks: Longer sessions (e.g. a day of background listening)
+                are split into runs of this many tracks, so they don't link everything
+        """
+        track_numbers = {}
+        names = {}
+        baskets = []
+
+        for session in split_sessions(events, session_gap_seconds, skip_threshold_seconds):
+            # Distinct tracks in play order, local files and podcasts have no track ID
+            session_tracks = {}
+            for event in session:
+                if event.track_id and event.track_id not in session_tracks:
+                    session_tracks[event.track_id] = True
+                    if event.track_id not in track_numbers:
+                        track_numbers[event.track_id] = len(track_numbers)
+                        names[event.track_id] = f"{event.track} - {event.artist}"
+
+            numbers = [track_numbers[track_id] for track_id in session_tracks]
+            for start in range(0, len(numbers), max_session_tracks):
+                basket = numbers[start:start + max_session_tracks]
+                if len(basket) > 1:
+                    baskets.append(basket)
+
+        track_ids = list(track_numbers)
+        with METRICS.timer('analyzer_seconds', operation='build_track_neighbors'):
+            top_neighbors = top_k_cosine(baskets, len(track_ids), k, min_co_sessions)
+
+        neighbors = {
+            track_ids[item]: [(track_ids[other], round(score, 4)) for other, score in item_neighbors]
+            for item, item_neighbors in enumerate(top_neighbors)
+            if item_neighbors
+        }
+        return cls(neighbors, names, k)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'TrackNeighbors':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json_codec.load(f)
+        neighbors = {track_id: [tuple(pair) for pair in pairs] for track_id, pairs in data['neighbors'].items()}
+        return cls(neighbors, data['names'], data['k'])
+
+    def save(self, file_path: str) -> None:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({'k': self.k, 'names': self.names, 'neighbors': self.neighbors}, f)
+        os.replace(temp_path, file_path)
+
+    def neighbors_of(self, track_id: str, count: int = None) -> list[tuple[str, float]]:
+        """Most similar tracks to one track, an empty list if it has none"""
+        return self.neighbors.get(track_id, [])[:count]
+
+    def recommend(self, seed_ids: list[str], count: int) -> list[tuple[str, float]]:
+        """
+        Tracks most similar to a set of seeds, scored by the sum of their similarity to
+        each seed so tracks close to several seeds come first.
+
+        Returns:
+            list: (track ID, score) pairs, best first, never including the seeds
+
+        Raises:
+            ValueError: If none of the seeds have neighbours
+        """
+        seeds = [seed_id for seed_id in seed_ids if seed_id in self.neighbors]
+        if not seeds:
+            raise ValueError("None of the seed tracks have co-listening neighbours")
+
+        scores = Counter()
+        for seed_id in seeds:
+            for track_id, similarity in self.neighbors[seed_id]:
+                scores[track_id] += similarity
+        for seed_id in seed_ids:
+            scores.pop(seed_id, None)
+
+        return [(track_id, round(score, 4)) for track_id, score in scores.most_common(count)]
+
+    def __len__(self) -> int:
+        return len(self.neighbors)
@@ -1,6 +1,8 @@
-import yaml
 from pathlib import Path
 
+# Marks that no default was passed to Config.get
+_MISSING = object()
+
 class Config:
     _instance = None
     _config = None
@@ -13,16 +15,22 @@ class Config:
     
     @classmethod
     def _load_config(cls):
+        # Imported here so modules that only need the class don't pay for yaml
+        import yaml
+
         config_path = Path(__file__).parent.parent / 'config.yaml'
         with open(config_path, 'r') as file:
             cls._config = yaml.safe_load(file)
     
     @classmethod
-    def get(cls, *keys):
+    def get(cls, *keys, default=_MISSING):
         if cls._config is None:
             cls._load_config()
             
         value = cls._config
         for key in keys:
+            # Optional settings fall back to the default instead of raising
+            if default is not _MISSING and (not isinstance(value, dict) or key not in value):
+                return default
             value = value[key]
         return value
\ No newline at end of file
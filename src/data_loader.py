@@ -0,0 +1,147 @@
+""" Coalesces lookups of tracks, artists and albums across everything in the process.
+
+The library analyzer, metadata enricher and playlist generator all look up the same
+artists and tracks. Going through one DataLoader (SpotifyApiClient.data_loader) means
+each ID is requested at most once per run, however many callers ask for it:
+
+    loader = client.data_loader
+    future = loader.load('artists', artist_id)          # queued, sent with the next tick
+    genres = loader.load_many('artists', artist_ids)    # sent now, in full batches
+"""
+
+import threading
+from concurrent.futures import Future
+
+from batch_endpoints import NOT_FOUND, BatchResult, get_batch_endpoint
+from metrics import METRICS
+
+class DataLoader:
+    # How long single loads wait for others to join their batch
+    TICK_SECONDS = 0.01
+
+    def __init__(self, spotify_api_handler, tick_seconds: float = TICK_SECONDS) -> None:
+        """
+        Args:
+            spotify_api_handler: SpotifyApiClient the batches are sent through
+            tick_seconds: How long a load() waits for more IDs before its batch is sent
+        """
+        self.spotify_api_handler = spotify_api_handler
+        self.tick_seconds = tick_seconds
+        # (entity, id) -> Future. Finished futures are the cache, unfinished ones are in flight.
+        self._futures = {}
+        # entity -> IDs queued for the next dispatch
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self, entity: str, item_id: str) -> Future:
+        """
+        Queue one lookup. It's sent with everything else queued within the tick, or
+        straight away once a full batch is queued.
+
+        Args:
+            entity: Read endpoint in BATCH_ENDPOINTS, e.g. 'artists'
+            item_id: Spotify ID
+
+        Returns:
+            Future: Resolves to the object, or raises LookupError if it couldn't be fetched
+        """
+        future, full = self._queue(entity, item_id)
+        if full:
+            # Send the full batch without blocking the caller
+            threading.Thread(target=self.dispatch, args=(entity,), daemon=True).start()
+        return future
+
+    def load_many(self, entity: str, item_ids: list) -> BatchResult:
+        """
+        Look up many IDs and wait for them. IDs that are cached or already in flight
+        aren't requested again, and anything other callers queued for the same entity
+        goes out in the same requests.
+
+        Returns:
+            BatchResult: One result per ID in order, None with an error for IDs that failed
+        """
+        futures = [self._queue(entity, item_id)[0] for item_id in item_ids]
+
+        # The caller is waiting, so send now instead of at the next tick
+        self.dispatch(entity)
+
+        result = BatchResult(item_ids)
+        for position, future in enumerate(futures):
+            try:
+                result.results[position] = future.result()
+            except LookupError as e:
+                result.set_error(position, str(e))
+        return result
+
+    def prime(self, entity: str, item_id: str, value: dict) -> None:
+        """Cache an object fetched some other way, e.g. the tracks in a saved-tracks page"""
+        if value is None or item_id is None:
+            return
+        with self._lock:
+            if (entity, item_id) not in self._futures:
+                future = Future()
+                future.set_result(value)
+                self._futures[(entity, item_id)] = future
+
+    def clear(self) -> None:
+        """Forget cached objects, lookups in flight still resolve"""
+        with self._lock:
+            self._futures = {key: future for key, future in self._futures.items() if not future.done()}
+
+    def dispatch(self, entity: str = None) -> None:
+        """Send the queued IDs for one entity, or every entity when None"""
+        with self._lock:
+            if entity is None:
+                queued, self._pending = self._pending, {}
+                self._timer = None
+            else:
+                queued = {entity: self._pending.pop(entity)} if entity in self._pending else {}
+
+        for queued_entity, item_ids in queued.items():
+            self._resolve(queued_entity, item_ids)
+
+    def _queue(self, entity: str, item_id: str) -> tuple[Future, bool]:
+        batch_endpoint = get_batch_endpoint(entity)
+        if batch_endpoint.method != 'GET' or not batch_endpoint.response_key:
+            raise ValueError(f"{entity} isn't a lookup endpoint")
+
+        key = (entity, item_id)
+        with self._lock:
+            future = self._futures.get(key)
+            METRICS.cache_lookup('data_loader', future is not None)
+            if future is not None:
+                return future, False
+
+            future = self._futures[key] = Future()
+            pending = self._pending.setdefault(entity, [])
+            pending.append(item_id)
+
+            # Start the tick for the first queued ID
+            if self._timer is None:
+                self._timer = threading.Timer(self.tick_seconds, self.dispatch)
+                self._timer.daemon = True
+                self._timer.start()
+
+            return future, len(pending) >= batch_endpoint.max_ids
+
+    def _resolve(self, entity: str, item_ids: list) -> None:
+        try:
+            result = self.spotify_api_handler.make_batch_request(items=item_ids, endpoint=entity)
+        except Exception as e:
+            result = BatchResult(item_ids)
+            for position in range(len(item_ids)):
+                result.set_error(position, str(e))
+
+        with self._lock:
+            futures = [self._futures[(entity, item_id)] for item_id in item_ids]
+            # Failures aren't cached, a later load tries again
+            for item_id, value in zip(item_ids, result):
+                if value is None:
+                    del self._futures[(entity, item_id)]
+
+        for item_id, future, value in zip(item_ids, futures, result):
+            if value is None:
+                future.set_exception(LookupError(result.errors.get(item_id, NOT_FOUND)))
+            else:
+                future.set_result(value)
@@ -1,70 +1,127 @@
-import json
 import os
+from itertools import islice
 from os.path import dirname
 
+from json_stream import OUTPUT_FORMATS, append_records, iter_json_array, iter_records, write_json_array, write_records
+
 class FileHandler:
-    def __init__(self):
+    # Files we write into the raw folder ourselves, never treat these as exports
+    GENERATED_RAW_FILES = {'combined_spotify_data_raw.json', 'library_tracks_raw.json'}
+    # Processed history name without the extension, which depends on the output format
+    MODIFIED_DATA_NAME = 'combined_spotify_data_modified'
+
+    def __init__(self, output_format: str = 'json'):
+        """
+        Args:
+            output_format: Format used to write the processed history, one of json_stream.OUTPUT_FORMATS
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'Invalid output_format: {output_format}')
         self.export_path = os.path.join(dirname(dirname(__file__)), 'data')
-        
-    def combine_spotify_exports(self):
-        # Determine the export path to the raw folder 
+        self.output_format = output_format
+
+    def list_raw_export_files(self) -> list[str]:
+        # Determine the export path to the raw folder
         raw_folder = os.path.join(self.export_path, 'raw')
-        
-        # Initialize an empty list to hold all JSON data
-        combined_spotify_export = []
-
-        # Loop through each file in the specified directory
-        for filename in os.listdir(raw_folder):
-            if filename.endswith('.json'):
-                file_path = os.path.join(raw_folder, filename)
-                with open(file_path, 'r') as f:
-                    # Load the JSON data from the file
-                    data = json.load(f)
-                    # Ensure the data is a list and extend the combined_data list
-                    if isinstance(data, list):
-                        combined_spotify_export.extend(data)
-
-        # Write the combined data to a new JSON file
-        output_file_raw = os.path.join(raw_folder, 'combined_spotify_data_raw.json')
-        with open(output_file_raw, 'w') as f:
-            json.dump(combined_spotify_export, f, indent=2)
-        
-    def create_new_modified_data_file(self):
-        # Pull in the raw data
+
+        # Sort so the combined output is in the same order on every run
+        return [
+            os.path.join(raw_folder, filename)
+            for filename in sorted(os.listdir(raw_folder))
+            if filename.endswith('.json') and filename not in self.GENERATED_RAW_FILES
+        ]
+
+    def iter_raw_exports(self):
+        # Stream the records of every export file one at a time
+        for file_path in self.list_raw_export_files():
+            # Only JSON arrays are exports, skip anything else in the folder
+            with open(file_path, 'r', encoding='utf-8') as f:
+                if not f.read(1024).lstrip().startswith('['):
+                    continue
+            yield from iter_json_array(file_path)
+
+    def combine_spotify_exports(self):
+        # Write the combined data to a new compact JSON file without holding every export in memory
+        output_file_raw = os.path.join(self.export_path, 'raw', 'combined_spotify_data_raw.json')
+        write_json_array(self.iter_raw_exports(), output_file_raw)
+
+    def iter_raw_data(self):
         raw_file_path = os.path.join(self.export_path, 'raw', 'combined_spotify_data_raw.json')
-        with open(raw_file_path, 'r') as f:
-            combined_spotify_data = json.load(f)
-
-        # Copy the raw data to the modified file 
-        modified_file_path = os.path.join(self.export_path, 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'w') as f:
-            json.dump(combined_spotify_data, f, indent=2)
-    
+        return iter_json_array(raw_file_path)
+
+    def iter_modified_data(self):
+        return iter_records(self.modified_data_path())
+
+    def modified_data_path(self) -> str:
+        """
+        Path of the processed history in whichever format it was last written. If
+        files in several formats exist the newest one wins; if there are none this is
+        the path the configured format would write.
+        """
+        existing_paths = [path for path in self._modified_data_paths() if os.path.exists(path)]
+        if existing_paths:
+            return max(existing_paths, key=os.path.getmtime)
+        return self.processed_file_path(self.MODIFIED_DATA_NAME + OUTPUT_FORMATS[self.output_format])
+
+    def write_modified_data(self, data) -> int:
+        """
+        Atomically replace the processed history with data (any iterable of records)
+        in the configured output format.
+
+        Returns:
+            int: Number of records written
+        """
+        modified_file_path = self.processed_file_path(self.MODIFIED_DATA_NAME + OUTPUT_FORMATS[self.output_format])
+        os.makedirs(dirname(modified_file_path), exist_ok=True)
+
+        print(f"Exporting {os.path.basename(modified_file_path)} to {dirname(modified_file_path)}")
+        count = write_records(data, modified_file_path, self.output_format)
+
+        # Don't leave a copy in another format behind to be read by mistake
+        self._remove_stale_modified_data(modified_file_path)
+        return count
+
+    def append_modified_data(self, data) -> int:
+        """
+        Add records to the end of the processed history. JSON Lines files are appended
+        to in place, other formats are rewritten atomically.
+
+        Returns:
+            int: Number of records appended
+        """
+        modified_file_path = self.modified_data_path()
+        os.makedirs(dirname(modified_file_path), exist_ok=True)
+        return append_records(data, modified_file_path)
+
+    def processed_file_path(self, file_name: str) -> str:
+        return os.path.join(self.export_path, 'processed', file_name)
+
+    def _modified_data_paths(self) -> list[str]:
+        return [self.processed_file_path(self.MODIFIED_DATA_NAME + extension) for extension in dict.fromkeys(OUTPUT_FORMATS.values())]
+
+    def _remove_stale_modified_data(self, current_path: str) -> None:
+        for path in self._modified_data_paths():
+            if path != current_path and os.path.exists(path):
+                os.remove(path)
+
     def pull_raw_data(self):
-        raw_file_path = os.path.join(self.export_path, 'raw', 'combined_spotify_data_raw.json')
-        with open(raw_file_path, 'r') as f:
-            raw_data = json.load(f)
-        return raw_data
-    
+        return list(self.iter_raw_data())
+
     def pull_modified_data(self):
-        modified_file_path = os.path.join(self.export_path, 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            modified_data = json.load(f)
-        return modified_data
+        return list(self.iter_modified_data())
 
     def export_to_folder(self, data, file_name, export_folder):
         # Create the directory if it doesn't exist
         os.makedirs(os.path.join(self.export_path, export_folder), exist_ok=True)
-        
+
         print(f"Exporting {file_name} to {os.path.join(self.export_path, export_folder)}")
-        
-        # Write the file to the provided folder
-        with open(os.path.join(self.export_path, export_folder, file_name), 'w') as f:
-            json.dump(data, f, indent=2)
-    
+
+        # Write the file to the provided folder, data can be a list or any iterable of records
+        write_json_array(data, os.path.join(self.export_path, export_folder, file_name), indent=2)
+
     def create_example_file(self, file, file_name, folder_name):
         # Grab the first 5 items from the data
-        first_five_items = file[:5]
+        first_five_items = list(islice(file, 5))
 
         # Add examples subfolder to the export path
         examples_folder = os.path.join(self.export_path, folder_name, 'examples')
@@ -73,7 +130,7 @@ class FileHandler:
 
         # Export the first 5 items to the examples folder
         self.export_to_folder(first_five_items, file_name, examples_folder)
-    
+
     def create_test_file(self, file, file_name):
         # Add test subfolder to the export path
         test_folder = os.path.join(self.export_path, 'test')
@@ -81,4 +138,4 @@ class FileHandler:
         os.makedirs(test_folder, exist_ok=True)
 
         # Export the last 5 items to the test folder
-        self.export_to_folder(file, file_name, test_folder)
\ No newline at end of file
+        self.export_to_folder(file, file_name, test_folder)
@@ -0,0 +1,233 @@
+""" Genres for artists Spotify doesn't assign any to, inferred from the artists around them.
+
+Artists are linked when they're played in the same listening sessions or appear on the
+same saved album, weighted by how often. Spotify's genres are then spread over that
+graph with label spreading (Zhou et al.): every round each artist takes alpha of its
+neighbours' weighted genre mix and 1 - alpha of its own Spotify genres, which keeps
+tagged artists anchored while untagged ones pick up the genres around them.
+
+    F = Y
+    repeat: F = alpha * P F + (1 - alpha) * Y       P = row-normalized edge weights
+
+P and F are sparse. scipy.sparse does the products when it's installed, plain dicts
+otherwise. An inferred genre's confidence is its share of the artist's genre mix.
+"""
+
+import itertools
+import os
+from collections import Counter
+
+import json_codec
+from co_listening import split_sessions
+from metrics import METRICS
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+def build_artist_graph(events, library_tracks: list[dict], min_co_sessions: int = 2, album_weight: float = 2.0, max_session_artists: int = 50) -> Counter:
+    """
+    Weighted edges between artists, keyed by artist name.
+
+    Args:
+        events: PlayEvents in time order
+        library_tracks: Simplified library tracks with 'artist' and 'album_id'
+        min_co_sessions: Sessions two artists have to share to be linked by listening
+        album_weight: Weight of an edge between two artists on the same saved album
+        max_session_artists: Longer sessions are split into runs of this many artists
+
+    Returns:
+        Counter: (artist, artist) -> weight, each edge once with the names in sorted order
+    """
+    co_sessions = Counter()
+    for session in split_sessions(events):
+        artists = list(dict.fromkeys(event.artist for event in session if event.artist))
+        for start in range(0, len(artists), max_session_artists):
+            co_sessions.update(itertools.combinations(sorted(artists[start:start + max_session_artists]), 2))
+    edges = Counter({pair: count for pair, count in co_sessions.items() if count >= min_co_sessions})
+
+    # Compilations and features put several artists on one album
+    album_artists = {}
+    for track in library_tracks:
+        if track.get('album_id') and track.get('artist'):
+            album_artists.setdefault(track['album_id'], set()).add(track['artist'])
+    for artists in album_artists.values():
+        for pair in itertools.combinations(sorted(artists), 2):
+            edges[pair] += album_weight
+
+    return edges
+
+def propagate_labels(edges: Counter, labels: dict, alpha: float = 0.8, iterations: int = 30, tolerance: float = 1e-4) -> dict:
+    """
+    Label spreading over an undirected weighted graph.
+
+    Args:
+        edges: (node, node) -> weight
+        labels: node -> list of labels for the nodes that have them
+        alpha: Share of each round that comes from the neighbours
+        iterations: Most rounds to run
+        tolerance: Stop early once no score changes by more than this
+
+    Returns:
+        dict: node -> {label: score} for every node that ends up with a label
+    """
+    labels = {node: node_labels for node, node_labels in labels.items() if node_labels}
+    if not labels:
+        return {}
+
+    nodes = list(dict.fromkeys(itertools.chain(labels, *edges)))
+    if sparse is not None:
+        return _propagate_scipy(nodes, edges, labels, alpha, iterations, tolerance)
+    return _propagate_python(nodes, edges, labels, alpha, iterations, tolerance)
+
+def _propagate_python(nodes: list, edges: Counter, labels: dict, alpha: float, iterations: int, tolerance: float) -> dict:
+    # Row-normalized adjacency lists
+    adjacency = {node: {} for node in nodes}
+    for (a, b), weight in edges.items():
+        adjacency[a][b] = adjacency[a].get(b, 0.0) + weight
+        adjacency[b][a] = adjacency[b].get(a, 0.0) + weight
+    for neighbors in adjacency.values():
+        total = sum(neighbors.values())
+        for neighbor in neighbors:
+            neighbors[neighbor] /= total
+
+    # Each tagged node starts with its labels sharing a weight of 1
+    seeds = {node: {label: 1.0 / len(node_labels) for label in node_labels} for node, node_labels in labels.items()}
+    scores = {node: dict(label_scores) for node, label_scores in seeds.items()}
+
+    for _ in range(iterations):
+        new_scores = {}
+        change = 0.0
+        for node in nodes:
+            mixed = {}
+            for neighbor, weight in adjacency[node].items():
+                for label, score in scores.get(neighbor, {}).items():
+                    mixed[label] = mixed.get(label, 0.0) + alpha * weight * score
+            for label, score in seeds.get(node, {}).items():
+                mixed[label] = mixed.get(label, 0.0) + (1 - alpha) * score
+            if mixed:
+                new_scores[node] = mixed
+                previous = scores.get(node, {})
+                change = max(change, max(abs(score - previous.get(label, 0.0)) for label, score in mixed.items()))
+        scores = new_scores
+        if change < tolerance:
+            break
+
+    return scores
+
+def _propagate_scipy(nodes: list, edges: Counter, labels: dict, alpha: float, iterations: int, tolerance: float) -> dict:
+    node_numbers = {node: number for number, node in enumerate(nodes)}
+    label_names = list(dict.fromkeys(label for node_labels in labels.values() for label in node_labels))
+    label_numbers = {label: number for number, label in enumerate(label_names)}
+
+    # Symmetric weights, then P = D^-1 W
+    rows = [node_numbers[a] for a, _ in edges] + [node_numbers[b] for _, b in edges]
+    columns = [node_numbers[b] for _, b in edges] + [node_numbers[a] for a, _ in edges]
+    weights = list(edges.values()) * 2
+    weight_matrix = sparse.csr_matrix((np.array(weights, dtype=np.float64), (rows, columns)), shape=(len(nodes), len(nodes)))
+    degrees = np.asarray(weight_matrix.sum(axis=1)).ravel()
+    degrees[degrees == 0] = 1.0
+    transition = sparse.diags(1.0 / degrees) @ weight_matrix
+
+    # Y: each tagged node's labels share a weight of 1
+    seed_rows, seed_columns, seed_values = [], [], []
+    for node, node_labels in labels.items():
+        for label in node_labels:
+            seed_rows.append(node_numbers[node])
+            seed_columns.append(label_numbers[label])
+            seed_values.append(1.0 / len(node_labels))
+    seed_matrix = sparse.csr_matrix((seed_values, (seed_rows, seed_columns)), shape=(len(nodes), len(label_names)))
+
+    scores = seed_matrix.copy()
+    for _ in range(iterations):
+        new_scores = (alpha * (transition @ scores) + (1 - alpha) * seed_matrix).tocsr()
+        change = abs(new_scores - scores).max() if new_scores.nnz or scores.nnz else 0.0
+        scores = new_scores
+        if change < tolerance:
+            break
+
+    results = {}
+    scores.eliminate_zeros()
+    for number, node in enumerate(nodes):
+        start, end = scores.indptr[number], scores.indptr[number + 1]
+        if start < end:
+            results[node] = {label_names[column]: float(value) for column, value in zip(scores.indices[start:end], scores.data[start:end])}
+    return results
+
+class GenreInference:
+    """
+    Spotify's genres plus inferred genres for artists that have none, keyed by artist
+    name. Each entry has a source, 'spotify' or 'inferred', and genre -> confidence,
+    which is 1.0 for Spotify's genres.
+    """
+    # Inferred genres below this share of an artist's genre mix are dropped
+    MIN_CONFIDENCE = 0.15
+    # Most inferred genres kept per artist
+    MAX_INFERRED_GENRES = 3
+
+    def __init__(self, artists: dict = None) -> None:
+        self.artists = artists or {}
+
+    @classmethod
+    def build(cls, events, library_tracks: list[dict], alpha: float = 0.8, min_confidence: float = MIN_CONFIDENCE,
+              max_genres: int = MAX_INFERRED_GENRES) -> 'GenreInference':
+        """
+        Infer genres for the untagged artists in the library and listening history.
+
+        Args:
+            events: PlayEvents in time order, for the co-listening edges
+            library_tracks: Simplified library tracks, their 'genres' are Spotify's genres for the track's artist
+            alpha: Share of an artist's genres that comes from its neighbours
+            min_confidence: Lowest confidence an inferred genre is kept with
+            max_genres: Most inferred genres kept per artist
+        """
+        known_genres = {}
+        for track in library_tracks:
+            if track.get('artist') and track.get('genres'):
+                known_genres.setdefault(track['artist'], set()).update(track['genres'])
+        labels = {artist: sorted(genres) for artist, genres in known_genres.items()}
+
+        with METRICS.timer('analyzer_seconds', operation='infer_genres'):
+            edges = build_artist_graph(events, library_tracks)
+            scores = propagate_labels(edges, labels, alpha)
+
+        artists = {artist: {'source': 'spotify', 'genres': {genre: 1.0 for genre in genres}} for artist, genres in labels.items()}
+        for artist, label_scores in scores.items():
+            if artist in artists:
+                continue
+            total = sum(label_scores.values())
+            ranked = sorted(((score / total, genre) for genre, score in label_scores.items()), key=lambda item: (-item[0], item[1]))
+            genres = {genre: round(confidence, 4) for confidence, genre in ranked[:max_genres] if confidence >= min_confidence}
+            if genres:
+                artists[artist] = {'source': 'inferred', 'genres': genres}
+
+        return cls(artists)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'GenreInference':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return cls(json_codec.load(f)['artists'])
+
+    def save(self, file_path: str) -> None:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({'artists': self.artists}, f)
+        os.replace(temp_path, file_path)
+
+    def genres_for(self, artist: str, include_inferred: bool = True) -> list[str]:
+        """Genres of an artist, most confident first, an empty list if there are none"""
+        entry = self.artists.get(artist)
+        if entry is None or (entry['source'] == 'inferred' and not include_inferred):
+            return []
+        return list(entry['genres'])
+
+    def is_inferred(self, artist: str) -> bool:
+        entry = self.artists.get(artist)
+        return entry is not None and entry['source'] == 'inferred'
+
+    def __len__(self) -> int:
+        return len(self.artists)
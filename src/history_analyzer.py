@@ -1,194 +1,315 @@
-import os
 import json
-
+import os
 from datetime import datetime
 
+from co_listening import TrackNeighbors
+from file_handler import FileHandler
+from history_database import HistoryDatabase, print_table
+from history_rollups import HistoryRollups
+from listening_analytics import ListeningAnalytics
+from metrics import METRICS
+from play_event import PlayEvent, format_timestamp, to_epoch
+from sketches import SpaceSaving
+
 class HistoryAnalyzer:
+    # Default error bound of approximate top-N queries, as a fraction of plays in the range
+    APPROXIMATE_EPSILON = 0.0001
+
     def __init__(self) -> None:
-        pass
+        self.file_handler = FileHandler()
+        self._listening_history = None
+        self._rollups = None
+        self._sorted_listening_history = None
+        self._track_neighbors = None
+
+    def load_listening_history(self) -> list[PlayEvent]:
+        # Load the processed history once per analyzer as compact play events
+        if self._listening_history is None:
+            with METRICS.timer('analyzer_seconds', operation='load_history'):
+                self._listening_history = [PlayEvent.from_processed(item) for item in self.file_handler.iter_modified_data()]
+            METRICS.increment('analyzer_plays_loaded_total', len(self._listening_history))
+        return self._listening_history
+
+    def load_rollups(self) -> HistoryRollups:
+        """
+        Load the day/month rollups written at ingestion. If they're missing or older than
+        the processed history (e.g. it was cleaned step by step), rebuild them with one
+        scan and save them for next time.
+        """
+        if self._rollups is None:
+            rollups_path = self.file_handler.processed_file_path(HistoryRollups.FILE_NAME)
+            history_path = self.file_handler.modified_data_path()
+
+            rollups_current = os.path.exists(rollups_path) and os.path.getmtime(rollups_path) >= os.path.getmtime(history_path)
+            METRICS.cache_lookup('history_rollups', rollups_current)
+            with METRICS.timer('analyzer_seconds', operation='load_rollups' if rollups_current else 'rebuild_rollups'):
+                if rollups_current:
+                    self._rollups = HistoryRollups.load(rollups_path)
+                else:
+                    self._rollups = HistoryRollups()
+                    self._rollups.add_many(self.load_listening_history())
+                    self._rollups.save(rollups_path)
+
+        return self._rollups
+
+    def load_sorted_listening_history(self) -> list[PlayEvent]:
+        # Session-based analyses need plays in time order; the file is mostly sorted already so this is cheap
+        if self._sorted_listening_history is None:
+            self._sorted_listening_history = sorted(self.load_listening_history(), key=lambda event: event.timestamp)
+        return self._sorted_listening_history
+
+    def load_track_neighbors(self) -> TrackNeighbors:
+        """
+        Load the co-listening neighbour table, rebuilding it from the history when it's
+        missing or older than the processed history, like the rollups.
+        """
+        if self._track_neighbors is None:
+            neighbors_path = self.file_handler.processed_file_path(TrackNeighbors.FILE_NAME)
+            history_path = self.file_handler.modified_data_path()
+
+            neighbors_current = os.path.exists(neighbors_path) and os.path.getmtime(neighbors_path) >= os.path.getmtime(history_path)
+            METRICS.cache_lookup('track_neighbors', neighbors_current)
+            if neighbors_current:
+                self._track_neighbors = TrackNeighbors.load(neighbors_path)
+            else:
+                self._track_neighbors = TrackNeighbors.build(self.load_sorted_listening_history())
+                self._track_neighbors.save(neighbors_path)
+
+        return self._track_neighbors
+
+    def get_similar_tracks(self, seed_track_ids: list[str], quantity: int) -> list[dict]:
+        """
+        Tracks most often played in the same sessions as the seed tracks.
+
+        Returns:
+            list: {'id', 'track', 'score'} for each track, best first
+        """
+        track_neighbors = self.load_track_neighbors()
+        return [
+            {'id': track_id, 'track': track_neighbors.names.get(track_id), 'score': score}
+            for track_id, score in track_neighbors.recommend(seed_track_ids, quantity)
+        ]
+
+    def get_top_items(self, entity_type: str, quantity: int, query_start_date: datetime, query_end_date: datetime, by: str = 'plays') -> list[str]:
+        """
+        Get the top tracks, artists or albums between two dates (end date not included)
+        from the rollups, ranked by plays or by seconds listened.
+        """
+        rollups = self.load_rollups()
+        with METRICS.timer('analyzer_seconds', operation='rollup_top'):
+            top_items = rollups.top(entity_type, quantity, query_start_date, query_end_date, by)
+        if by == 'plays':
+            return [f"{i+1}. {item[0]} - {item[1]} plays" for i, item in enumerate(top_items)]
+        return [f"{i+1}. {item[0]} - {round(item[2] / 3600, 1)} hours" for i, item in enumerate(top_items)]
+
+    def get_listening_stats(self, query_start_date: datetime = None, query_end_date: datetime = None, entity_type: str = None, entity: str = None, session_gap_minutes: int = 30) -> dict:
+        """
+        Sessions, skip rates, completion, heatmaps and streaks for a date range.
+
+        Args:
+            query_start_date: Start of the range, defaults to the first play
+            query_end_date: End of the range, defaults to the last play
+            entity_type: 'tracks', 'artists' or 'albums' to include per-entity stats
+            entity: Only count plays of this track/artist/album label (requires entity_type)
+            session_gap_minutes: Idle time that ends a listening session
+
+        Returns:
+            dict: Results of ListeningAnalytics
+        """
+        sorted_listening_history = self.load_sorted_listening_history()
+
+        if entity is not None and entity_type not in HistoryRollups.ENTITY_TYPES:
+            raise ValueError('entity requires entity_type to be tracks, artists or albums')
+        entity_index = HistoryRollups.ENTITY_TYPES.index(entity_type) if entity is not None else None
+
+        start_timestamp = to_epoch(query_start_date) if query_start_date else None
+        end_timestamp = to_epoch(query_end_date) if query_end_date else None
+
+        analytics = ListeningAnalytics(session_gap_seconds=session_gap_minutes * 60, entity_type=entity_type)
+        with METRICS.timer('analyzer_seconds', operation='listening_stats'):
+            for event in sorted_listening_history:
+                if start_timestamp is not None and event.local_timestamp < start_timestamp:
+                    continue
+                if end_timestamp is not None and event.local_timestamp > end_timestamp:
+                    break
+                if entity_index is not None and HistoryRollups.entity_keys(event)[entity_index] != entity:
+                    continue
+                analytics.add(event)
+
+        return analytics.results()
+
+    def get_approximate_top_items(self, entity_type: str, quantity: int, query_start_date: datetime, query_end_date: datetime, epsilon: float = None) -> list[str]:
+        """
+        Get the top tracks, artists or albums with a Space-Saving summary instead of
+        exact counts, streaming the processed history so memory stays constant however
+        many distinct items there are. Counts are overestimates by at most
+        epsilon x plays in the range; the possible overcount is shown next to each item.
+        """
+        if entity_type not in HistoryRollups.ENTITY_TYPES:
+            raise ValueError(f'Invalid entity_type: {entity_type}')
+        entity_index = HistoryRollups.ENTITY_TYPES.index(entity_type)
+
+        # The summary has to track at least as many items as we report
+        summary = SpaceSaving(epsilon=epsilon or self.APPROXIMATE_EPSILON)
+        if summary.capacity < quantity:
+            summary = SpaceSaving(capacity=quantity)
+
+        # Reuse the history if it's already in memory, otherwise stream it from disk
+        if self._listening_history is not None:
+            events = self._listening_history
+        else:
+            events = (PlayEvent.from_processed(item) for item in self.file_handler.iter_modified_data())
+
+        start_timestamp, end_timestamp = to_epoch(query_start_date), to_epoch(query_end_date)
+        with METRICS.timer('analyzer_seconds', operation='approximate_top'):
+            for event in events:
+                if start_timestamp <= event.local_timestamp < end_timestamp:
+                    summary.add(HistoryRollups.entity_keys(event)[entity_index])
+
+        return [
+            f"{i+1}. {key} - {count} plays" + (f" (±{error})" if error else "")
+            for i, (key, count, error) in enumerate(summary.top(quantity))
+        ]
+
+    def _can_use_rollups(self, query_start_date: datetime, query_end_date: datetime) -> bool:
+        # Rollups have day resolution, so both ends of the range have to fall on midnight
+        return all(value.time() == datetime.min.time() for value in (query_start_date, query_end_date))
+
+    def filter_listening_history(self, query_start_date: datetime, query_end_date: datetime) -> list[PlayEvent]:
+        # Compare integer timestamps instead of parsing every record's date, in local time when a time zone was configured.
+        # The end isn't included, the same as the rollups.
+        start_timestamp, end_timestamp = to_epoch(query_start_date), to_epoch(query_end_date)
+        return [event for event in self.load_listening_history() if start_timestamp <= event.local_timestamp < end_timestamp]
 
     def get_user_listening_start_end_dates(self) -> tuple[str, str]:
         # Search for the first and last timestamp in the data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
+        timestamps = [event.timestamp for event in self.load_listening_history()]
 
-        # Convert timestamps to datetime objects for comparison
-        timestamps = [datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S') for item in listening_history]
-        
-        first_timestamp = min(timestamps).strftime('%Y-%m-%d %H:%M:%S')
-        last_timestamp = max(timestamps).strftime('%Y-%m-%d %H:%M:%S')
+        first_timestamp = format_timestamp(min(timestamps))
+        last_timestamp = format_timestamp(max(timestamps))
 
         return first_timestamp, last_timestamp
 
-    def get_top_tracks(self, quantity: int, query_start_date: datetime, query_end_date: datetime) -> list[str]:
-        # Pull in the modified data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
+    def get_top_tracks(self, quantity: int, query_start_date: datetime, query_end_date: datetime, approximate: bool = False, epsilon: float = None) -> list[str]:
+        # Approximate counts in constant memory for very large histories
+        if approximate:
+            return self.get_approximate_top_items('tracks', quantity, query_start_date, query_end_date, epsilon)
+
+        # Whole-day ranges are answered from the pre-aggregated rollups
+        if self._can_use_rollups(query_start_date, query_end_date):
+            return self.get_top_items('tracks', quantity, query_start_date, query_end_date)
 
         # Filter the data to only include the dates we want
-        filtered_data = [item for item in listening_history if query_start_date <= datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S') <= query_end_date]
+        filtered_data = self.filter_listening_history(query_start_date, query_end_date)
 
         # Scan through the data and get the top tracks
         top_tracks = {}
-        for item in filtered_data:
-            track_with_artist = f"{item['Track']} - {item['Arist']}"
-            if track_with_artist in top_tracks:
-                top_tracks[track_with_artist] += 1
-            else:
-                top_tracks[track_with_artist] = 1
-
-        # Sort the tracks by number of plays
-        sorted_tracks = sorted(top_tracks.items(), key=lambda x: x[1], reverse=True)
+        for event in filtered_data:
+            track_with_artist = f"{event.track} - {event.artist}"
+            top_tracks[track_with_artist] = top_tracks.get(track_with_artist, 0) + 1
 
         # Return the top tracks with play counts
-        return [f"{i+1}. {track[0]} - {track[1]} plays" for i, track in enumerate(sorted_tracks[:quantity])]
+        return self._format_top_items(top_tracks, quantity)
+
+    def get_top_artists(self, quantity: int, query_start_date: datetime, query_end_date: datetime, approximate: bool = False, epsilon: float = None) -> list[str]:
+        # Approximate counts in constant memory for very large histories
+        if approximate:
+            return self.get_approximate_top_items('artists', quantity, query_start_date, query_end_date, epsilon)
 
-    def get_top_artists(self, quantity: int, query_start_date: datetime, query_end_date: datetime) -> list[str]:
-        # Pull in the modified data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
+        # Whole-day ranges are answered from the pre-aggregated rollups
+        if self._can_use_rollups(query_start_date, query_end_date):
+            return self.get_top_items('artists', quantity, query_start_date, query_end_date)
 
         # Filter the data to only include the dates we want
-        filtered_data = [item for item in listening_history if query_start_date <= datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S') <= query_end_date]
+        filtered_data = self.filter_listening_history(query_start_date, query_end_date)
 
-       # Scan through the data and get the top artists
+        # Scan through the data and get the top artists
         top_artists = {}
-        for item in filtered_data:
-            if item['Arist'] in top_artists:
-                top_artists[item['Arist']] += 1
-            else:
-                top_artists[item['Arist']] = 1
-
-        # Sort the artists by number of plays
-        sorted_artists = sorted(top_artists.items(), key=lambda x: x[1], reverse=True)
+        for event in filtered_data:
+            top_artists[event.artist] = top_artists.get(event.artist, 0) + 1
 
         # Return the top artists with play counts
-        return [f"{i+1}. {artist[0]} - {artist[1]} plays" for i, artist in enumerate(sorted_artists[:quantity])]
+        return self._format_top_items(top_artists, quantity)
+
+    def get_top_albums(self, quantity: int, query_start_date: datetime, query_end_date: datetime, approximate: bool = False, epsilon: float = None) -> list[str]:
+        # Approximate counts in constant memory for very large histories
+        if approximate:
+            return self.get_approximate_top_items('albums', quantity, query_start_date, query_end_date, epsilon)
 
-    def get_top_albums(self, quantity: int, query_start_date: datetime, query_end_date: datetime) -> list[str]:
-        # Pull in the modified data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
+        # Whole-day ranges are answered from the pre-aggregated rollups
+        if self._can_use_rollups(query_start_date, query_end_date):
+            return self.get_top_items('albums', quantity, query_start_date, query_end_date)
 
         # Filter the data to only include the dates we want
-        filtered_data = [item for item in listening_history if query_start_date <= datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S') <= query_end_date]
+        filtered_data = self.filter_listening_history(query_start_date, query_end_date)
 
-       # Scan through the data and get the top albums
+        # Scan through the data and get the top albums
         top_albums = {}
-        for item in filtered_data:
-            album_with_artist = f"{item['Album']} - {item['Arist']}"
-            if album_with_artist in top_albums:
-                top_albums[album_with_artist] += 1
-            else:
-                top_albums[album_with_artist] = 1
-
-        # Sort the albums by number of plays
-        sorted_albums = sorted(top_albums.items(), key=lambda x: x[1], reverse=True)
+        for event in filtered_data:
+            album_with_artist = f"{event.album} - {event.artist}"
+            top_albums[album_with_artist] = top_albums.get(album_with_artist, 0) + 1
 
         # Return the top albums with play counts
-        return [f"{i+1}. {album[0]} - {album[1]} plays" for i, album in enumerate(sorted_albums[:quantity])]
+        return self._format_top_items(top_albums, quantity)
 
     def get_top_new_tracks_of_the_year(self, quantity: int, year: int) -> list[str]:
-        # Pull in the modified data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
-
-        # Determine the first listening date of each track
-        first_listening_dates = {}
-        for item in listening_history:
-            track_key = item['Track']  # Use track name as key
-            if track_key not in first_listening_dates:
-                first_listening_dates[track_key] = datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S')
-            else:
-                first_listening_dates[track_key] = min(first_listening_dates[track_key], datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S'))
-
-        # Filter out all of the tracks that have a first listening date before the year started
-        filtered_tracks = [item for item in listening_history if first_listening_dates[item['Track']] >= datetime(year, 1, 1)]
+        # Only keep plays of tracks (by name) that were first heard this year or later
+        filtered_tracks = self._filter_new_items(lambda event: event.track, year)
 
         # Scan through the data and get the top new tracks
         top_tracks = {}
-        for item in filtered_tracks:
-            track_with_artist = f"{item['Track']} - {item['Arist']}"
-            if track_with_artist in top_tracks:
-                top_tracks[track_with_artist] += 1
-            else:
-                top_tracks[track_with_artist] = 1
-
-        # Sort the tracks by number of plays
-        sorted_tracks = sorted(top_tracks.items(), key=lambda x: x[1], reverse=True)
+        for event in filtered_tracks:
+            track_with_artist = f"{event.track} - {event.artist}"
+            top_tracks[track_with_artist] = top_tracks.get(track_with_artist, 0) + 1
 
         # Return the top tracks with play counts
-        return [f"{i+1}. {track[0]} - {track[1]} plays" for i, track in enumerate(sorted_tracks[:quantity])]
-    
-    def get_top_new_albums_of_the_year(self, quantity: int, year: int) -> list[str]:
-        # Pull in the modified data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
-
-        # Determine the first listening date of each album
-        first_listening_dates = {}
-        for item in listening_history:
-            album_key = item['Album']  # Use album name as key
-            if album_key not in first_listening_dates:
-                first_listening_dates[album_key] = datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S')
-            else:
-                first_listening_dates[album_key] = min(first_listening_dates[album_key], datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S'))
+        return self._format_top_items(top_tracks, quantity)
 
-        # Filter out all of the albums that have a first listening date before the year started
-        filtered_albums = [item for item in listening_history if first_listening_dates[item['Album']] >= datetime(year, 1, 1)]
+    def get_top_new_albums_of_the_year(self, quantity: int, year: int) -> list[str]:
+        # Only keep plays of albums (by name) that were first heard this year or later
+        filtered_albums = self._filter_new_items(lambda event: event.album, year)
 
         # Scan through the data and get the top new albums
         top_albums = {}
-        for item in filtered_albums:
-            album_with_artist = f"{item['Album']} - {item['Arist']}"
-            if album_with_artist in top_albums:
-                top_albums[album_with_artist] += 1
-            else:
-                top_albums[album_with_artist] = 1
-
-        # Sort the albums by number of plays
-        sorted_albums = sorted(top_albums.items(), key=lambda x: x[1], reverse=True)
+        for event in filtered_albums:
+            album_with_artist = f"{event.album} - {event.artist}"
+            top_albums[album_with_artist] = top_albums.get(album_with_artist, 0) + 1
 
         # Return the top albums with play counts
-        return [f"{i+1}. {album[0]} - {album[1]} plays" for i, album in enumerate(sorted_albums[:quantity])]
-    
-    def get_top_new_artists_of_the_year(self, quantity: int, year: int) -> list[str]:
-        # Pull in the modified data
-        modified_file_path = os.path.join('data', 'processed', 'combined_spotify_data_modified.json')
-        with open(modified_file_path, 'r') as f:
-            listening_history = json.load(f)
-
-        # Determine the first listening date of each artist
-        first_listening_dates = {}
-        for item in listening_history:
-            artist_key = item['Arist']  # Use artist name as key
-            if artist_key not in first_listening_dates:
-                first_listening_dates[artist_key] = datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S')
-            else:
-                first_listening_dates[artist_key] = min(first_listening_dates[artist_key], datetime.strptime(item['Timestamp'], '%Y-%m-%d %H:%M:%S'))
+        return self._format_top_items(top_albums, quantity)
 
-        # Filter out all of the artists that have a first listening date before the year started
-        filtered_artists = [item for item in listening_history if first_listening_dates[item['Arist']] >= datetime(year, 1, 1)]
+    def get_top_new_artists_of_the_year(self, quantity: int, year: int) -> list[str]:
+        # Only keep plays of artists that were first heard this year or later
+        filtered_artists = self._filter_new_items(lambda event: event.artist, year)
 
         # Scan through the data and get the top new artists
         top_artists = {}
-        for item in filtered_artists:
-            if item['Arist'] in top_artists:
-                top_artists[item['Arist']] += 1
-            else:
-                top_artists[item['Arist']] = 1
-
-        # Sort the artists by number of plays
-        sorted_artists = sorted(top_artists.items(), key=lambda x: x[1], reverse=True)
+        for event in filtered_artists:
+            top_artists[event.artist] = top_artists.get(event.artist, 0) + 1
 
         # Return the top artists with play counts
-        return [f"{i+1}. {artist[0]} - {artist[1]} plays" for i, artist in enumerate(sorted_artists[:quantity])]
+        return self._format_top_items(top_artists, quantity)
+
+    def _filter_new_items(self, key, year: int) -> list[PlayEvent]:
+        listening_history = self.load_listening_history()
+
+        # Determine the first listening time of each item
+        first_listening_times = {}
+        for event in listening_history:
+            item_key = key(event)
+            if item_key not in first_listening_times or event.local_timestamp < first_listening_times[item_key]:
+                first_listening_times[item_key] = event.local_timestamp
+
+        # Filter out all of the items that have a first listening date before the year started
+        year_start = to_epoch(datetime(year, 1, 1))
+        return [event for event in listening_history if first_listening_times[key(event)] >= year_start]
+
+    def _format_top_items(self, counts: dict[str, int], quantity: int) -> list[str]:
+        # Sort the items by number of plays
+        sorted_items = sorted(counts.items(), key=lambda x: x[1], reverse=True)
+
+        # Return the top items with play counts
+        return [f"{i+1}. {item[0]} - {item[1]} plays" for i, item in enumerate(sorted_items[:quantity])]
 
 if __name__ == "__main__":
     history_analyzer = HistoryAnalyzer()
@@ -201,11 +322,13 @@ if __name__ == "__main__":
         print("4. Get top new tracks for a year")
         print("5. Get top new albums for a year")
         print("6. Get top new artists for a year")
-        print("7. Exit")
+        print("7. Get listening stats (sessions, skips, heatmap, streaks)")
+        print("8. Run a SQL query (tables: plays, library_tracks, artist_genres)")
+        print("9. Exit")
 
-        choice = input("\nEnter your choice (1-7): ")
+        choice = input("\nEnter your choice (1-9): ")
 
-        if choice == "7":
+        if choice == "9":
             break
 
         if choice in ["1", "2", "3"]:
@@ -224,19 +347,29 @@ if __name__ == "__main__":
                 print("\n".join(history_analyzer.get_top_tracks(quantity, start_date, end_date)))
 
         elif choice in ["4", "5", "6"]:
-            start_date = datetime.strptime(input("Enter start date (YYYY-MM-DD): "), "%Y-%m-%d")
-            end_date = datetime.strptime(input("Enter end date (YYYY-MM-DD): "), "%Y-%m-%d")
+            year = int(input("Enter year (YYYY): "))
             quantity = int(input("Enter number of results to show: "))
 
             if choice == "4":
                 print("\nTop New Tracks:")
-                print("\n".join(history_analyzer.get_top_new_tracks_of_the_year(quantity, start_date, end_date)))
+                print("\n".join(history_analyzer.get_top_new_tracks_of_the_year(quantity, year)))
             elif choice == "5":
                 print("\nTop New Albums:")
-                print("\n".join(history_analyzer.get_top_new_albums_of_the_year(quantity, start_date, end_date)))
+                print("\n".join(history_analyzer.get_top_new_albums_of_the_year(quantity, year)))
             elif choice == "6":
                 print("\nTop New Artists:")
-                print("\n".join(history_analyzer.get_top_new_artists_of_the_year(quantity, start_date, end_date)))
+                print("\n".join(history_analyzer.get_top_new_artists_of_the_year(quantity, year)))
         
+        elif choice == "7":
+            start_date = datetime.strptime(input("Enter start date (YYYY-MM-DD): "), "%Y-%m-%d")
+            end_date = datetime.strptime(input("Enter end date (YYYY-MM-DD): "), "%Y-%m-%d")
+
+            print("\nListening Stats:")
+            print(json.dumps(history_analyzer.get_listening_stats(start_date, end_date), indent=2))
+
+        elif choice == "8":
+            print()
+            print_table(HistoryDatabase().query(input("Enter SQL query: ")))
+
         else:
             print("\nInvalid choice. Please try again.")
\ No newline at end of file
@@ -0,0 +1,190 @@
+""" SQLite database over the processed listening history and the library metadata, so
+new questions can be answered with a query instead of another HistoryAnalyzer method.
+
+Example:
+    python src/history_database.py "SELECT artist, COUNT(*) AS plays FROM plays GROUP BY artist ORDER BY plays DESC LIMIT 10"
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from file_handler import FileHandler
+import json_codec
+from metrics import METRICS
+from play_event import PlayEvent
+
+class HistoryDatabase:
+    DATABASE_FILE = 'history.db'
+    LIBRARY_FILE = 'library_tracks_simplified.json'
+
+    SCHEMA = """
+        CREATE TABLE plays (
+            epoch INTEGER NOT NULL,         -- UTC seconds since 1970
+            utc_offset INTEGER NOT NULL,    -- local offset in seconds, 0 without a configured time zone
+            local_date TEXT NOT NULL,       -- 'YYYY-MM-DD' in local time
+            timestamp TEXT NOT NULL,        -- 'YYYY-MM-DD HH:MM:SS' UTC, as in the processed file
+            duration_s REAL NOT NULL,
+            track TEXT,
+            artist TEXT,
+            album TEXT,
+            track_id TEXT
+        );
+        CREATE TABLE library_tracks (
+            id TEXT PRIMARY KEY,
+            name TEXT,
+            artist TEXT,
+            artist_id TEXT,
+            album TEXT,
+            album_id TEXT,
+            added_at TEXT
+        );
+        CREATE TABLE artist_genres (
+            artist TEXT,
+            artist_id TEXT,
+            genre TEXT
+        );
+        CREATE INDEX plays_epoch ON plays (epoch);
+        CREATE INDEX plays_local_date ON plays (local_date);
+        CREATE INDEX plays_track ON plays (track);
+        CREATE INDEX plays_artist ON plays (artist);
+        CREATE INDEX plays_album ON plays (album);
+        CREATE INDEX plays_track_id ON plays (track_id);
+        CREATE INDEX artist_genres_artist_id ON artist_genres (artist_id);
+        CREATE INDEX artist_genres_genre ON artist_genres (genre);
+    """
+
+    def __init__(self) -> None:
+        self.file_handler = FileHandler()
+
+    @property
+    def database_path(self) -> str:
+        return self.file_handler.processed_file_path(self.DATABASE_FILE)
+
+    def source_paths(self) -> list[str]:
+        # Files the database is built from, the history is required and the rest are optional
+        return [self.file_handler.modified_data_path(), self.file_handler.processed_file_path(self.LIBRARY_FILE)]
+
+    def is_current(self) -> bool:
+        if not os.path.exists(self.database_path):
+            return False
+        database_time = os.path.getmtime(self.database_path)
+        return all(os.path.getmtime(path) <= database_time for path in self.source_paths() if os.path.exists(path))
+
+    def ensure_current(self) -> None:
+        # Only rebuild when a source file changed since the last build
+        is_current = self.is_current()
+        METRICS.cache_lookup('history_database', is_current)
+        if not is_current:
+            with METRICS.timer('analyzer_seconds', operation='build_database'):
+                self.build()
+
+    def build(self) -> None:
+        """Rebuild the database from the processed files, replacing it atomically"""
+        temp_path = f"{self.database_path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        connection = sqlite3.connect(temp_path)
+        try:
+            # Nothing to protect until the file is swapped in, so skip journaling
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.executescript(self.SCHEMA)
+
+            connection.executemany('INSERT INTO plays VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self._play_rows())
+
+            library_path = self.file_handler.processed_file_path(self.LIBRARY_FILE)
+            if os.path.exists(library_path):
+                with open(library_path, 'r', encoding='utf-8') as f:
+                    library_tracks = json_codec.load(f)
+                self._insert_library(connection, library_tracks)
+
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(temp_path, self.database_path)
+
+    def query(self, sql: str, parameters: tuple = ()) -> list[dict]:
+        """
+        Run a read-only query, rebuilding the database first if it's stale.
+
+        Returns:
+            list: One dict per row keyed by column name
+        """
+        self.ensure_current()
+
+        connection = sqlite3.connect(f"file:{self.database_path}?mode=ro", uri=True)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, parameters)]
+        finally:
+            connection.close()
+
+    def _play_rows(self):
+        # Stream rows straight from the processed file, formatting each local day once
+        local_dates = {}
+        for item in self.file_handler.iter_modified_data():
+            event = PlayEvent.from_processed(item)
+            day_number = event.local_timestamp // 86400
+            local_date = local_dates.get(day_number)
+            if local_date is None:
+                local_date = local_dates[day_number] = time.strftime('%Y-%m-%d', time.gmtime(day_number * 86400))
+            yield (
+                event.timestamp,
+                event.utc_offset or 0,
+                local_date,
+                event.timestamp_string,
+                event.duration_ms / 1000,
+                event.track,
+                event.artist,
+                event.album,
+                event.track_id
+            )
+
+    def _insert_library(self, connection: sqlite3.Connection, library_tracks: list[dict]) -> None:
+        connection.executemany(
+            'INSERT OR IGNORE INTO library_tracks VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((track['id'], track['name'], track['artist'], track.get('artist_id'), track['album'], track.get('album_id'), track['added_at']) for track in library_tracks)
+        )
+
+        # Genres are stored per artist, one row per genre
+        artist_genres = {}
+        for track in library_tracks:
+            artist_genres.setdefault((track['artist'], track.get('artist_id')), set()).update(track.get('genres', []))
+        connection.executemany(
+            'INSERT INTO artist_genres VALUES (?, ?, ?)',
+            ((artist, artist_id, genre) for (artist, artist_id), genres in artist_genres.items() for genre in sorted(genres))
+        )
+
+def print_table(rows: list[dict]) -> None:
+    if not rows:
+        print("(no rows)")
+        return
+
+    columns = list(rows[0])
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in rows)) for column in columns]
+    print('  '.join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the listening history with SQL (tables: plays, library_tracks, artist_genres)")
+    parser.add_argument('sql', help="SQL query to run")
+    parser.add_argument('--json', action='store_true', help="Print rows as JSON instead of a table")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the database even if it's up to date")
+    args = parser.parse_args()
+
+    history_database = HistoryDatabase()
+    if args.rebuild:
+        history_database.build()
+
+    rows = history_database.query(args.sql)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
@@ -0,0 +1,132 @@
+import calendar
+import os
+import time
+from datetime import datetime, timedelta
+
+import json_codec
+from play_event import PlayEvent
+
+class HistoryRollups:
+    """
+    Play counts and listening time per track, artist and album, pre-aggregated into
+    day and month buckets (in local time when a time zone was configured).
+
+    Buckets are filled one play at a time while the processed history is written. A
+    date range query then sums the whole months it covers plus the leftover days at
+    either end, so it reads at most a few dozen buckets however long the history is.
+    """
+    ENTITY_TYPES = ('tracks', 'artists', 'albums')
+    FILE_NAME = 'history_rollups.json'
+
+    def __init__(self) -> None:
+        # bucket key -> entity type -> entity key -> [plays, milliseconds played]
+        self.days = {}
+        self.months = {}
+        # Epoch seconds (UTC) of the latest play added, lets appends skip reading the history
+        self.last_timestamp = None
+        self._day_keys = {}
+
+    @staticmethod
+    def entity_keys(event: PlayEvent) -> tuple[str, str, str]:
+        # Same labels HistoryAnalyzer reports, in ENTITY_TYPES order
+        return f"{event.track} - {event.artist}", event.artist, f"{event.album} - {event.artist}"
+
+    def add(self, event: PlayEvent) -> None:
+        day_key, month_key = self._bucket_keys(event.local_timestamp)
+        if self.last_timestamp is None or event.timestamp > self.last_timestamp:
+            self.last_timestamp = event.timestamp
+
+        for bucket in (self._bucket(self.days, day_key), self._bucket(self.months, month_key)):
+            for entity_type, entity_key in zip(self.ENTITY_TYPES, self.entity_keys(event)):
+                totals = bucket[entity_type].get(entity_key)
+                if totals is None:
+                    bucket[entity_type][entity_key] = [1, event.duration_ms]
+                else:
+                    totals[0] += 1
+                    totals[1] += event.duration_ms
+
+    def add_many(self, events) -> None:
+        for event in events:
+            self.add(event)
+
+    def top(self, entity_type: str, quantity: int, query_start_date: datetime, query_end_date: datetime, by: str = 'plays') -> list[tuple[str, int, float]]:
+        """
+        Get the top entities between two dates.
+
+        Args:
+            entity_type: 'tracks', 'artists' or 'albums'
+            quantity: Number of entities to return
+            query_start_date: First day to include (midnight)
+            query_end_date: Day to stop at (midnight, not included)
+            by: Rank by 'plays' or 'seconds' listened
+
+        Returns:
+            list: (entity, plays, seconds listened) tuples, best first
+        """
+        if entity_type not in self.ENTITY_TYPES:
+            raise ValueError(f'Invalid entity_type: {entity_type}')
+
+        # Add up the bucket vectors covering the range
+        totals = {}
+        for bucket in self._covering_buckets(query_start_date.date(), query_end_date.date()):
+            for entity_key, (plays, milliseconds) in bucket.get(entity_type, {}).items():
+                entity_totals = totals.get(entity_key)
+                if entity_totals is None:
+                    totals[entity_key] = [plays, milliseconds]
+                else:
+                    entity_totals[0] += plays
+                    entity_totals[1] += milliseconds
+
+        sort_index = 0 if by == 'plays' else 1
+        sorted_totals = sorted(totals.items(), key=lambda x: x[1][sort_index], reverse=True)
+
+        return [(entity_key, plays, round(milliseconds / 1000, 2)) for entity_key, (plays, milliseconds) in sorted_totals[:quantity]]
+
+    def save(self, file_path: str) -> None:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({'days': self.days, 'months': self.months, 'last_timestamp': self.last_timestamp}, f)
+        os.replace(temp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'HistoryRollups':
+        rollups = cls()
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json_codec.load(f)
+        rollups.days = data['days']
+        rollups.months = data['months']
+        # Files saved before the field existed don't have it
+        rollups.last_timestamp = data.get('last_timestamp')
+        return rollups
+
+    def _covering_buckets(self, start_day, end_day):
+        # Walk forward using a month bucket whenever a whole month fits, otherwise a day bucket
+        current_day = start_day
+        while current_day < end_day:
+            days_in_month = calendar.monthrange(current_day.year, current_day.month)[1]
+            next_month = current_day.replace(day=1) + timedelta(days=days_in_month)
+
+            if current_day.day == 1 and next_month <= end_day:
+                bucket = self.months.get(current_day.strftime('%Y-%m'))
+                current_day = next_month
+            else:
+                bucket = self.days.get(current_day.strftime('%Y-%m-%d'))
+                current_day += timedelta(days=1)
+
+            if bucket:
+                yield bucket
+
+    def _bucket_keys(self, timestamp: int) -> tuple[str, str]:
+        day_number = timestamp // 86400
+        keys = self._day_keys.get(day_number)
+        if keys is None:
+            day_key = time.strftime('%Y-%m-%d', time.gmtime(day_number * 86400))
+            keys = self._day_keys[day_number] = (day_key, day_key[:7])
+        return keys
+
+    def _bucket(self, buckets: dict, key: str) -> dict:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {entity_type: {} for entity_type in self.ENTITY_TYPES}
+        return bucket
@@ -0,0 +1,51 @@
+""" JSON encoding and decoding through the fastest backend that's installed.
+
+orjson is used when it's available (pip install orjson) and the standard json module
+otherwise, so nothing else needs to know which one is in use. Output is the same with
+either backend: non-ASCII text is written as UTF-8 rather than \\u escapes, so files
+have to be opened with encoding='utf-8'. Indented output uses orjson for indent=2, the
+only width it supports, and the json module for any other width.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+_compact_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+def loads(data: 'str | bytes'):
+    """Decode a JSON document from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj, indent: int = None, default=None) -> str:
+    """
+    Encode obj as JSON.
+
+    Args:
+        obj: Value to encode
+        indent: Spaces per level, None for compact output without spaces
+        default: Called for objects that aren't JSON serializable, like json.dumps' default
+    """
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=default, option=option).decode('utf-8')
+    if indent is None:
+        if default is None:
+            return _compact_encoder.encode(obj)
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=default)
+    return json.dumps(obj, indent=indent, ensure_ascii=False, default=default)
+
+def load(f):
+    """Decode the JSON document in an open file"""
+    return loads(f.read())
+
+def dump(obj, f, indent: int = None) -> None:
+    """Encode obj as JSON into an open text file"""
+    f.write(dumps(obj, indent=indent))
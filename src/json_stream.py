@@ -0,0 +1,414 @@
+import gzip
+import itertools
+import json
+import os
+
+import json_codec
+
+class JsonArrayReader:
+    """
+    Iterate over the items of a top-level JSON array without loading the whole file.
+
+    Only one read chunk plus the item being decoded is held in memory at a time,
+    so a multi-gigabyte export is read in bounded memory.
+    """
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, file_path: str, chunk_size: int = 1 << 16) -> None:
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            buffer = ''
+            position = 0
+            at_eof = False
+
+            def read_more(buffer, position):
+                # Drop what we've already decoded before appending the next chunk
+                chunk = f.read(self.chunk_size)
+                return buffer[position:] + chunk, 0, not chunk
+
+            # Find the opening bracket
+            while True:
+                position = self._skip_whitespace(buffer, position)
+                if position < len(buffer):
+                    break
+                if at_eof:
+                    raise ValueError(f"{self.file_path} is empty, expected a JSON array")
+                buffer, position, at_eof = read_more(buffer, position)
+
+            if buffer[position] != '[':
+                raise ValueError(f"{self.file_path} does not contain a JSON array")
+            position += 1
+            expect_item = True
+
+            while True:
+                position = self._skip_whitespace(buffer, position)
+
+                # Make sure there's something to look at before deciding what comes next
+                if position >= len(buffer):
+                    if at_eof:
+                        raise ValueError(f"Unexpected end of file in {self.file_path}")
+                    buffer, position, at_eof = read_more(buffer, position)
+                    continue
+
+                if buffer[position] == ']':
+                    return
+                if buffer[position] == ',' and not expect_item:
+                    position += 1
+                    expect_item = True
+                    continue
+
+                try:
+                    item, end = self._decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The item is cut off by the end of the chunk
+                    if at_eof:
+                        raise
+                    buffer, position, at_eof = read_more(buffer, position)
+                    continue
+
+                # A number at the very end of the buffer might continue in the next chunk
+                if end == len(buffer) and not at_eof:
+                    buffer, position, at_eof = read_more(buffer, position)
+                    continue
+
+                yield item
+                position = end
+                expect_item = False
+
+    def _skip_whitespace(self, buffer: str, position: int) -> int:
+        while position < len(buffer) and buffer[position] in self.WHITESPACE:
+            position += 1
+        return position
+
+class JsonArrayWriter:
+    """
+    Write items to a JSON array file one at a time.
+
+    Items go to a temporary file that replaces the target only once the array is
+    closed, so the target can be one of the files being read from and a failed
+    write never leaves a half-written file behind.
+    """
+    def __init__(self, file_path: str, indent: int = None) -> None:
+        self.file_path = file_path
+        self.indent = indent
+        self.temp_path = f"{file_path}.tmp"
+        self.count = 0
+        self._file = None
+        # Without an indent drop the spaces after separators too
+        self._encode = json_codec.dumps if indent is None else None
+
+    def __enter__(self):
+        self._file = open(self.temp_path, 'w', encoding='utf-8')
+        self._file.write('[')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            # Throw away the partial output and leave the original file alone
+            self._file.close()
+            os.remove(self.temp_path)
+            return
+
+        self._file.write('\n]' if self.indent is not None and self.count else ']')
+        self._file.close()
+        os.replace(self.temp_path, self.file_path)
+
+    def write(self, item) -> None:
+        separator = ',' if self.count else ''
+
+        if self.indent is None:
+            self._file.write(separator + self._encode(item))
+        else:
+            # Match the layout json.dump(data, f, indent=...) produces for the whole list
+            padding = ' ' * self.indent
+            encoded = json_codec.dumps(item, indent=self.indent).replace('\n', '\n' + padding)
+            self._file.write(f"{separator}\n{padding}{encoded}")
+
+        self.count += 1
+
+    def write_many(self, items) -> None:
+        for item in items:
+            self.write(item)
+
+class JsonLinesWriter:
+    """
+    Write one compact JSON document per line.
+
+    A new file is written to a temporary file and renamed into place on close, like
+    JsonArrayWriter. With append=True lines are added to the end of the existing file
+    instead, so new plays don't require rewriting the old ones. A line left incomplete
+    by an interrupted append is cut off before appending again.
+    """
+    def __init__(self, file_path: str, append: bool = False) -> None:
+        self.file_path = file_path
+        self.append = append
+        self.temp_path = f"{file_path}.tmp"
+        self.count = 0
+        self._file = None
+        self._encode = json_codec.dumps
+
+    def __enter__(self):
+        if self.append and os.path.exists(self.file_path):
+            _truncate_partial_line(self.file_path)
+            self._file = open(self.file_path, 'a', encoding='utf-8')
+        else:
+            self.append = False
+            self._file = open(self.temp_path, 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._file.close()
+        if self.append:
+            return
+
+        if exc_type is not None:
+            os.remove(self.temp_path)
+            return
+        os.replace(self.temp_path, self.file_path)
+
+    def write(self, item) -> None:
+        self._file.write(self._encode(item) + '\n')
+        self.count += 1
+
+    def write_many(self, items) -> None:
+        for item in items:
+            self.write(item)
+
+class ColumnarWriter:
+    """
+    Write records as gzip-compressed JSON with one array per field instead of one
+    object per record.
+
+    Field names are stored once, and string fields with many repeats (track, artist,
+    album) are dictionary-encoded into a list of distinct values plus integer indices,
+    which makes the file several times smaller than the row layout. The columns are
+    built in memory and written to a temporary file that's renamed into place.
+    """
+    # Low levels compress this layout almost as well and much faster
+    COMPRESS_LEVEL = 3
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.temp_path = f"{file_path}.tmp"
+        self.count = 0
+        # field -> list of values, in first-seen field order
+        self.columns = {}
+        # Row numbers where a field is missing, for fields not present in every record
+        self.missing = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            return
+
+        try:
+            encoded = json_codec.dumps({
+                'count': self.count,
+                'columns': {field: self._encode_column(values) for field, values in self.columns.items()},
+                'missing': self.missing
+            })
+            with gzip.open(self.temp_path, 'wb', compresslevel=self.COMPRESS_LEVEL) as f:
+                f.write(encoded.encode('utf-8'))
+        except BaseException:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+            raise
+        os.replace(self.temp_path, self.file_path)
+
+    def write(self, item: dict) -> None:
+        columns = self.columns
+        for field, value in item.items():
+            values = columns.get(field)
+            if values is None:
+                # A field that first shows up now was missing from every earlier record
+                values = columns[field] = [None] * self.count
+                if self.count:
+                    self.missing[field] = list(range(self.count))
+            values.append(value)
+
+        # Pad the fields this record doesn't have
+        if len(item) != len(columns):
+            for field, values in columns.items():
+                if len(values) == self.count:
+                    values.append(None)
+                    self.missing.setdefault(field, []).append(self.count)
+
+        self.count += 1
+
+    def write_many(self, items) -> None:
+        for item in items:
+            self.write(item)
+
+    def _encode_column(self, values: list) -> dict:
+        # Dictionary-encode string columns that repeat a lot
+        if values and all(isinstance(value, str) or value is None for value in values):
+            distinct = {}
+            indices = [distinct.setdefault(value, len(distinct)) for value in values]
+            if len(distinct) * 2 <= len(values):
+                return {'dictionary': list(distinct), 'indices': indices}
+        return {'values': values}
+
+# Output formats for processed data and the file extension each one uses
+OUTPUT_FORMATS = {
+    'json': '.json',
+    'json_pretty': '.json',
+    'jsonl': '.jsonl',
+    'columnar': '.columns.json.gz'
+}
+
+def iter_json_array(file_path: str):
+    """Yield the items of the JSON array stored in file_path"""
+    return iter(JsonArrayReader(file_path))
+
+def write_json_array(items, file_path: str, indent: int = None) -> int:
+    """
+    Stream an iterable of items into a JSON array file.
+
+    Returns:
+        int: Number of items written
+    """
+    with JsonArrayWriter(file_path, indent=indent) as writer:
+        writer.write_many(items)
+    return writer.count
+
+def iter_json_lines(file_path: str):
+    """Yield the documents of a JSON Lines file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json_codec.loads(line)
+
+def read_last_json_line(file_path: str):
+    """
+    The last complete document of a JSON Lines file, read from the end without
+    scanning the rest. None if the file has none.
+    """
+    with open(file_path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b''
+        while position > 0:
+            step = min(position, 1 << 16)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            # A partial line left by an interrupted append doesn't count
+            complete = tail[:tail.rfind(b'\n') + 1]
+            lines = [line for line in complete.split(b'\n') if line.strip()]
+            # The first line may be cut off unless the start of the file was read
+            if len(lines) > 1 or (lines and position == 0):
+                return json_codec.loads(lines[-1])
+    return None
+
+def iter_columnar(file_path: str):
+    """Yield the records of a file written by ColumnarWriter"""
+    with gzip.open(file_path, 'rb') as f:
+        data = json_codec.loads(f.read())
+
+    columns = {}
+    for field, column in data['columns'].items():
+        if 'dictionary' in column:
+            dictionary = column['dictionary']
+            columns[field] = [dictionary[index] for index in column['indices']]
+        else:
+            columns[field] = column['values']
+    missing = {field: set(rows) for field, rows in data['missing'].items()}
+
+    fields = list(columns)
+    for row, values in enumerate(zip(*(columns[field] for field in fields))):
+        record = dict(zip(fields, values))
+        for field, rows in missing.items():
+            if row in rows:
+                del record[field]
+        yield record
+
+def output_format_for(file_path: str) -> str:
+    """Work out the output format from a file name"""
+    if file_path.endswith(OUTPUT_FORMATS['columnar']):
+        return 'columnar'
+    if file_path.endswith(OUTPUT_FORMATS['jsonl']):
+        return 'jsonl'
+    return 'json'
+
+def iter_records(file_path: str):
+    """Yield the records of a file in any of the OUTPUT_FORMATS"""
+    output_format = output_format_for(file_path)
+    if output_format == 'columnar':
+        return iter_columnar(file_path)
+    if output_format == 'jsonl':
+        return iter_json_lines(file_path)
+    return iter_json_array(file_path)
+
+def write_records(items, file_path: str, output_format: str = 'json') -> int:
+    """
+    Atomically write an iterable of records in one of the OUTPUT_FORMATS.
+
+    Returns:
+        int: Number of records written
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Invalid output_format: {output_format}')
+
+    if output_format == 'columnar':
+        writer = ColumnarWriter(file_path)
+    elif output_format == 'jsonl':
+        writer = JsonLinesWriter(file_path)
+    else:
+        writer = JsonArrayWriter(file_path, indent=2 if output_format == 'json_pretty' else None)
+
+    with writer:
+        writer.write_many(items)
+    return writer.count
+
+def append_records(items, file_path: str) -> int:
+    """
+    Add records to the end of an existing file, or create it. JSON Lines files are
+    appended to in place; the other formats are rewritten atomically with the new
+    records after the old ones.
+
+    Returns:
+        int: Number of records appended
+    """
+    output_format = output_format_for(file_path)
+    if output_format == 'jsonl':
+        with JsonLinesWriter(file_path, append=True) as writer:
+            writer.write_many(items)
+        return writer.count
+
+    items = list(items)
+    if os.path.exists(file_path):
+        # Keep pretty-printed files pretty
+        if output_format == 'json':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                output_format = 'json_pretty' if f.read(2) == '[\n' else 'json'
+        write_records(itertools.chain(iter_records(file_path), items), file_path, output_format)
+    else:
+        write_records(items, file_path, output_format)
+    return len(items)
+
+def _truncate_partial_line(file_path: str) -> None:
+    # Drop anything after the last newline, left behind by an interrupted append
+    with open(file_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+
+        position = size
+        while position > 0:
+            step = min(position, 1 << 16)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(position - step + newline + 1)
+                return
+            position -= step
+        f.truncate(0)
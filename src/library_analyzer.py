@@ -1,14 +1,46 @@
-from api_handler import SpotifyApiClient
+from api_handler import SpotifyApiClient, get_shared_client
+from batch_endpoints import get_batch_endpoint
+from file_handler import FileHandler
+from genre_inference import GenreInference
 from metadata_enricher import MetadataEnricher
-import json
+from metrics import METRICS
+from play_event import PlayEvent
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json_codec
+import logging
+import os
 
 class LibraryAnalyzer:
-    def __init__(self):
-        self.spotify_api_handler = SpotifyApiClient()
-        self.metadata_enricher = MetadataEnricher()
+    # Policies for choosing which copy of a duplicate track stays in the library
+    KEEP_POLICIES = ('earliest_added', 'most_played', 'first')
+    REMOVAL_JOURNAL_PATH = 'data/processed/removed_library_tracks_journal.json'
+    FOLLOWED_ARTISTS_SNAPSHOT_PATH = 'data/processed/followed_artists_snapshot.json'
+    LIBRARY_TRACKS_PATH = 'data/processed/library_tracks_simplified.json'
+    # Spotify's and inferred genres per artist, rebuilt when the library or history changes
+    ARTIST_GENRES_PATH = 'data/processed/artist_genres_inferred.json'
+
+    def __init__(self, spotify_api_handler: SpotifyApiClient = None):
+        # The client and enricher are only created once something needs the API,
+        # so local operations like duplicate finding never authenticate
+        self._spotify_api_handler = spotify_api_handler
+        self._metadata_enricher = None
         self.library_track_data = []  
+        # Page size for paged endpoints, and a cap on batch sizes
         self.MAX_REQUESTS = 50
 
+    @property
+    def spotify_api_handler(self) -> SpotifyApiClient:
+        if self._spotify_api_handler is None:
+            self._spotify_api_handler = get_shared_client()
+        return self._spotify_api_handler
+
+    @property
+    def metadata_enricher(self) -> MetadataEnricher:
+        if self._metadata_enricher is None:
+            self._metadata_enricher = MetadataEnricher(self.spotify_api_handler)
+        return self._metadata_enricher
+
     def get_library_track_count(self) -> int:
         # Get the total number of tracks in the library
         response = self.spotify_api_handler.make_request(
@@ -48,8 +80,8 @@ class LibraryAnalyzer:
             offset += self.MAX_REQUESTS
 
         # Print the raw library track data to JSON 
-        with open('data/raw/library_tracks_raw.json', 'w') as f:
-            json.dump(library_tracks, f, indent=4)
+        with open('data/raw/library_tracks_raw.json', 'w', encoding='utf-8') as f:
+            json_codec.dump(library_tracks, f, indent=2)
 
         # Extract artist IDs from track info
         artist_ids = []
@@ -58,13 +90,14 @@ class LibraryAnalyzer:
             artist_id = track['track']['artists'][0]['id']
             artist_ids.append(artist_id)
         
-        # Get artist information in batches
-        artist_info = self.spotify_api_handler.make_batch_request(
-            items=artist_ids,  # No need to filter None values now
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='artists?ids={}',
-            key='artists'
-        )
+        # Keep the full track objects, so later track lookups this run don't need a request
+        data_loader = self.spotify_api_handler.data_loader
+        for track in library_tracks:
+            data_loader.prime('tracks', track['track']['id'], track['track'])
+
+        # Get artist information in batches, each artist once however many tracks it has.
+        # Local files have no artist ID, those are skipped.
+        artist_info = data_loader.load_many('artists', artist_ids)
         
         # Create a lookup dictionary for artist genres
         artist_genres = {}
@@ -83,7 +116,9 @@ class LibraryAnalyzer:
             track_info = {
                 'name': track['track']['name'],
                 'artist': track['track']['artists'][0]['name'],
+                'artist_id': track['track']['artists'][0]['id'],
                 'album': track['track']['album']['name'],
+                'album_id': track['track']['album']['id'],
                 'id': track['track']['id'],
                 'added_at': track['added_at'],
                 'genres': track['genres']
@@ -91,111 +126,124 @@ class LibraryAnalyzer:
             simplified_tracks.append(track_info)
 
         # Save simplified library tracks to processed folder
-        with open('data/processed/library_tracks_simplified.json', 'w') as f:
-            json.dump(simplified_tracks, f, indent=4)
+        with open('data/processed/library_tracks_simplified.json', 'w', encoding='utf-8') as f:
+            json_codec.dump(simplified_tracks, f, indent=2)
         
         return simplified_tracks
     
-    def get_followed_artists(self) -> list[str]:
-        # Initialize variables for pagination
-        followed_artists = []
-        offset = 0
-
-        # Determine the total number of artists in the library
-        total_followed_artists = self.get_followed_artist_count()
+    def load_library_tracks(self) -> list[dict]:
+        # Use the library saved by get_library_tracks, fetching it only if there isn't one yet
+        if not os.path.exists(self.LIBRARY_TRACKS_PATH):
+            return self.get_library_tracks()
+        with open(self.LIBRARY_TRACKS_PATH, 'r', encoding='utf-8') as f:
+            return json_codec.load(f)
+
+    def get_followed_artists(self, refresh: bool = True) -> list[dict]:
+        """
+        Get the followed artists from the local snapshot, refreshing it first if requested.
+
+        Args:
+            refresh: Fetch the followed artists from the API before returning the snapshot
+
+        Returns:
+            list: Followed artists as {'name', 'id'} dicts
+        """
+        snapshot = self.load_followed_artists_snapshot()
+
+        if refresh or snapshot is None:
+            snapshot = self.refresh_followed_artists_snapshot(snapshot)
+
+        return snapshot['artists']
+
+    def refresh_followed_artists_snapshot(self, snapshot: dict = None) -> dict:
+        """
+        Rebuild the followed artist snapshot by walking every page with the 'after'
+        cursor. The first page's total and IDs can't show an unfollow and a follow further
+        down the list, so every page is read; at 50 artists per page that's cheap. The
+        file is only rewritten when the set of artists changed.
+        """
+        known_artist_ids = {artist['id'] for artist in snapshot['artists']} if snapshot else None
 
-        # Initialize after parameter for pagination
+        followed_artists = []
         after = None
-        
-        while len(followed_artists) < total_followed_artists:
-            # Get batch of artists using cursor-based pagination
-            limit = min(50, total_followed_artists - len(followed_artists))
-            
+
+        while True:
             # Build endpoint with required type parameter
-            endpoint = 'me/following?type=artist'  # Add type=artist
-            
+            endpoint = 'me/following?type=artist'
+
             # Add after parameter if we have one
             if after:
                 endpoint += f'&after={after}'
-                
+
             response = self.spotify_api_handler.make_request(
                 endpoint=endpoint,
                 method='GET',
-                limit=limit
+                limit=self.MAX_REQUESTS
             )
 
             # Add artists from this batch
             current_batch = response['artists']['items']
-            followed_artists.extend(current_batch)
+            followed_artists.extend({'name': artist['name'], 'id': artist['id']} for artist in current_batch)
 
-            # Get the last artist ID for next request
-            if current_batch and len(followed_artists) < total_followed_artists:
-                after = current_batch[-1]['id']
-            else:
+            # Follow the cursor to the next page
+            after = response['artists']['cursors'].get('after') if response['artists'].get('cursors') else None
+            if not current_batch or not after:
                 break
-        
-        # Simplify the followed artists 
-        simplified_followed_artists = []
-        for artist in followed_artists:
-            artist_info = {
-                'name': artist['name'],
-                'id': artist['id']
-            }
-            simplified_followed_artists.append(artist_info)
 
-        # Return the followed artists
-        return simplified_followed_artists
+        # Nothing to rewrite when the same artists are followed
+        unchanged = known_artist_ids == {artist['id'] for artist in followed_artists}
+        METRICS.cache_lookup('followed_artists_snapshot', unchanged)
+        if unchanged:
+            return snapshot
+
+        snapshot = {
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'artists': followed_artists
+        }
+        self.save_followed_artists_snapshot(snapshot)
 
-    def find_unfollowed_library_artists(self) -> list[str]:
+        return snapshot
+
+    def load_followed_artists_snapshot(self) -> dict:
+        if not os.path.exists(self.FOLLOWED_ARTISTS_SNAPSHOT_PATH):
+            return None
+        with open(self.FOLLOWED_ARTISTS_SNAPSHOT_PATH, 'r', encoding='utf-8') as f:
+            return json_codec.load(f)
+
+    def save_followed_artists_snapshot(self, snapshot: dict) -> None:
+        os.makedirs(os.path.dirname(self.FOLLOWED_ARTISTS_SNAPSHOT_PATH), exist_ok=True)
+        with open(self.FOLLOWED_ARTISTS_SNAPSHOT_PATH, 'w', encoding='utf-8') as f:
+            json_codec.dump(snapshot, f, indent=2)
+
+    def find_unfollowed_library_artists(self, refresh: bool = True) -> list[dict]:
         # Get the followed artists
-        followed_artists = self.get_followed_artists()
+        followed_artists = self.get_followed_artists(refresh=refresh)
 
         # Get the library artists
         library_artists = self.load_library_artists()
         
-        # Create a set of followed artist IDs for efficient lookup
-        # Convert IDs to strings to ensure consistent comparison
+        # Everything below is local, it's a set difference between the two snapshots
         followed_artist_ids = {str(artist['id']).strip() for artist in followed_artists}
         
-        # Find artists in library that aren't in followed_artist_ids
-        # Convert library artist IDs to strings as well
-        unfollowed_artists = [
-            artist for artist in library_artists 
+        return [
+            {'name': artist['name'], 'id': str(artist['id']).strip()}
+            for artist in library_artists
             if str(artist['id']).strip() not in followed_artist_ids
         ]
 
-        # Remove duplicates while preserving artist name and id
-        unique_unfollowed_artists = []
-        seen = set()
-        for artist in unfollowed_artists:
-            artist_tuple = (artist['name'], str(artist['id']).strip())
-            if artist_tuple not in seen:
-                seen.add(artist_tuple)
-                unique_unfollowed_artists.append({
-                    'name': artist['name'],
-                    'id': str(artist['id']).strip()
-                })
-        
-        return unique_unfollowed_artists
-
-    def load_library_artists(self) -> list[str]:
+    def load_library_artists(self) -> list[dict]:
         # Open the library tracks file
-        with open('data/processed/library_tracks_simplified.json', 'r') as f:
-            library_tracks = json.load(f)
-
-        # Get all of the track IDs in a list
-        track_ids = [track['id'] for track in library_tracks]
+        with open(self.LIBRARY_TRACKS_PATH, 'r', encoding='utf-8') as f:
+            library_tracks = json_codec.load(f)
 
-        # In batches, make a request to get the track information
-        track_info = self.spotify_api_handler.make_batch_request(
-            items=track_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='tracks?ids={}',
-            key='tracks'
-        )
+        # Use the artist IDs stored in the library snapshot when they're there
+        if library_tracks and 'artist_id' in library_tracks[0]:
+            track_info = [{'artists': [{'name': track['artist'], 'id': track['artist_id']}]} for track in library_tracks]
+        else:
+            track_info = self._fetch_library_track_info(library_tracks)
 
         # Get the artist name and ID from the track information
-        artists = [{'name': track['artists'][0]['name'], 'id': track['artists'][0]['id']} for track in track_info]
+        artists = [{'name': track['artists'][0]['name'], 'id': track['artists'][0]['id']} for track in track_info if track is not None]
 
         # Remove duplicates while preserving artist name and id
         unique_artists = []
@@ -210,24 +258,26 @@ class LibraryAnalyzer:
         # Return the artists
         return artists
 
-    def load_library_albums(self) -> list[str]:
-        # Open the library tracks file
-        with open('data/processed/library_tracks_simplified.json', 'r') as f:
-            library_tracks = json.load(f)
-
-        # Get all of the track IDs in a list    
+    def _fetch_library_track_info(self, library_tracks: list[dict]) -> list[dict]:
+        # Library files written before artist and album IDs were stored need a lookup
         track_ids = [track['id'] for track in library_tracks]
 
         # In batches, make a request to get the track information
-        track_info = self.spotify_api_handler.make_batch_request(
-            items=track_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='tracks?ids={}',
-            key='tracks'
-        )
+        return self.spotify_api_handler.data_loader.load_many('tracks', track_ids)
+
+    def load_library_albums(self) -> list[str]:
+        # Open the library tracks file
+        with open(self.LIBRARY_TRACKS_PATH, 'r', encoding='utf-8') as f:
+            library_tracks = json_codec.load(f)
+
+        # Use the album IDs stored in the library snapshot when they're there
+        if library_tracks and 'album_id' in library_tracks[0]:
+            track_info = [{'album': {'name': track['album'], 'id': track['album_id']}} for track in library_tracks]
+        else:
+            track_info = self._fetch_library_track_info(library_tracks)
 
         # Get the albums and their IDs from the track information
-        albums = [{'name': track['album']['name'], 'id': track['album']['id']} for track in track_info]
+        albums = [{'name': track['album']['name'], 'id': track['album']['id']} for track in track_info if track is not None]
 
         # Remove duplicates while preserving album name and id
         unique_albums = []
@@ -242,19 +292,21 @@ class LibraryAnalyzer:
         # Return the albums
         return albums
 
-    def get_library_genres(self, top_n: int = None) -> list[str]:
-        # Get the library track IDs from the library tracks file
-        with open('data/processed/library_tracks_simplified.json', 'r') as f:
-            library_tracks = json.load(f)
-
-        # Pull all of the track IDs from the library tracks
-        track_ids = [track['id'] for track in library_tracks]
-
-        # Swap the track IDs for the artist IDs
-        artist_ids = self.metadata_enricher.get_ids(track_ids, 'artist')
+    def get_library_genres(self, top_n: int = None, include_inferred: bool = True) -> list[str]:
+        # Get the library tracks from the library tracks file
+        with open(self.LIBRARY_TRACKS_PATH, 'r', encoding='utf-8') as f:
+            library_tracks = json_codec.load(f)
 
-        # Get the genres from the library tracks
-        genres = self.metadata_enricher.get_artist_genres(artist_ids)
+        if library_tracks and 'genres' in library_tracks[0]:
+            # The genres were saved with the tracks, untagged artists get their inferred genres
+            if include_inferred:
+                library_tracks = self.add_inferred_genres(library_tracks)
+            genres = [track['genres'] for track in library_tracks]
+        else:
+            # Older files without genres: swap the track IDs for the artist IDs and look them up
+            track_ids = [track['id'] for track in library_tracks]
+            artist_ids = self.metadata_enricher.get_ids(track_ids, 'artist')
+            genres = [genre_list or [] for genre_list in self.metadata_enricher.get_artist_genres(artist_ids)]
 
         # Provide the genres in a list with the count of each genre
         genre_counts = {}
@@ -275,10 +327,49 @@ class LibraryAnalyzer:
         else:
             return sorted_genres
 
+    def load_genre_inference(self, library_tracks: list[dict] = None) -> GenreInference:
+        """
+        Load the cached artist genres, rebuilding them when the cache is older than the
+        library or the listening history. Building needs no API calls.
+        """
+        file_handler = FileHandler()
+        history_path = file_handler.modified_data_path()
+        source_paths = [path for path in (self.LIBRARY_TRACKS_PATH, history_path) if os.path.exists(path)]
+
+        cache_current = os.path.exists(self.ARTIST_GENRES_PATH) and all(
+            os.path.getmtime(self.ARTIST_GENRES_PATH) >= os.path.getmtime(path) for path in source_paths
+        )
+        METRICS.cache_lookup('artist_genres', cache_current)
+        if cache_current:
+            return GenreInference.load(self.ARTIST_GENRES_PATH)
+
+        if library_tracks is None:
+            library_tracks = self.load_library_tracks()
+        events = []
+        if os.path.exists(history_path):
+            events = sorted((PlayEvent.from_processed(item) for item in file_handler.iter_modified_data()), key=lambda event: event.timestamp)
+
+        genre_inference = GenreInference.build(events, library_tracks)
+        genre_inference.save(self.ARTIST_GENRES_PATH)
+        return genre_inference
+
+    def add_inferred_genres(self, library_tracks: list[dict]) -> list[dict]:
+        """
+        Copies of the library tracks where tracks whose artist has no Spotify genres get
+        the inferred ones, marked with 'genres_inferred': True
+        """
+        genre_inference = self.load_genre_inference(library_tracks)
+        tracks = []
+        for track in library_tracks:
+            if not track.get('genres') and genre_inference.is_inferred(track.get('artist')):
+                track = {**track, 'genres': genre_inference.genres_for(track['artist']), 'genres_inferred': True}
+            tracks.append(track)
+        return tracks
+
     def find_duplicate_library_tracks(self) -> list[str]:
         # Pull in the library track data from file
-        with open('data/processed/library_tracks_simplified.json', 'r') as f:
-            library_track_data = json.load(f)
+        with open('data/processed/library_tracks_simplified.json', 'r', encoding='utf-8') as f:
+            library_track_data = json_codec.load(f)
 
         # Create a dictionary to track unique songs and their duplicates
         seen_tracks = []
@@ -295,11 +386,13 @@ class LibraryAnalyzer:
             # If we've seen this track before, add the ID to the list
             if track_key in seen_tracks:
                 seen_tracks[track_key]['ids'].append(track['id'])
+                seen_tracks[track_key]['added_at'][track['id']] = track['added_at']
             # Otherwise create a new entry
             else:
                 seen_tracks[track_key] = {
                     'artist': track['artist'],
-                    'ids': [track['id']]
+                    'ids': [track['id']],
+                    'added_at': {track['id']: track['added_at']}
                 }
 
         # Convert seen_tracks to list format
@@ -308,61 +401,215 @@ class LibraryAnalyzer:
                 duplicate_tracks.append({
                     track_name: {
                         'artist': track_data['artist'],
-                        'ids': track_data['ids']
+                        'ids': track_data['ids'],
+                        'added_at': track_data['added_at']
                     }
                 })
         # Determine count of duplicate tracks
         print(f"Total duplicate tracks: {len(duplicate_tracks)}")
 
         # Add duplicate tracks to a new file
-        with open('data/processed/duplicate_library_tracks.json', 'w') as f:
-            json.dump(duplicate_tracks, f, indent=4)
+        with open('data/processed/duplicate_library_tracks.json', 'w', encoding='utf-8') as f:
+            json_codec.dump(duplicate_tracks, f, indent=2)
     
-    def remove_duplicate_library_tracks(self, duplicate_tracks: list[str]) -> None:
-        # Initialize list to track track IDs to remove
-        track_ids_to_remove = []
-        
-        # Get the track IDs to remove from the duplicate tracks
-        for track in duplicate_tracks[:]:  # Create a copy for iteration
-            # Pull the additional track IDs to remove (leaving the first one)
-            individual_track_ids_to_remove = list(track.values())[0]['ids'][1:]
-
-            # Add each track ID to a list
-            track_ids_to_remove.extend(individual_track_ids_to_remove)
-        
-        # Remove duplicate tracks in batches
-        while track_ids_to_remove:
-            # Get batch of track IDs to remove
-            batch_size = min(self.MAX_REQUESTS, len(track_ids_to_remove))
-            batch_of_track_ids_to_remove = track_ids_to_remove[:batch_size]
-            
-            # Format the data correctly for the API
-            formatted_data = {"ids": batch_of_track_ids_to_remove}
-            
-            # Remove the batch of track IDs
-            self.spotify_api_handler.make_request(
-                endpoint='me/tracks',
-                method='DELETE',
-                data=formatted_data
-            )
-            
-            # Remove the processed batch
-            track_ids_to_remove = track_ids_to_remove[batch_size:]
+    def get_track_play_counts(self) -> dict[str, int]:
+        # Count plays per track ID from the processed listening history, in whichever format it was written
+        play_counts = {}
+        file_handler = FileHandler()
+        if not os.path.exists(file_handler.modified_data_path()):
+            return play_counts
+
+        for item in file_handler.iter_modified_data():
+            play_counts[item['id']] = play_counts.get(item['id'], 0) + 1
+
+        return play_counts
+
+    def select_duplicate_keeper(self, track_data: dict, keep_policy: str, play_counts: dict[str, int] = None) -> str:
+        """
+        Pick the ID of the copy to keep from a group of duplicate tracks.
+
+        Args:
+            track_data: Duplicate group with 'ids' and optionally 'added_at' (ID -> timestamp)
+            keep_policy: One of KEEP_POLICIES
+            play_counts: Plays per track ID, required for the 'most_played' policy
+
+        Returns:
+            str: The track ID to keep
+        """
+        ids = track_data['ids']
+        # Older duplicate files don't have added_at, treat every copy as equally old
+        added_at = track_data.get('added_at', {})
+
+        if keep_policy == 'first':
+            return ids[0]
+        elif keep_policy == 'earliest_added':
+            # ISO 8601 timestamps sort chronologically as strings; ties keep list order
+            return min(ids, key=lambda track_id: added_at.get(track_id, ''))
+        elif keep_policy == 'most_played':
+            play_counts = play_counts or {}
+            # Most plays wins, then fall back to the earliest added copy
+            return min(ids, key=lambda track_id: (-play_counts.get(track_id, 0), added_at.get(track_id, '')))
+        else:
+            raise ValueError(f'Invalid keep_policy: {keep_policy}')
+
+    def remove_duplicate_library_tracks(self, duplicate_tracks: list[dict], keep_policy: str = 'earliest_added') -> dict:
+        """
+        Remove every copy but one from each group of duplicate tracks, recording the
+        removed tracks in the undo journal so restore_removed_library_tracks can re-add them.
+
+        Args:
+            duplicate_tracks: Output of find_duplicate_library_tracks
+            keep_policy: How to choose the copy to keep, one of KEEP_POLICIES
+
+        Returns:
+            dict: The journal entry for this run
+        """
+        if keep_policy not in self.KEEP_POLICIES:
+            raise ValueError(f'Invalid keep_policy: {keep_policy}')
+
+        # Only load the history when the policy needs it
+        play_counts = self.get_track_play_counts() if keep_policy == 'most_played' else None
+
+        # Get the tracks to remove from the duplicate tracks
+        tracks_to_remove = []
+        for track in duplicate_tracks:
+            track_name, track_data = list(track.items())[0]
+            keep_id = self.select_duplicate_keeper(track_data, keep_policy, play_counts)
+
+            for track_id in track_data['ids']:
+                if track_id != keep_id:
+                    tracks_to_remove.append({
+                        'id': track_id,
+                        'name': track_name,
+                        'added_at': track_data.get('added_at', {}).get(track_id),
+                        'kept_id': keep_id
+                    })
+
+        # Write the journal entry before touching the library so an interrupted run can still be undone
+        journal_entry = {
+            'removed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'keep_policy': keep_policy,
+            'tracks': tracks_to_remove,
+            'failed_ids': [],
+            'restored': False
+        }
+        journal = self.load_removal_journal()
+        journal.append(journal_entry)
+        self.save_removal_journal(journal)
+
+        # Remove the tracks in concurrent batches
+        track_ids_to_remove = [track['id'] for track in tracks_to_remove]
+        journal_entry['failed_ids'] = self._run_library_track_batches('DELETE', [{"ids": batch} for batch in self._split_batches(track_ids_to_remove)])
+
+        # Record any batches that didn't go through
+        self.save_removal_journal(journal)
+        print(f"Removed {len(track_ids_to_remove) - len(journal_entry['failed_ids'])} duplicate tracks ({len(journal_entry['failed_ids'])} failed)")
+
+        return journal_entry
+
+    def restore_removed_library_tracks(self) -> int:
+        """
+        Re-add every track in the undo journal that hasn't been restored yet, keeping
+        the original added_at dates.
+
+        Returns:
+            int: Number of tracks restored
+        """
+        journal = self.load_removal_journal()
+        restored_count = 0
+
+        for journal_entry in journal:
+            if journal_entry['restored']:
+                continue
+
+            # Tracks whose removal failed are still in the library
+            failed_ids = set(journal_entry['failed_ids'])
+            tracks_to_restore = [track for track in journal_entry['tracks'] if track['id'] not in failed_ids]
+
+            # Send the original added_at dates when we have them so the library order is preserved
+            bodies = []
+            for batch in self._split_batches(tracks_to_restore):
+                if all(track['added_at'] for track in batch):
+                    bodies.append({"timestamped_ids": [{'id': track['id'], 'added_at': track['added_at']} for track in batch]})
+                else:
+                    bodies.append({"ids": [track['id'] for track in batch]})
+
+            # Save the tracks back to the library in concurrent batches
+            restore_failed_ids = self._run_library_track_batches('PUT', bodies)
+
+            restored_count += len(tracks_to_restore) - len(restore_failed_ids)
+            # Leave the entry open if anything failed so it can be retried
+            journal_entry['restored'] = not restore_failed_ids
+            self.save_removal_journal(journal)
+
+        return restored_count
+
+    def load_removal_journal(self) -> list[dict]:
+        if not os.path.exists(self.REMOVAL_JOURNAL_PATH):
+            return []
+        with open(self.REMOVAL_JOURNAL_PATH, 'r', encoding='utf-8') as f:
+            return json_codec.load(f)
+
+    def save_removal_journal(self, journal: list[dict]) -> None:
+        os.makedirs(os.path.dirname(self.REMOVAL_JOURNAL_PATH), exist_ok=True)
+        with open(self.REMOVAL_JOURNAL_PATH, 'w', encoding='utf-8') as f:
+            json_codec.dump(journal, f, indent=2)
+
+    def _split_batches(self, items: list) -> list[list]:
+        # Saves and removals share me/tracks' limit, MAX_REQUESTS can only lower it
+        batch_size = min(self.MAX_REQUESTS, get_batch_endpoint('save-tracks').max_ids)
+        return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    def _run_library_track_batches(self, method: str, bodies: list[dict]) -> list[str]:
+        """
+        Send me/tracks requests concurrently. The client's rate limiter and concurrency
+        limiter are shared between the worker threads, so this stays within the request
+        budget and backs off when Spotify starts throttling.
+
+        Returns:
+            list: Track IDs from batches that failed
+        """
+        failed_ids = []
+
+        # Enough workers for the largest window, the limiter decides how many actually run
+        with ThreadPoolExecutor(max_workers=self.spotify_api_handler.concurrency_limiter.max_limit) as executor:
+            futures = [
+                executor.submit(self.spotify_api_handler.make_request, endpoint='me/tracks', method=method, data=body)
+                for body in bodies
+            ]
+
+            for body, future in zip(bodies, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    batch_ids = body['ids'] if 'ids' in body else [track['id'] for track in body['timestamped_ids']]
+                    logging.warning(f"{method} me/tracks failed for {len(batch_ids)} tracks: {str(e)}")
+                    failed_ids.extend(batch_ids)
+
+        return failed_ids
 
     def follow_library_artists(self) -> None:
         # Get the unfollowed artists from my library
         unfollowed_artists = self.find_unfollowed_library_artists()
 
-        # Isolate the artist IDs
-        unfollowed_artist_ids = [artist['id'] for artist in unfollowed_artists]
-
-        # In batches, follow the unfollowed artists
-        self.spotify_api_handler.make_batch_request(
-            items=unfollowed_artist_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='me/following?type=artist&ids={}',
-            method='PUT'
+        # In batches, follow only the artists that are missing. The IDs go in the body,
+        # so long batches never hit a URL length limit.
+        follow_result = self.spotify_api_handler.make_batch_request(
+            items=[artist['id'] for artist in unfollowed_artists],
+            endpoint='follow-artists',
+            max_batch_size=self.MAX_REQUESTS
         )
+        newly_followed_artists = [artist for artist, followed in zip(unfollowed_artists, follow_result) if followed]
+        for artist_id, error in follow_result.errors.items():
+            logging.warning(f"Follow request failed for artist {artist_id}: {error}")
+
+        # Keep the snapshot in step with what we just followed, for callers that skip the refresh
+        snapshot = self.load_followed_artists_snapshot()
+        if snapshot is not None and newly_followed_artists:
+            snapshot['artists'].extend(newly_followed_artists)
+            self.save_followed_artists_snapshot(snapshot)
+
+        print(f"Followed {len(newly_followed_artists)} of {len(unfollowed_artists)} unfollowed library artists")
     
 
 if __name__ == '__main__':
@@ -381,6 +628,7 @@ if __name__ == '__main__':
         print("9. Following - Fetch unfollowed library artists") 
         print("10. Following - Follow unfollowed library artists")
         print("11. Genres - Get library genres")
+        print("12. Duplicates - Restore removed duplicate tracks")
         print("99. Exit")
         
         choice = input("\nEnter your choice (1-99): ")
@@ -414,13 +662,14 @@ if __name__ == '__main__':
             
         elif choice == '6':
             try:
-                with open('data/processed/duplicate_library_tracks.json', 'r') as f:
-                    duplicate_tracks = json.load(f)
+                with open('data/processed/duplicate_library_tracks.json', 'r', encoding='utf-8') as f:
+                    duplicate_tracks = json_codec.load(f)
                 print(f"\nFound {len(duplicate_tracks)} duplicate tracks to remove")
+                keep_policy = input(f"Which copy should be kept? ({'/'.join(LibraryAnalyzer.KEEP_POLICIES)}, press Enter for earliest_added): ").strip() or 'earliest_added'
                 confirm = input("Do you want to proceed with removal? (y/n): ")
                 if confirm.lower() == 'y':
-                    analyzer.remove_duplicate_library_tracks(duplicate_tracks)
-                    print("Successfully removed duplicate tracks")
+                    analyzer.remove_duplicate_library_tracks(duplicate_tracks, keep_policy)
+                    print(f"Removed tracks have been journaled to '{LibraryAnalyzer.REMOVAL_JOURNAL_PATH}'")
             except FileNotFoundError:
                 print("\nNo duplicate tracks file found. Please run option 5 first.")
                 
@@ -454,6 +703,11 @@ if __name__ == '__main__':
             print(f"Successfully retrieved library genres")
             print(library_genres)
             
+        elif choice == '12':
+            print("\nRestoring removed duplicate tracks...")
+            restored_count = analyzer.restore_removed_library_tracks()
+            print(f"Successfully restored {restored_count} tracks")
+            
         elif choice == '99':
             print("\nGoodbye!")
             break
@@ -0,0 +1,211 @@
+import time
+
+from play_event import PlayEvent
+
+class ListeningAnalytics:
+    """
+    Streaming analytics over time-sorted plays: listening sessions, skip rates,
+    completion ratios, hour-of-day/weekday heatmaps and daily streaks.
+
+    Plays are consumed one at a time with add(), so a run is O(n) in the number of
+    plays and only keeps running totals per entity, never the plays themselves.
+
+    Spotify's timestamp marks when a play stopped, so a play started at
+    timestamp - duration. A new session starts when the time between the end of one
+    play and the start of the next is longer than session_gap_seconds. A play shorter
+    than skip_threshold_seconds counts as a skip. Track lengths aren't in the export,
+    so completion is measured against the longest play seen for each track.
+    """
+    ENTITY_TYPES = ('tracks', 'artists', 'albums')
+    WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+    def __init__(self, session_gap_seconds: int = 30 * 60, skip_threshold_seconds: int = 30, entity_type: str = None) -> None:
+        """
+        Args:
+            session_gap_seconds: Idle time that ends a listening session
+            skip_threshold_seconds: Plays shorter than this count as skips
+            entity_type: Also collect per-entity stats for 'tracks', 'artists' or 'albums'
+        """
+        if entity_type is not None and entity_type not in self.ENTITY_TYPES:
+            raise ValueError(f'Invalid entity_type: {entity_type}')
+
+        self.session_gap_ms = session_gap_seconds * 1000
+        self.skip_threshold_ms = skip_threshold_seconds * 1000
+        self.entity_type = entity_type
+
+        self.plays = 0
+        self.skips = 0
+        self.listening_ms = 0
+        self.heatmap = [[0] * 24 for _ in self.WEEKDAYS]
+
+        # Sessions
+        self.session_count = 0
+        self.session_total_ms = 0
+        self.longest_session_ms = 0
+        self._session_start_ms = None
+        self._last_end_ms = None
+
+        # Daily streaks
+        self._streak = _Streak()
+
+        # Completion needs the longest play per track, which is only known at the end
+        self._tracks = {}
+        self._entities = {}
+
+    def add(self, event: PlayEvent) -> None:
+        duration_ms = event.duration_ms
+        end_ms = event.timestamp * 1000
+        start_ms = end_ms - duration_ms
+        is_skip = duration_ms < self.skip_threshold_ms
+
+        self.plays += 1
+        self.listening_ms += duration_ms
+        if is_skip:
+            self.skips += 1
+
+        # Sessions split on idle gaps
+        if self._last_end_ms is None or start_ms - self._last_end_ms > self.session_gap_ms:
+            self._close_session()
+            self._session_start_ms = start_ms
+            self.session_count += 1
+        self._last_end_ms = max(end_ms, self._last_end_ms or end_ms)
+
+        # Heatmap and streaks use local wall-clock time
+        local_timestamp = event.local_timestamp
+        day_number = local_timestamp // 86400
+        # 1970-01-01 was a Thursday
+        self.heatmap[(day_number + 3) % 7][local_timestamp % 86400 // 3600] += 1
+        self._streak.add(day_number)
+
+        # Per-track totals for completion ratios
+        track_key = f"{event.track} - {event.artist}"
+        track_totals = self._tracks.get(track_key)
+        if track_totals is None:
+            self._tracks[track_key] = [duration_ms, duration_ms, 1]
+        else:
+            track_totals[0] += duration_ms
+            track_totals[1] = max(track_totals[1], duration_ms)
+            track_totals[2] += 1
+
+        if self.entity_type:
+            entity_key = self._entity_key(event, track_key)
+            entity_stats = self._entities.get(entity_key)
+            if entity_stats is None:
+                entity_stats = self._entities[entity_key] = _EntityStats()
+            entity_stats.add(duration_ms, is_skip, day_number, track_key)
+
+    def add_many(self, events) -> None:
+        for event in events:
+            self.add(event)
+
+    def results(self) -> dict:
+        """Summarize everything seen so far"""
+        self._close_session()
+
+        # Completion per track is total listened over (plays x longest play)
+        track_completion = {
+            track_key: total_ms / (longest_ms * plays) if longest_ms else 0.0
+            for track_key, (total_ms, longest_ms, plays) in self._tracks.items()
+        }
+        completion_sum = sum(track_completion[track_key] * totals[2] for track_key, totals in self._tracks.items())
+
+        results = {
+            'plays': self.plays,
+            'listening_hours': round(self.listening_ms / 3600000, 2),
+            'skips': self.skips,
+            'skip_rate': round(self.skips / self.plays, 4) if self.plays else 0.0,
+            'average_completion': round(completion_sum / self.plays, 4) if self.plays else 0.0,
+            'sessions': {
+                'count': self.session_count,
+                'average_minutes': round(self.session_total_ms / self.session_count / 60000, 2) if self.session_count else 0.0,
+                'longest_minutes': round(self.longest_session_ms / 60000, 2),
+                'average_plays': round(self.plays / self.session_count, 2) if self.session_count else 0.0
+            },
+            'heatmap': {weekday: row for weekday, row in zip(self.WEEKDAYS, self.heatmap)},
+            'streaks': self._streak.summary()
+        }
+
+        if self.entity_type:
+            results[self.entity_type] = {
+                entity_key: entity_stats.summary(track_completion)
+                for entity_key, entity_stats in sorted(self._entities.items(), key=lambda x: x[1].plays, reverse=True)
+            }
+
+        return results
+
+    def _close_session(self) -> None:
+        if self._session_start_ms is None:
+            return
+        session_ms = self._last_end_ms - self._session_start_ms
+        self.session_total_ms += session_ms
+        self.longest_session_ms = max(self.longest_session_ms, session_ms)
+        self._session_start_ms = None
+
+    def _entity_key(self, event: PlayEvent, track_key: str) -> str:
+        if self.entity_type == 'tracks':
+            return track_key
+        if self.entity_type == 'artists':
+            return event.artist
+        return f"{event.album} - {event.artist}"
+
+class _Streak:
+    """Longest and most recent run of consecutive days with at least one play"""
+    __slots__ = ('last_day', 'current', 'longest', 'longest_end')
+
+    def __init__(self) -> None:
+        self.last_day = None
+        self.current = 0
+        self.longest = 0
+        self.longest_end = None
+
+    def add(self, day_number: int) -> None:
+        if day_number == self.last_day:
+            return
+        self.current = self.current + 1 if self.last_day is not None and day_number == self.last_day + 1 else 1
+        self.last_day = day_number
+        if self.current > self.longest:
+            self.longest = self.current
+            self.longest_end = day_number
+
+    def summary(self) -> dict:
+        if self.longest_end is None:
+            return {'longest_days': 0, 'longest_start': None, 'longest_end': None, 'last_streak_days': 0}
+        return {
+            'longest_days': self.longest,
+            'longest_start': _format_day(self.longest_end - self.longest + 1),
+            'longest_end': _format_day(self.longest_end),
+            'last_streak_days': self.current
+        }
+
+class _EntityStats:
+    __slots__ = ('plays', 'skips', 'listening_ms', 'track_plays', 'streak')
+
+    def __init__(self) -> None:
+        self.plays = 0
+        self.skips = 0
+        self.listening_ms = 0
+        self.track_plays = {}
+        self.streak = _Streak()
+
+    def add(self, duration_ms: int, is_skip: bool, day_number: int, track_key: str) -> None:
+        self.plays += 1
+        self.skips += is_skip
+        self.listening_ms += duration_ms
+        self.track_plays[track_key] = self.track_plays.get(track_key, 0) + 1
+        self.streak.add(day_number)
+
+    def summary(self, track_completion: dict) -> dict:
+        # Weight each track's completion by how often this entity played it
+        completion_sum = sum(track_completion[track_key] * plays for track_key, plays in self.track_plays.items())
+        streak = self.streak.summary()
+        return {
+            'plays': self.plays,
+            'listening_hours': round(self.listening_ms / 3600000, 2),
+            'skip_rate': round(self.skips / self.plays, 4),
+            'average_completion': round(completion_sum / self.plays, 4),
+            'longest_streak_days': streak['longest_days'],
+            'longest_streak_start': streak['longest_start']
+        }
+
+def _format_day(day_number: int) -> str:
+    return time.strftime('%Y-%m-%d', time.gmtime(day_number * 86400))
@@ -7,45 +7,42 @@ def combine_and_clean_data():
     
     print("Combining data...")
     file_handler.combine_spotify_exports()
-    print("Creating new modified data file...")
-    file_handler.create_new_modified_data_file()
-    
-    print("Removing null items...")
-    modify_data_exports.remove_null_items()
-    print("Removing ignored items...")
-    modify_data_exports.remove_ignored_items()
-    print("Removing unneeded data...")
-    modify_data_exports.remove_unneeded_data()
-    print("Renaming fields...")
-    modify_data_exports.rename_fields()
     print("Cleaning data...")
-    modify_data_exports.clean_data()
+    modify_data_exports.process_exports()
+
+def combine_and_clean_data_parallel():
+    modify_data_exports = ModifyDataExports()
+
+    print("Cleaning export files in parallel...")
+    modify_data_exports.process_exports_parallel()
+
+def append_new_plays():
+    modify_data_exports = ModifyDataExports()
+
+    # Exports overlap the history, only plays after the last stored one are added
+    print("Appending new plays...")
+    modify_data_exports.append_exports(modify_data_exports.file_handler.list_raw_export_files())
 
 def create_example_files():
     file_handler = FileHandler()
     
-    # Pull in the raw data
-    raw_data = file_handler.pull_raw_data()
-
-    # Create example and test files for raw data
-    file_handler.create_example_file(raw_data, 'combined_spotify_data_raw_example.json', 'raw')
-    file_handler.create_test_file(raw_data, 'combined_spotify_data_raw_test.json')
+    # Create example and test files for raw data, streaming the records from disk
+    file_handler.create_example_file(file_handler.iter_raw_data(), 'combined_spotify_data_raw_example.json', 'raw')
+    file_handler.create_test_file(file_handler.iter_raw_data(), 'combined_spotify_data_raw_test.json')
     
-    # Pull in the modified data
-    modified_data = file_handler.pull_modified_data()
-
     # Create example and test files for processed data
-    modified_data = file_handler.pull_modified_data()
-    file_handler.create_example_file(modified_data, 'combined_spotify_data_modified_example.json', 'processed')
-    file_handler.create_test_file(modified_data, 'combined_spotify_data_modified_test.json')
+    file_handler.create_example_file(file_handler.iter_modified_data(), 'combined_spotify_data_modified_example.json', 'processed')
+    file_handler.create_test_file(file_handler.iter_modified_data(), 'combined_spotify_data_modified_test.json')
 
 def display_menu():
     print("\nSpotify Data Processing Menu:")
     print("1. Combine and Clean Data")
     print("2. Create Example / Test Files")
     print("3. Run All Operations")
-    print("4. Exit")
-    return input("Enter your choice (1-4): ")
+    print("4. Clean Data in Parallel (one process per export file, no combined raw file)")
+    print("5. Append New Plays from Export Files")
+    print("6. Exit")
+    return input("Enter your choice (1-6): ")
 
 def main():
     while True:
@@ -59,6 +56,10 @@ def main():
             combine_and_clean_data()
             create_example_files()
         elif choice == '4':
+            combine_and_clean_data_parallel()
+        elif choice == '5':
+            append_new_plays()
+        elif choice == '6':
             print("All Done.")
             break
         else:
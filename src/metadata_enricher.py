@@ -1,11 +1,18 @@
 import json
 
-from api_handler import SpotifyApiClient
+from api_handler import SpotifyApiClient, get_shared_client
+from batch_endpoints import BatchResult
 
 class MetadataEnricher:
-    def __init__(self) -> None:
-        self.spotify_api_handler = SpotifyApiClient()
-        self.MAX_REQUESTS = 50
+    def __init__(self, spotify_api_handler: SpotifyApiClient = None) -> None:
+        # Reuse the caller's client when given one, otherwise the shared client on first use
+        self._spotify_api_handler = spotify_api_handler
+
+    @property
+    def spotify_api_handler(self) -> SpotifyApiClient:
+        if self._spotify_api_handler is None:
+            self._spotify_api_handler = get_shared_client()
+        return self._spotify_api_handler
 
     def get_ids(self, track_ids: 'str | list[str]', return_type: 'str') -> 'str':
         """
@@ -28,21 +35,16 @@ class MetadataEnricher:
         # Initialize the dictionary to store artist ids or album ids
         return_ids = []
         
-        # Use batch request to get artist/album ids
-        track_data = self.spotify_api_handler.make_batch_request(
-            items=track_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='tracks?ids={}',
-            key='tracks'
-        )
-
-        # Get the artist or album ids
+        # Look up the tracks, shared with any other lookups of the same tracks this run
+        track_data = self.spotify_api_handler.data_loader.load_many('tracks', track_ids)
+
+        # Get the artist or album ids, None for tracks that couldn't be looked up
         if return_type == 'artist':
             for track in track_data:
-                return_ids.append(track['artists'][0]['id'])
+                return_ids.append(track['artists'][0]['id'] if track else None)
         elif return_type == 'album':
             for track in track_data:
-                return_ids.append(track['album']['id'])
+                return_ids.append(track['album']['id'] if track else None)
         else:
             raise ValueError(f'Invalid return_id_type: {return_type}')
 
@@ -55,16 +57,11 @@ class MetadataEnricher:
         # Initialize the list to store artist genres
         artist_genres = []
 
-        # Get genres for all artists
-        artists_data = self.spotify_api_handler.make_batch_request(
-            items=artist_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='artists?ids={}',
-            key='artists'
-        )
+        # Get genres for all artists, artists already looked up this run aren't requested again
+        artists_data = self.spotify_api_handler.data_loader.load_many('artists', artist_ids)
         
         for artist in artists_data:
-            artist_genres.append(artist['genres'])  
+            artist_genres.append(artist['genres'] if artist else None)
             
         return artist_genres 
     
@@ -76,15 +73,10 @@ class MetadataEnricher:
         artist_artwork = []
 
         # Get artwork for all artists
-        artists_data = self.spotify_api_handler.make_batch_request(
-            items=artist_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='artists?ids={}',
-            key='artists'
-        )
+        artists_data = self.spotify_api_handler.data_loader.load_many('artists', artist_ids)
 
         for artist in artists_data:
-            artist_artwork.append(artist['images'][0]['url'])
+            artist_artwork.append(artist['images'][0]['url'] if artist and artist['images'] else None)
 
         return artist_artwork
     
@@ -96,18 +88,27 @@ class MetadataEnricher:
         album_artwork = []
 
         # Get artwork for all albums
-        albums_data = self.spotify_api_handler.make_batch_request(
-            items=album_ids,
-            max_batch_size=self.MAX_REQUESTS,
-            endpoint_template='albums?ids={}',
-            key='albums'
-        )
+        albums_data = self.spotify_api_handler.data_loader.load_many('albums', album_ids)
 
         for album in albums_data:
-            album_artwork.append(album['images'][0]['url'])
+            album_artwork.append(album['images'][0]['url'] if album and album['images'] else None)
 
         return album_artwork
 
+    def get_audio_features(self, track_ids: 'str | list[str]') -> BatchResult:
+        """
+        Audio features (tempo, energy, valence, ...) for tracks, fetched 100 per request.
+
+        Returns:
+            BatchResult: One audio-features object per track, None for tracks that failed.
+                Its not_found() are the tracks Spotify has no features for.
+        """
+        # Convert single string to list if necessary
+        track_ids = [track_ids] if isinstance(track_ids, str) else track_ids
+
+        # Get the features for all tracks, each track once however often it's listed
+        return self.spotify_api_handler.data_loader.load_many('audio-features', track_ids)
+
 if __name__ == "__main__":
     while True:
         print("\nMetadata Enricher Test Menu")
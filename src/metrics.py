@@ -0,0 +1,243 @@
+""" Lightweight counters, timers and histograms for finding where a run spends its time.
+
+Metrics are off unless enabled, and every recording call returns immediately when
+they're off, so the hooks can stay in the code. Enable them with the CLI's --metrics
+option, or for any script by setting SPOTIFY_METRICS to an output path:
+
+    SPOTIFY_METRICS=logs/metrics.prom python src/main.py
+
+A path ending in .json gets a JSON summary, anything else Prometheus text format.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+class Metrics:
+    # Upper bounds in seconds, sized for HTTP requests and pipeline stages
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        # name -> label tuple -> value
+        self.counters = {}
+        # name -> label tuple -> [count, sum, max, bucket counts]
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """Add value to a counter, e.g. increment('spotify_api_retries_total', reason='timeout')"""
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record one measurement (in seconds) in a histogram"""
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = [0, 0.0, 0.0, [0] * len(self.BUCKETS)]
+            histogram[0] += 1
+            histogram[1] += value
+            histogram[2] = max(histogram[2], value)
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    histogram[3][i] += 1
+                    break
+
+    def timer(self, name: str, **labels):
+        """Context manager that observes how long its block took"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed_iter(self, iterable, name: str, exclude: 'TimedIterator' = None, **labels):
+        """
+        Measure the time spent producing the items of a streaming stage.
+
+        When the iterable is exhausted, the seconds spent inside it (minus the time of an
+        upstream TimedIterator given as exclude) are added to the counter
+        {name}_seconds_total and the item count to {name}_items_total. Returns the
+        iterable untouched when metrics are off.
+        """
+        if not self.enabled:
+            return iterable
+        return TimedIterator(self, iterable, name, exclude, labels)
+
+    def cache_lookup(self, cache: str, hit: bool) -> None:
+        self.increment('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: Counters, histograms (count, sum, mean, max, approximate p50/p95) and cache hit rates
+        """
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': round(value, 6)} for key, value in sorted(series.items())]
+                for name, series in sorted(self.counters.items())
+            }
+            histograms = {
+                name: [self._summarize_histogram(key, histogram) for key, histogram in sorted(series.items())]
+                for name, series in sorted(self.histograms.items())
+            }
+
+            cache_totals = {}
+            for key, value in self.counters.get('cache_requests_total', {}).items():
+                labels = dict(key)
+                totals = cache_totals.setdefault(labels['cache'], [0, 0])
+                totals[0 if labels['result'] == 'hit' else 1] += value
+            cache_hit_rates = {cache: round(hits / (hits + misses), 4) for cache, (hits, misses) in sorted(cache_totals.items()) if hits + misses}
+
+        return {'counters': counters, 'histograms': histograms, 'cache_hit_rates': cache_hit_rates}
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, (count, total, _, bucket_counts) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.BUCKETS, bucket_counts):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file_path: str) -> None:
+        """Write a JSON summary (.json) or Prometheus text file (anything else), atomically"""
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, 'w') as f:
+            if file_path.endswith('.json'):
+                json.dump(self.summary(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(temp_path, file_path)
+
+    def _summarize_histogram(self, key: tuple, histogram: list) -> dict:
+        count, total, maximum, bucket_counts = histogram
+        return {
+            'labels': dict(key),
+            'count': count,
+            'sum': round(total, 6),
+            'mean': round(total / count, 6) if count else 0.0,
+            'max': round(maximum, 6),
+            'p50': self._bucket_quantile(bucket_counts, count, 0.5, maximum),
+            'p95': self._bucket_quantile(bucket_counts, count, 0.95, maximum)
+        }
+
+    def _bucket_quantile(self, bucket_counts: list, count: int, quantile: float, maximum: float) -> float:
+        # Upper bound of the bucket holding the quantile, capped at the largest value seen
+        cumulative = 0
+        for bound, bucket_count in zip(self.BUCKETS, bucket_counts):
+            cumulative += bucket_count
+            if count and cumulative >= quantile * count:
+                return round(min(bound, maximum), 6)
+        return round(maximum, 6)
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics: Metrics, name: str, labels: dict) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+class TimedIterator:
+    """Iterator wrapper that adds up the time spent waiting on the wrapped iterator"""
+
+    def __init__(self, metrics: Metrics, iterable, name: str, exclude: 'TimedIterator', labels: dict) -> None:
+        self.metrics = metrics
+        self.iterator = iter(iterable)
+        self.name = name
+        self.exclude = exclude
+        self.labels = labels
+        self.seconds = 0.0
+        self.items = 0
+        self._recorded = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        except StopIteration:
+            self.seconds += time.perf_counter() - started
+            self._record()
+            raise
+        self.seconds += time.perf_counter() - started
+        self.items += 1
+        return item
+
+    def _record(self) -> None:
+        if self._recorded:
+            return
+        self._recorded = True
+        seconds = self.seconds - (self.exclude.seconds if self.exclude else 0.0)
+        self.metrics.increment(f"{self.name}_seconds_total", seconds, **self.labels)
+        self.metrics.increment(f"{self.name}_items_total", self.items, **self.labels)
+
+_NULL_TIMER = nullcontext()
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in key) + '}'
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(round(value, 6))
+
+# Process-wide registry used by the hooks in the pipeline, analyzer and API client
+METRICS = Metrics()
+
+def configure_from_environment() -> None:
+    """Enable metrics and write them at exit when SPOTIFY_METRICS names an output file"""
+    output_path = os.environ.get('SPOTIFY_METRICS')
+    if output_path and not METRICS.enabled:
+        METRICS.enable()
+        atexit.register(METRICS.write, output_path)
+
+configure_from_environment()
@@ -1,80 +1,247 @@
+import heapq
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from zoneinfo import ZoneInfo
+
 from config import Config
 from file_handler import FileHandler
+from history_rollups import HistoryRollups
+from json_stream import iter_json_array, iter_json_lines, output_format_for, read_last_json_line, write_records
+from metrics import METRICS
+from play_event import PlayEvent, parse_timestamp
+from record_filter import RecordFilter
 
 class ModifyDataExports:
+    # Processed records sorted in memory at a time by process_exports before merging
+    SORT_RUN_SIZE = 100_000
+
     def __init__(self):
         self.config = Config()
-        self.file_handler = FileHandler()
-
-    def remove_null_items(self):
-        # Pull in the existing combined export
-        modified_data = self.file_handler.pull_modified_data()
-
-        # Filter out items with null values for track, artist, AND album
-        modified_data_without_null_items = [
-            item for item in modified_data
-            if not (
-                (item['master_metadata_track_name'] is None or item['master_metadata_track_name'] == 'null') and
-                (item['master_metadata_album_artist_name'] is None or item['master_metadata_album_artist_name'] == 'null') and
-                (item['master_metadata_album_album_name'] is None or item['master_metadata_album_album_name'] == 'null')
-            )
-        ]
-        
-        # Overwrite the existing file with the new data
-        self.file_handler.export_to_folder(modified_data_without_null_items, 'combined_spotify_data_modified.json', 'processed')
-
-    def remove_ignored_items(self):
-        # Pull in the existing combined export
-        modified_data = self.file_handler.pull_modified_data()
-
-        # Filter out items will values in the ignore lists for track, artist, OR album
-        modified_data_without_ignored_items = [
-            item for item in modified_data
-            if item['master_metadata_album_artist_name'] not in self.config.get('ignore_artists') and
-               item['master_metadata_album_album_name'] not in self.config.get('ignore_albums') and
-               item['master_metadata_track_name'] not in self.config.get('ignore_tracks')
-        ]
-
-        # Overwrite the existing file with the new data
-        self.file_handler.export_to_folder(modified_data_without_ignored_items, 'combined_spotify_data_modified.json', 'processed')
-
-    def remove_unneeded_data(self):
-        # Pull in the existing combined export
-        modified_data = self.file_handler.pull_modified_data()
-
-        # Remove unneeded fields 
-        for item in modified_data:
-            for field in self.config.get('unneeded_fields'):
-                if field in item:
-                    del item[field]
-
-        # Overwrite the existing file with the new data
-        self.file_handler.export_to_folder(modified_data, 'combined_spotify_data_modified.json', 'processed')
-
-    def rename_fields(self):
-        # Pull in the existing combined export
-        modified_data = self.file_handler.pull_modified_data()
-
-        #  Rename the fields
-        for item in modified_data:
-            for old_name, new_name in self.config.get('fields_to_rename').items():
-                if old_name in item:
-                    item[new_name] = item.pop(old_name)
-
-        # Overwrite the existing file with the new data
-        self.file_handler.export_to_folder(modified_data, 'combined_spotify_data_modified.json', 'processed')
-
-    def clean_data(self):
-        # Pull in the existing combined export
-        modified_data = self.file_handler.pull_modified_data()
-
-        for item in modified_data:
-            # Convert duration to seconds
-            item['Play Duration (s)'] = round(item['Play Duration (s)'] / 1000, 2)
-            # Remove the 'Z' and replace 'T' with a space
-            item['Timestamp'] = item['Timestamp'].replace('Z', '').replace('T', ' ')
-            # Convert Spotify URI to ID
-            item['id'] = item['id'].replace('spotify:track:','')
-
-        # Overwrite the existing file with the new data
-        self.file_handler.export_to_folder(modified_data, 'combined_spotify_data_modified.json', 'processed')
+        # Processed history format: 'json' (compact), 'json_pretty', 'jsonl' or 'columnar'
+        self.file_handler = FileHandler(self.config.get('output_format', default='json'))
+        self.record_filter = RecordFilter.from_config(self.config)
+        # Optional IANA time zone name (e.g. 'America/New_York') used to record local UTC offsets
+        self.timezone_name = self.config.get('timezone', default=None)
+
+    def process_exports(self) -> dict:
+        """
+        Run the whole cleaning pipeline in a single streaming pass over the combined raw
+        export: drop null and ignored records with the compiled RecordFilter, then
+        convert each remaining record to a PlayEvent and write it out in the processed
+        layout, without copying the raw file and rewriting it once per cleaning step.
+
+        The output is sorted by Epoch, like process_exports_parallel's, and plays with
+        the same timestamp keep their export order, so both modes write the same file.
+        Runs of SORT_RUN_SIZE records are sorted in memory and merged from disk.
+
+        Returns:
+            dict: Records each filter rule dropped, and 'kept', in this run
+        """
+        local_timezone = ZoneInfo(self.timezone_name) if self.timezone_name else None
+        rollups = HistoryRollups()
+        self.record_filter.reset_counts()
+
+        def play_events(items):
+            # One fused filter for the null and ignore rules, then the cleaning conversion
+            for item in self.record_filter.filter(items):
+                event = PlayEvent.from_export(item, local_timezone)
+                # Maintain the day/month rollups in the same pass
+                rollups.add(event)
+                yield event.to_processed()
+
+        with METRICS.timer('pipeline_run_seconds', pipeline='process_exports'):
+            # Time parsing, cleaning and writing separately, these are no-ops with metrics off
+            raw_data = METRICS.timed_iter(self.file_handler.iter_raw_data(), 'pipeline_stage', stage='parse')
+            processed_data = METRICS.timed_iter(play_events(raw_data), 'pipeline_stage', exclude=raw_data, stage='clean')
+
+            # Sorted runs go into a scratch folder next to the processed file
+            run_folder = os.path.join(self.file_handler.export_path, 'processed', 'runs')
+            os.makedirs(run_folder, exist_ok=True)
+            started = time.perf_counter()
+            try:
+                run_paths = []
+                run = []
+                for item in processed_data:
+                    run.append(item)
+                    if len(run) >= self.SORT_RUN_SIZE:
+                        run_paths.append(_write_sorted_run(run, os.path.join(run_folder, f"{len(run_paths):04d}.jsonl")))
+                        run = []
+                if run or not run_paths:
+                    run_paths.append(_write_sorted_run(run, os.path.join(run_folder, f"{len(run_paths):04d}.jsonl")))
+
+                self.file_handler.write_modified_data(_merge_sorted_runs(run_paths))
+            finally:
+                shutil.rmtree(run_folder, ignore_errors=True)
+            if METRICS.enabled:
+                METRICS.increment('pipeline_stage_seconds_total', time.perf_counter() - started - processed_data.seconds, stage='write')
+
+            with METRICS.timer('pipeline_run_seconds', pipeline='save_rollups'):
+                rollups.save(self.file_handler.processed_file_path(HistoryRollups.FILE_NAME))
+
+        # Report how many records each rule removed
+        filter_results = dict(self.record_filter.hit_counts)
+        self._record_filter_metrics(filter_results)
+        print(f"Filter results: {filter_results}")
+        return filter_results
+
+    def process_exports_parallel(self, max_workers: int = None) -> dict:
+        """
+        Parse, filter and clean every export shard (Streaming_History_Audio_*.json) in its
+        own worker process, then k-way merge the time-sorted shards into the processed
+        file. Each worker holds one shard in memory and the merge streams, so this scales
+        with the number of cores. Ties between shards are broken by shard filename order,
+        so the output is sorted by Epoch and the same as process_exports writes.
+
+        Args:
+            max_workers: Number of worker processes, defaults to the number of CPUs
+
+        Returns:
+            dict: Records each filter rule dropped, and 'kept', summed over the shards
+        """
+        shard_paths = self.file_handler.list_raw_export_files()
+
+        # Sorted shard outputs go into a scratch folder next to the processed file
+        shard_folder = os.path.join(self.file_handler.export_path, 'processed', 'shards')
+        os.makedirs(shard_folder, exist_ok=True)
+        shard_output_paths = [os.path.join(shard_folder, f"{i:04d}.jsonl") for i in range(len(shard_paths))]
+
+        try:
+            with METRICS.timer('pipeline_run_seconds', pipeline='parallel_shards'), ProcessPoolExecutor(max_workers=max_workers) as executor:
+                shard_hit_counts = list(executor.map(
+                    _process_export_shard,
+                    shard_paths,
+                    shard_output_paths,
+                    [self.record_filter] * len(shard_paths),
+                    [self.timezone_name] * len(shard_paths)
+                ))
+
+            merged_data = _merge_sorted_runs(shard_output_paths)
+
+            # Maintain the day/month rollups while the merged plays are written
+            rollups = HistoryRollups()
+            def with_rollups(items):
+                for item in items:
+                    rollups.add(PlayEvent.from_processed(item))
+                    yield item
+
+            with METRICS.timer('pipeline_run_seconds', pipeline='parallel_merge'):
+                self.file_handler.write_modified_data(with_rollups(merged_data))
+                rollups.save(self.file_handler.processed_file_path(HistoryRollups.FILE_NAME))
+        finally:
+            shutil.rmtree(shard_folder, ignore_errors=True)
+
+        # Combine the per-worker filter counts for this run only
+        filter_results = Counter()
+        for hit_counts in shard_hit_counts:
+            filter_results.update(hit_counts)
+        filter_results = dict(filter_results)
+        self._record_filter_metrics(filter_results)
+        print(f"Filter results: {filter_results}")
+        return filter_results
+
+    def append_exports(self, export_paths: list[str]) -> int:
+        """
+        Add the plays from newer export files to the end of the processed history
+        without rewriting it (with the 'jsonl' output format). Only plays after the
+        last one already stored are added, so an export that overlaps the history can
+        be appended safely. Older plays are dropped while the exports stream, before the
+        filter counts them, so only the new plays are held in memory.
+
+        Args:
+            export_paths: Export files in Spotify's streaming history format
+
+        Returns:
+            int: Number of plays appended
+        """
+        local_timezone = ZoneInfo(self.timezone_name) if self.timezone_name else None
+        self.record_filter.reset_counts()
+        history_path = self.file_handler.modified_data_path()
+        rollups_path = self.file_handler.processed_file_path(HistoryRollups.FILE_NAME)
+
+        # Rollups written after the history are updated in place, and know the last play
+        rollups_current = os.path.exists(rollups_path) and os.path.exists(history_path) and os.path.getmtime(rollups_path) >= os.path.getmtime(history_path)
+        stored_rollups = HistoryRollups.load(rollups_path) if rollups_current else None
+        last_timestamp = self._last_stored_timestamp(history_path, stored_rollups) if os.path.exists(history_path) else None
+
+        already_stored = 0
+        def newer_records(path):
+            nonlocal already_stored
+            for item in iter_json_array(path):
+                if last_timestamp is None or parse_timestamp(item['ts']) > last_timestamp:
+                    yield item
+                else:
+                    already_stored += 1
+
+        new_events = sorted(
+            (
+                PlayEvent.from_export(item, local_timezone)
+                for path in export_paths
+                for item in self.record_filter.filter(newer_records(path))
+            ),
+            key=lambda event: event.timestamp
+        )
+        count = self.file_handler.append_modified_data(event.to_processed() for event in new_events)
+
+        if stored_rollups is not None:
+            rollups = stored_rollups
+            rollups.add_many(new_events)
+        else:
+            rollups = HistoryRollups()
+            rollups.add_many(PlayEvent.from_processed(item) for item in self.file_handler.iter_modified_data())
+        rollups.save(rollups_path)
+
+        # Plays already in the history are reported apart from the filter rules
+        filter_results = dict(self.record_filter.hit_counts)
+        self._record_filter_metrics(filter_results)
+        METRICS.increment('pipeline_appended_plays_total', count)
+        print(f"Appended {count} plays, skipped {already_stored} already stored. Filter results: {filter_results}")
+        return count
+
+    def _last_stored_timestamp(self, history_path: str, rollups: HistoryRollups = None) -> int:
+        # The rollups keep the latest play, and a JSON Lines history ends with it since
+        # both processing modes write in time order. Only older files need a full read.
+        if rollups is not None and rollups.last_timestamp is not None:
+            return rollups.last_timestamp
+        if output_format_for(history_path) == 'jsonl':
+            last_record = read_last_json_line(history_path)
+            return PlayEvent.from_processed(last_record).timestamp if last_record is not None else None
+        return max((PlayEvent.from_processed(item).timestamp for item in self.file_handler.iter_modified_data()), default=None)
+
+    def _record_filter_metrics(self, hit_counts: dict) -> None:
+        # Records kept or dropped, by the rule that dropped them
+        for rule_name, count in hit_counts.items():
+            METRICS.increment('pipeline_records_total', count, rule=rule_name)
+
+def _process_export_shard(shard_path: str, output_path: str, record_filter: RecordFilter, timezone_name: str = None) -> dict:
+    """
+    Worker for process_exports_parallel. Filters and cleans one export file, writes it
+    sorted by timestamp and returns the filter hit counts for this shard. The sort is
+    stable, so plays with the same timestamp keep their order in the export.
+    """
+    # The filter arrives with the parent's counts, only this shard's are returned
+    record_filter.reset_counts()
+
+    # Only JSON arrays are exports, anything else produces an empty shard
+    with open(shard_path, 'r', encoding='utf-8') as f:
+        is_export = f.read(1024).lstrip().startswith('[')
+
+    local_timezone = ZoneInfo(timezone_name) if timezone_name else None
+
+    processed_data = []
+    if is_export:
+        processed_data = [PlayEvent.from_export(item, local_timezone).to_processed() for item in record_filter.filter(iter_json_array(shard_path))]
+    _write_sorted_run(processed_data, output_path)
+    return record_filter.hit_counts
+
+def _write_sorted_run(processed_data: list[dict], output_path: str) -> str:
+    # Stable, so plays with the same timestamp keep their order
+    processed_data.sort(key=lambda item: item['Epoch'])
+    write_records(processed_data, output_path, 'jsonl')
+    return output_path
+
+def _merge_sorted_runs(run_paths: list[str]):
+    # heapq.merge is stable, equal timestamps come out in run order
+    return heapq.merge(*(iter_json_lines(path) for path in run_paths), key=lambda item: item['Epoch'])
@@ -0,0 +1,145 @@
+import calendar
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+class PlayEvent:
+    """
+    A single play from the listening history.
+
+    Uses __slots__ instead of a per-record dict, interns the track, artist and album
+    strings so repeated plays share one copy, and stores the timestamp as integer
+    seconds since the epoch (UTC) and the play duration as integer milliseconds.
+    utc_offset is the local time zone's offset in seconds when one is configured,
+    otherwise None.
+    """
+    __slots__ = ('timestamp', 'duration_ms', 'track', 'artist', 'album', 'track_id', 'utc_offset')
+
+    TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+    def __init__(self, timestamp: int, duration_ms: int, track: str, artist: str, album: str, track_id: str, utc_offset: int = None) -> None:
+        self.timestamp = timestamp
+        self.duration_ms = duration_ms
+        self.track = _intern(track)
+        self.artist = _intern(artist)
+        self.album = _intern(album)
+        self.track_id = _intern(track_id)
+        self.utc_offset = utc_offset
+
+    @classmethod
+    def from_export(cls, record: dict, local_timezone=None) -> 'PlayEvent':
+        """
+        Build a play event from a record in Spotify's streaming history export.
+
+        Args:
+            record: Export record
+            local_timezone: Optional tzinfo used to record the local UTC offset of the play
+        """
+        track_uri = record.get('spotify_track_uri')
+        timestamp = parse_timestamp(record['ts'])
+        return cls(
+            timestamp=timestamp,
+            duration_ms=record['ms_played'],
+            track=record['master_metadata_track_name'],
+            artist=record['master_metadata_album_artist_name'],
+            album=record['master_metadata_album_album_name'],
+            track_id=track_uri.replace('spotify:track:', '') if track_uri else None,
+            utc_offset=get_utc_offset(timestamp, local_timezone) if local_timezone else None
+        )
+
+    @classmethod
+    def from_processed(cls, record: dict) -> 'PlayEvent':
+        """Build a play event from a record in combined_spotify_data_modified.json"""
+        # Files written before the Epoch column existed still need their timestamps parsed
+        timestamp = record['Epoch'] if 'Epoch' in record else parse_timestamp(record['Timestamp'])
+        return cls(
+            timestamp=timestamp,
+            duration_ms=round(record['Play Duration (s)'] * 1000),
+            track=record['Track'],
+            artist=record['Arist'],
+            album=record['Album'],
+            track_id=record['id'],
+            utc_offset=record.get('UTC Offset (s)')
+        )
+
+    def to_processed(self) -> dict:
+        """
+        Convert back to the record layout of combined_spotify_data_modified.json. The
+        layout is fixed, from_processed and every reader expect these keys, so the old
+        fields_to_rename and unneeded_fields settings are no longer read.
+        """
+        record = {
+            'Timestamp': self.timestamp_string,
+            'Epoch': self.timestamp,
+            'Play Duration (s)': round(self.duration_ms / 1000, 2),
+            'Track': self.track,
+            'Arist': self.artist,
+            'Album': self.album,
+            'id': self.track_id
+        }
+        if self.utc_offset is not None:
+            record['UTC Offset (s)'] = self.utc_offset
+        return record
+
+    @property
+    def local_timestamp(self) -> int:
+        # Epoch seconds shifted to local wall-clock time, used for date range comparisons
+        return self.timestamp + (self.utc_offset or 0)
+
+    @property
+    def timestamp_string(self) -> str:
+        return format_timestamp(self.timestamp)
+
+    @property
+    def played_at(self) -> datetime:
+        # Naive UTC, the same convention as the timestamps in the processed file
+        return EPOCH + timedelta(seconds=self.timestamp)
+
+    def __repr__(self) -> str:
+        return f"PlayEvent({self.timestamp_string}, {self.track!r}, {self.artist!r}, {self.album!r})"
+
+EPOCH = datetime(1970, 1, 1)
+
+# Midnight epoch seconds per 'YYYY-MM-DD', a history only spans a few thousand days
+_day_starts = {}
+# UTC offset per (time zone, quarter hour). Transitions can fall on the half hour in UTC
+# (America/St_Johns), but every real one is on a 15-minute boundary.
+_utc_offsets = {}
+
+def parse_timestamp(value: str) -> int:
+    """
+    Parse 'YYYY-MM-DD HH:MM:SS' or the export's 'YYYY-MM-DDTHH:MM:SSZ' into epoch seconds (UTC).
+
+    Uses fixed string offsets and a per-day cache instead of strptime, falling back to
+    fromisoformat for anything that doesn't have the fixed layout.
+    """
+    if len(value) in (19, 20) and value[4] == '-' and value[13] == ':':
+        day = value[:10]
+        day_start = _day_starts.get(day)
+        if day_start is None:
+            day_start = _day_starts[day] = calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]), 0, 0, 0))
+        return day_start + int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def get_utc_offset(timestamp: int, local_timezone) -> int:
+    """Offset in seconds of local_timezone from UTC at the given epoch time"""
+    key = (local_timezone, timestamp // 900)
+    utc_offset = _utc_offsets.get(key)
+    if utc_offset is None:
+        utc_offset = _utc_offsets[key] = int(datetime.fromtimestamp(timestamp, local_timezone).utcoffset().total_seconds())
+    return utc_offset
+
+def to_epoch(value: datetime) -> int:
+    """Convert a naive datetime, as used by the analyzer queries, to epoch seconds"""
+    return calendar.timegm(value.timetuple())
+
+def format_timestamp(timestamp: int) -> str:
+    """Format epoch seconds the way timestamps are written to the processed file"""
+    return time.strftime(PlayEvent.TIMESTAMP_FORMAT, time.gmtime(timestamp))
+
+def _intern(value: str) -> str:
+    return sys.intern(value) if isinstance(value, str) else value
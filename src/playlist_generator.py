@@ -1,56 +1,72 @@
 """ After starting this, I realized that it's pretty limited since there are 
-many artists that Spotify does not assign genres to. Tabling any future work on this."""
+many artists that Spotify does not assign genres to. Tabling any future work on this.
 
-from api_handler import SpotifyApiClient
+Artists without Spotify genres now get genres inferred from the artists they're
+listened to with (see genre_inference), so genre playlists cover the whole library.
+
+generate_similar_playlist and generate_more_like_this_playlist don't depend on genres:
+they pick the library tracks whose audio features are closest to one or more seed
+tracks, or the tracks most often played in the same sessions as the seeds."""
+
+from api_handler import SpotifyApiClient, get_shared_client
+from audio_features import AudioFeatureMatrix, SimilarityIndex
 from library_analyzer import LibraryAnalyzer
 import random
 import datetime
-import json
+import json_codec
 
 class PlaylistGenerator:
-    def __init__(self):
-        self.spotify_api_handler = SpotifyApiClient()
-        self.library_analyzer = LibraryAnalyzer()
+    def __init__(self, spotify_api_handler: SpotifyApiClient = None):
+        # One shared client for the generator and its library analyzer, created on first use
+        self._spotify_api_handler = spotify_api_handler
+        self.library_analyzer = LibraryAnalyzer(spotify_api_handler)
         # Set playlist constants
         self.public_playlist = False
         self.collaboration_playlist = False
         self.playlist_description = ""
-
-    def generate_playlist(self, playlist_name: str, number_of_tracks: int, genres: list[str]):
+        self.audio_feature_matrix = AudioFeatureMatrix()
+        self._history_analyzer = None
+
+    @property
+    def spotify_api_handler(self) -> SpotifyApiClient:
+        if self._spotify_api_handler is None:
+            self._spotify_api_handler = get_shared_client()
+        return self._spotify_api_handler
+
+    @property
+    def history_analyzer(self):
+        # Only the co-listening playlists need the history, so it's imported on first use
+        if self._history_analyzer is None:
+            from history_analyzer import HistoryAnalyzer
+            self._history_analyzer = HistoryAnalyzer()
+        return self._history_analyzer
+
+    @history_analyzer.setter
+    def history_analyzer(self, history_analyzer) -> None:
+        self._history_analyzer = history_analyzer
+
+    def generate_playlist(self, playlist_name: str, number_of_tracks: int, genres: list[str], include_inferred: bool = True):
         """ Generate a playlist with the given parameters
         Args:
             playlist_name (str): Name of the playlist
             number_of_tracks (int): Number of tracks to include
             genres (list[str]): List of genres to include
+            include_inferred (bool): Also match artists whose genres were inferred
         """
         # Clean up genres by stripping whitespace
         genres = [genre.strip() for genre in genres]
 
-        # Get the user's ID
-        user_response = self.spotify_api_handler.make_request(endpoint='me', method='GET')
-        user_id = user_response['id']
-
-        # Create the playlist with required body parameters
-        playlist_body = {
-            "name": playlist_name,
-            "description": self.playlist_description,
-            "public": self.public_playlist
-        }
-        playlist_response = self.spotify_api_handler.make_request(
-            endpoint=f"users/{user_id}/playlists",
-            method="POST", 
-            data=playlist_body
-        )
-
-        playlist_id = playlist_response['id']
+        playlist_id = self.create_playlist(playlist_name)
 
         # Search through the library for the tracks that match the user's input
         # Create a new file with library tracks
         self.library_analyzer.get_library_tracks()
 
         # Open the file and read the tracks
-        with open('data/processed/library_tracks_simplified.json', 'r') as file:
-            tracks = json.load(file)
+        with open('data/processed/library_tracks_simplified.json', 'r', encoding='utf-8') as file:
+            tracks = json_codec.load(file)
+        if include_inferred:
+            tracks = self.library_analyzer.add_inferred_genres(tracks)
 
         # Search through the tracks for the ones that match the user's input
         playlist_tracks = []  # Initialize the list
@@ -67,20 +83,101 @@ class PlaylistGenerator:
         # Pull a random selectionon the tracks to match the total number of tracks
         playlist_tracks = random.sample(playlist_tracks, number_of_tracks)
 
-        # Add the tracks to the playlist
-        track_uris = [f"spotify:track:{track['id']}" for track in playlist_tracks]
+        self.add_tracks(playlist_id, [track['id'] for track in playlist_tracks])
+
+        # Return confirmation message 
+        print(f"Playlist {playlist_name} created successfully with {number_of_tracks} tracks.")
+
+    def generate_similar_playlist(self, playlist_name: str, number_of_tracks: int, seed_track_ids: list[str]) -> list[dict]:
+        """ Generate a playlist of the library tracks that sound most like the seed tracks
+        Args:
+            playlist_name (str): Name of the playlist
+            number_of_tracks (int): Number of tracks to include besides the seeds
+            seed_track_ids (list[str]): One or more track IDs to start from
+
+        Returns:
+            list[dict]: The selected library tracks, most similar first
+        """
+        playlist_tracks = self.select_similar_tracks(seed_track_ids, number_of_tracks)
+
+        playlist_id = self.create_playlist(playlist_name)
+        self.add_tracks(playlist_id, [track['id'] for track in playlist_tracks])
+
+        print(f"Playlist {playlist_name} created successfully with {len(playlist_tracks)} tracks.")
+        return playlist_tracks
+
+    def generate_more_like_this_playlist(self, playlist_name: str, number_of_tracks: int, seed_track_ids: list[str]) -> list[dict]:
+        """ Generate a playlist of the tracks most often played in the same sessions as the seeds.
+        The neighbours come from the table precomputed from the listening history, so
+        nothing but the playlist itself needs the API.
+        Args:
+            playlist_name (str): Name of the playlist
+            number_of_tracks (int): Number of tracks to include, the seeds themselves are left out
+            seed_track_ids (list[str]): One or more track IDs to start from
+
+        Returns:
+            list[dict]: {'id', 'track', 'score'} for each selected track, best first
+        """
+        seed_track_ids = [track_id.strip() for track_id in seed_track_ids]
+        playlist_tracks = self.history_analyzer.get_similar_tracks(seed_track_ids, number_of_tracks)
+
+        playlist_id = self.create_playlist(playlist_name)
+        self.add_tracks(playlist_id, [track['id'] for track in playlist_tracks])
+
+        print(f"Playlist {playlist_name} created successfully with {len(playlist_tracks)} tracks.")
+        return playlist_tracks
+
+    def select_similar_tracks(self, seed_track_ids: list[str], number_of_tracks: int) -> list[dict]:
+        """ Library tracks closest to the seed tracks by audio features. Features are
+        fetched for tracks that aren't in the cache yet, after that this runs offline.
+
+        Returns:
+            list[dict]: Library tracks with a 'similarity' between -1 and 1, most similar first
+        """
+        seed_track_ids = [track_id.strip() for track_id in seed_track_ids]
+        tracks = self.library_analyzer.load_library_tracks()
+        tracks_by_id = {track['id']: track for track in tracks if track['id']}
+
+        # Seeds don't have to be saved tracks, but they need features too
+        self.audio_feature_matrix.load()
+        self.audio_feature_matrix.update(list(tracks_by_id) + seed_track_ids, self.library_analyzer.metadata_enricher)
+
+        index = SimilarityIndex(self.audio_feature_matrix, list(tracks_by_id))
+        return [
+            {**tracks_by_id[track_id], 'similarity': round(similarity, 4)}
+            for track_id, similarity in index.most_similar(seed_track_ids, number_of_tracks)
+        ]
+
+    def create_playlist(self, playlist_name: str) -> str:
+        """Create an empty playlist for the current user and return its ID"""
+        # Get the user's ID
+        user_response = self.spotify_api_handler.make_request(endpoint='me', method='GET')
+        user_id = user_response['id']
+
+        # Create the playlist with required body parameters
         playlist_body = {
-            "uris": track_uris,
-            "position": 0
+            "name": playlist_name,
+            "description": self.playlist_description,
+            "public": self.public_playlist
         }
-        self.spotify_api_handler.make_request(
-            endpoint=f"playlists/{playlist_id}/tracks",
-            method="POST",
+        playlist_response = self.spotify_api_handler.make_request(
+            endpoint=f"users/{user_id}/playlists",
+            method="POST", 
             data=playlist_body
         )
 
-        # Return confirmation message 
-        print(f"Playlist {playlist_name} created successfully with {number_of_tracks} tracks.")
+        return playlist_response['id']
+
+    def add_tracks(self, playlist_id: str, track_ids: list[str]) -> None:
+        # Add the tracks to the playlist, up to 100 per request
+        track_uris = [f"spotify:track:{track_id}" for track_id in track_ids]
+        add_result = self.spotify_api_handler.make_batch_request(
+            items=track_uris,
+            endpoint='add-playlist-items',
+            path_parameters={'playlist_id': playlist_id}
+        )
+        if add_result.errors:
+            print(f"Warning: {len(add_result.errors)} tracks couldn't be added to the playlist.")
 
 if __name__ == "__main__":
     # Ask user if they want to test or run in production
@@ -0,0 +1,101 @@
+import re
+
+from config import Config
+
+class RecordFilter:
+    """
+    Null-record and ignore-list rules compiled once from config.yaml and applied to
+    export records in a single pass.
+
+    Exact ignore lists become frozensets, so each check is a hash lookup no matter how
+    long the list is. With ignore_case the sets hold casefolded names. Optional regex
+    patterns are joined into one compiled expression per field. Every rule counts how
+    many records it dropped in hit_counts.
+    """
+    # Export field each ignore list applies to
+    FIELDS = {
+        'artists': 'master_metadata_album_artist_name',
+        'albums': 'master_metadata_album_album_name',
+        'tracks': 'master_metadata_track_name'
+    }
+    NULL_VALUES = frozenset({None, 'null'})
+
+    def __init__(self, ignore_artists: list[str] = None, ignore_albums: list[str] = None, ignore_tracks: list[str] = None, ignore_patterns: dict[str, list[str]] = None, ignore_case: bool = False) -> None:
+        """
+        Args:
+            ignore_artists: Artist names to drop
+            ignore_albums: Album names to drop
+            ignore_tracks: Track names to drop
+            ignore_patterns: Regexes per field, keyed by 'artists', 'albums' or 'tracks'
+            ignore_case: Match names and patterns case-insensitively
+        """
+        self.ignore_case = ignore_case
+        ignore_lists = {'artists': ignore_artists, 'albums': ignore_albums, 'tracks': ignore_tracks}
+        ignore_patterns = ignore_patterns or {}
+
+        # (rule name, export field, set of names, compiled pattern or None) for each field that has rules
+        self._rules = []
+        for name, field in self.FIELDS.items():
+            names = frozenset(self._normalize(value) for value in ignore_lists[name] or [])
+            patterns = ignore_patterns.get(name) or []
+            pattern = re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE if ignore_case else 0) if patterns else None
+            if names or pattern:
+                self._rules.append((f'ignore_{name}', field, names, pattern))
+
+        self.reset_counts()
+
+    @classmethod
+    def from_config(cls, config: Config = None) -> 'RecordFilter':
+        config = config or Config()
+        return cls(
+            ignore_artists=config.get('ignore_artists', default=None),
+            ignore_albums=config.get('ignore_albums', default=None),
+            ignore_tracks=config.get('ignore_tracks', default=None),
+            ignore_patterns=config.get('ignore_patterns', default=None),
+            ignore_case=config.get('ignore_case', default=False)
+        )
+
+    def reset_counts(self) -> None:
+        # Counts start over for every pipeline run, so reports don't add up across runs
+        self.hit_counts = {'null': 0, 'ignore_artists': 0, 'ignore_albums': 0, 'ignore_tracks': 0, 'kept': 0}
+
+    def is_null(self, record: dict) -> bool:
+        # Null track, artist, AND album means there's nothing to analyze (e.g. podcasts)
+        null_values = self.NULL_VALUES
+        return (record['master_metadata_track_name'] in null_values and
+                record['master_metadata_album_artist_name'] in null_values and
+                record['master_metadata_album_album_name'] in null_values)
+
+    def ignored_by(self, record: dict) -> str:
+        """Return the name of the first ignore rule the record matches, or None"""
+        for rule_name, field, names, pattern in self._rules:
+            value = record[field]
+            if value is None:
+                continue
+            if self._normalize(value) in names or (pattern is not None and pattern.search(value)):
+                return rule_name
+        return None
+
+    def keep(self, record: dict) -> bool:
+        """Apply every rule to a record, counting the rule that dropped it"""
+        if self.is_null(record):
+            self.hit_counts['null'] += 1
+            return False
+
+        rule_name = self.ignored_by(record)
+        if rule_name:
+            self.hit_counts[rule_name] += 1
+            return False
+
+        self.hit_counts['kept'] += 1
+        return True
+
+    def filter(self, records):
+        """Yield only the records that pass every rule"""
+        keep = self.keep
+        for record in records:
+            if keep(record):
+                yield record
+
+    def _normalize(self, value: str) -> str:
+        return value.casefold() if self.ignore_case and isinstance(value, str) else value
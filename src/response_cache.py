@@ -0,0 +1,186 @@
+""" HTTP response cache for endpoints that rarely change, like the profile and playlists.
+
+Responses that come with an ETag or Last-Modified header are stored and revalidated
+with If-None-Match / If-Modified-Since, so an unchanged resource costs a 304 with no
+body. Endpoints with a freshness window are served from the cache without any request
+while the stored copy is younger than the window. Anything else isn't stored.
+
+The cache is off unless http_cache.enabled is set. Entries aren't keyed by account, so
+clear it (or use a separate path) when switching users. Entries not used for
+max_age_seconds are dropped, and the oldest go once there are more than max_entries.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import json_codec
+from config import Config
+
+class ResponseCache:
+    CACHE_PATH = 'data/cache/http'
+    # Stored responses kept at most, the least recently used are removed first
+    MAX_ENTRIES = 1000
+    # Entries not stored or revalidated for this long are treated as missing
+    MAX_AGE_SECONDS = 7 * 24 * 3600
+
+    def __init__(self, cache_path: str = CACHE_PATH, freshness: dict = None, max_entries: int = MAX_ENTRIES,
+                 max_age_seconds: int = MAX_AGE_SECONDS) -> None:
+        """
+        Args:
+            cache_path: Folder for the stored responses, one file per URL
+            freshness: Seconds each endpoint is served without a request, e.g. {'me': 3600}.
+                None of them are by default, every request at least revalidates.
+            max_entries: Most responses kept on disk
+            max_age_seconds: Age after which an entry is dropped instead of revalidated
+        """
+        self.cache_path = cache_path
+        self.freshness = dict(freshness or {})
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._entries = {}
+        # Entry file name -> request key (None until known), least recently written first.
+        # Read from the folder once, then kept up to date so writes never scan it.
+        self._files = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> 'ResponseCache':
+        """
+        Cache configured by the optional http_cache section of config.yaml, or None
+        unless it's enabled there
+        """
+        settings = Config.get('http_cache', default=None) or {}
+        if not settings.get('enabled', False):
+            return None
+        return cls(
+            settings.get('path', cls.CACHE_PATH),
+            settings.get('freshness_seconds', {}),
+            settings.get('max_entries', cls.MAX_ENTRIES),
+            settings.get('max_age_seconds', cls.MAX_AGE_SECONDS)
+        )
+
+    def lookup(self, key: str) -> dict:
+        """Stored entry for a request key, or None"""
+        with self._lock:
+            in_memory = key in self._entries
+            entry = self._entries.get(key)
+
+        if not in_memory:
+            entry_path = self._entry_path(key)
+            if os.path.exists(entry_path):
+                try:
+                    with open(entry_path, 'r', encoding='utf-8') as f:
+                        entry = json_codec.load(f)
+                except (OSError, ValueError):
+                    entry = None
+                # Different URLs can't share a file, but check in case of a hash collision
+                if entry is not None and entry.get('key') != key:
+                    entry = None
+
+        # Old entries expire in memory too, for long-running processes
+        if entry is not None and time.time() - entry['stored_at'] > self.max_age_seconds:
+            self._remove(key)
+            entry = None
+
+        with self._lock:
+            self._entries[key] = entry
+            file_name = os.path.basename(self._entry_path(key))
+            if entry is not None and self._files is not None and file_name in self._files:
+                self._files[file_name] = key
+        return entry
+
+    def is_fresh(self, entry: dict, endpoint_label: str) -> bool:
+        return time.time() - entry['stored_at'] < self.freshness.get(endpoint_label, 0)
+
+    def conditional_headers(self, entry: dict) -> dict:
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, key: str, endpoint_label: str, response_headers, data) -> None:
+        """Store a 200 response if it has validators or its endpoint has a freshness window"""
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if not etag and not last_modified and not self.freshness.get(endpoint_label):
+            return
+        self._write(key, {
+            'key': key,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': time.time(),
+            'data': data
+        })
+
+    def mark_validated(self, key: str, entry: dict) -> None:
+        # A 304 confirms the copy, so its freshness window starts again
+        self._write(key, {**entry, 'stored_at': time.time()})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._files = None
+        if os.path.isdir(self.cache_path):
+            for file_name in os.listdir(self.cache_path):
+                if file_name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_path, file_name))
+
+    def _write(self, key: str, entry: dict) -> None:
+        os.makedirs(self.cache_path, exist_ok=True)
+        entry_path = self._entry_path(key)
+        temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump(entry, f)
+        os.replace(temp_path, entry_path)
+
+        with self._lock:
+            self._entries[key] = entry
+            files = self._known_files()
+            file_name = os.path.basename(entry_path)
+            files[file_name] = key
+            files.move_to_end(file_name)
+
+            # Drop the least recently stored or revalidated entries beyond max_entries
+            evicted = []
+            while len(files) > self.max_entries:
+                evicted.append(files.popitem(last=False))
+            for _, evicted_key in evicted:
+                if evicted_key is not None:
+                    self._entries.pop(evicted_key, None)
+
+        for file_name, _ in evicted:
+            try:
+                os.remove(os.path.join(self.cache_path, file_name))
+            except FileNotFoundError:
+                pass
+
+    def _known_files(self) -> OrderedDict:
+        # Called with the lock held. The only folder scan, on the first write.
+        if self._files is None:
+            file_names = [file_name for file_name in os.listdir(self.cache_path) if file_name.endswith('.json')]
+            file_names.sort(key=lambda file_name: os.path.getmtime(os.path.join(self.cache_path, file_name)))
+            self._files = OrderedDict((file_name, None) for file_name in file_names)
+        return self._files
+
+    def _remove(self, key: str) -> None:
+        entry_path = self._entry_path(key)
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._files is not None:
+                self._files.pop(os.path.basename(entry_path), None)
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_path, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+def request_key(url: str, limit: int = None, offset: int = None) -> str:
+    """Cache key for a GET request, its URL with the paging parameters"""
+    return f"{url}|limit={limit}|offset={offset}"
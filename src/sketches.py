@@ -0,0 +1,140 @@
+import heapq
+import itertools
+import math
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary (Metwally et al.) for approximate top-N counts
+    in constant memory.
+
+    At most `capacity` keys are tracked. When a new key arrives and the summary is
+    full, the key with the smallest count is evicted and the new key inherits that
+    count as its error. Every reported count is an overestimate by at most its error,
+    and the error is never more than total / capacity, so capacity = ceil(1 / epsilon)
+    bounds the error at epsilon * total plays. Any key with more than epsilon * total
+    plays is guaranteed to be in the summary.
+
+    Summaries built over separate shards or time buckets can be merged, and the merged
+    summary keeps the same bound over the combined total.
+    """
+
+    def __init__(self, capacity: int = None, epsilon: float = None) -> None:
+        """
+        Args:
+            capacity: Number of keys to track
+            epsilon: Error bound as a fraction of the total count, used when capacity isn't given
+        """
+        if capacity is None:
+            if not epsilon or epsilon <= 0:
+                raise ValueError('SpaceSaving needs a capacity or an epsilon greater than 0')
+            capacity = math.ceil(1 / epsilon)
+        if capacity < 1:
+            raise ValueError(f'Invalid capacity: {capacity}')
+
+        self.capacity = capacity
+        self.total = 0
+        # key -> [count, error]
+        self.counters = {}
+        # (count, sequence, key) entries, one per tracked key, refreshed lazily when they reach the top.
+        # The sequence number breaks ties so keys never have to be comparable
+        self._heap = []
+        self._sequence = itertools.count()
+
+    @property
+    def epsilon(self) -> float:
+        return 1 / self.capacity
+
+    def add(self, key, count: int = 1) -> None:
+        self.total += count
+
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+            return
+
+        if len(self.counters) < self.capacity:
+            self.counters[key] = [count, 0]
+            heapq.heappush(self._heap, (count, next(self._sequence), key))
+            return
+
+        # Replace the current minimum, the new key inherits its count as error
+        minimum_key, minimum_count = self._pop_minimum()
+        del self.counters[minimum_key]
+        self.counters[key] = [minimum_count + count, minimum_count]
+        heapq.heappush(self._heap, (minimum_count + count, next(self._sequence), key))
+
+    def add_many(self, keys) -> None:
+        for key in keys:
+            self.add(key)
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """
+        Combine two summaries into a new one with the larger capacity.
+
+        A key missing from a full summary could have had up to that summary's minimum
+        count, so the minimum is added to both its count and its error.
+        """
+        merged = SpaceSaving(capacity=max(self.capacity, other.capacity))
+        self_floor, other_floor = self._floor(), other._floor()
+
+        combined = {}
+        for key in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(key, (self_floor, self_floor))
+            other_count, other_error = other.counters.get(key, (other_floor, other_floor))
+            combined[key] = [count + other_count, error + other_error]
+
+        # Keep the largest counts that fit
+        for key, counter in heapq.nlargest(merged.capacity, combined.items(), key=lambda x: x[1][0]):
+            merged.counters[key] = counter
+        merged._rebuild_heap()
+        merged.total = self.total + other.total
+        return merged
+
+    def estimate(self, key) -> tuple[int, int]:
+        """
+        Returns:
+            tuple: (count, error), the true count is between count - error and count
+        """
+        counter = self.counters.get(key)
+        if counter is None:
+            # Untracked keys have at most the smallest tracked count
+            floor = self._floor()
+            return floor, floor
+        return counter[0], counter[1]
+
+    def top(self, quantity: int) -> list[tuple[object, int, int]]:
+        """
+        Returns:
+            list: (key, count, error) tuples, highest count first
+        """
+        return [(key, count, error) for key, (count, error) in heapq.nlargest(quantity, self.counters.items(), key=lambda x: x[1][0])]
+
+    def to_dict(self) -> dict:
+        return {'capacity': self.capacity, 'total': self.total, 'counters': self.counters}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SpaceSaving':
+        summary = cls(capacity=data['capacity'])
+        summary.total = data['total']
+        summary.counters = {key: list(counter) for key, counter in data['counters'].items()}
+        summary._rebuild_heap()
+        return summary
+
+    def _floor(self) -> int:
+        # Only a full summary can have dropped keys
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(counter[0], next(self._sequence), key) for key, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_minimum(self) -> tuple[object, int]:
+        # Counts only grow, so a stale heap entry is re-pushed with its current count
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            current_count = self.counters[key][0]
+            if current_count == count:
+                return key, count
+            heapq.heappush(self._heap, (current_count, next(self._sequence), key))
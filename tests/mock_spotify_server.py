@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class FakeAuthManager:
+    """Stands in for SpotifyOAuth so the client never touches the real accounts service"""
+    def __init__(self, access_token: str = 'test-token', expires_at: int = 4102444800, refresh_delay: float = 0.0) -> None:
+        self.token_info = {
+            'access_token': access_token,
+            'refresh_token': 'test-refresh-token',
+            'expires_at': expires_at
+        }
+        self.refresh_delay = refresh_delay
+        self.cache_reads = 0
+        self.refreshes = 0
+
+    def get_cached_token(self) -> dict:
+        self.cache_reads += 1
+        return self.token_info
+
+    def get_access_token(self) -> dict:
+        return self.token_info
+
+    def refresh_access_token(self, refresh_token: str) -> dict:
+        # Issues test-token-1, test-token-2, ... valid for an hour
+        time.sleep(self.refresh_delay)
+        self.refreshes += 1
+        self.token_info = {
+            'access_token': f"test-token-{self.refreshes}",
+            'refresh_token': refresh_token,
+            'expires_at': int(time.time()) + 3600
+        }
+        return self.token_info
+
+class _QueueingHTTPServer(ThreadingHTTPServer):
+    # Concurrency tests open many connections at once, the default backlog of 5 drops some
+    request_queue_size = 128
+    daemon_threads = True
+
+class MockSpotifyServer:
+    """
+    Local HTTP server that records every request and answers with a user supplied responder.
+
+    The responder is called with (method, path, query, body) and returns
+    (status_code, response_body) or (status_code, response_body, headers).
+    """
+    def __init__(self, responder=None) -> None:
+        self.requests = []
+        self.responder = responder or (lambda method, path, query, body: (200, {}))
+        self._lock = threading.Lock()
+        self._server = _QueueingHTTPServer(('127.0.0.1', 0), self._build_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _build_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.replace('/v1/', '', 1)
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+
+                with server._lock:
+                    server.requests.append({'method': self.command, 'path': path, 'query': query, 'body': body, 'headers': dict(self.headers)})
+
+                result = server.responder(self.command, path, query, body)
+                status_code, response_body = result[0], result[1]
+                headers = result[2] if len(result) > 2 else {}
+
+                payload = json.dumps(response_body).encode() if response_body is not None else b''
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for header, value in headers.items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import audio_features
+from api_handler import SpotifyApiClient
+from audio_features import AudioFeatureMatrix, SimilarityIndex
+from batch_endpoints import NOT_FOUND, BatchResult
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+from playlist_generator import PlaylistGenerator
+
+def make_features(track_id: str) -> dict:
+    # Tracks 0-99 are quiet and acoustic, 100 and up are loud and energetic
+    number = int(track_id)
+    loud = number >= 100
+    return {
+        'id': track_id,
+        'danceability': 0.5,
+        'energy': (0.8 if loud else 0.2) + number % 100 / 1000,
+        'valence': 0.6 if loud else 0.3,
+        'tempo': 140.0 if loud else 80.0,
+        'loudness': -4.0 if loud else -18.0,
+        'acousticness': 0.1 if loud else 0.9,
+        'instrumentalness': 0.0,
+        'speechiness': 0.05,
+        'liveness': 0.1
+    }
+
+class FakeEnricher:
+    # IDs starting with 9 have no features, the ones in failing time out
+    def __init__(self, failing=()):
+        self.requested = []
+        self.failing = set(failing)
+
+    def get_audio_features(self, track_ids):
+        self.requested.append(list(track_ids))
+        result = BatchResult(track_ids)
+        for position, track_id in enumerate(track_ids):
+            if track_id in self.failing:
+                result.set_error(position, 'Read timed out')
+            elif track_id.startswith('9'):
+                result.set_error(position, NOT_FOUND)
+            else:
+                result.results[position] = make_features(track_id)
+        return result
+
+class TestAudioFeatures(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'audio_features.json')
+        self.track_ids = [f"{i:022d}" for i in range(0, 200, 10)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_matrix_is_cached(self):
+        """Test that features are fetched once, including tracks that have none"""
+        enricher = FakeEnricher()
+        unavailable_id = '9' * 22
+        matrix = AudioFeatureMatrix(self.cache_path).load()
+        self.assertEqual(matrix.update(self.track_ids + [unavailable_id, self.track_ids[0]], enricher), 21)
+
+        reloaded = AudioFeatureMatrix(self.cache_path).load()
+        self.assertEqual(len(reloaded), 20)
+        self.assertEqual(reloaded.update(self.track_ids + [unavailable_id], enricher), 0)
+        self.assertEqual(len(enricher.requested), 1)
+        self.assertEqual(reloaded.row(self.track_ids[-1])[audio_features.FEATURE_NAMES.index('tempo')], 140.0)
+
+    def test_failed_requests_are_retried(self):
+        """Test that tracks whose request failed aren't remembered as unavailable"""
+        matrix = AudioFeatureMatrix(self.cache_path)
+        self.assertEqual(matrix.update(self.track_ids, FakeEnricher(failing=self.track_ids[:3])), 20)
+        self.assertEqual(len(matrix), 17)
+        self.assertEqual(matrix.unavailable, set())
+
+        enricher = FakeEnricher()
+        self.assertEqual(AudioFeatureMatrix(self.cache_path).load().update(self.track_ids, enricher), 3)
+        self.assertEqual(enricher.requested, [self.track_ids[:3]])
+
+    def test_most_similar(self):
+        """Test that quiet seeds find quiet tracks with both index implementations"""
+        matrix = AudioFeatureMatrix(self.cache_path)
+        matrix.update(self.track_ids, FakeEnricher())
+        quiet_ids = set(self.track_ids[:10])
+
+        for numpy_module in (audio_features.np, None):
+            with patch.object(audio_features, 'np', numpy_module):
+                index = SimilarityIndex(matrix)
+                results = index.most_similar(self.track_ids[:2], 5)
+
+            self.assertEqual(len(results), 5)
+            self.assertTrue(all(track_id in quiet_ids for track_id, _ in results))
+            self.assertNotIn(self.track_ids[0], [track_id for track_id, _ in results])
+            self.assertEqual([score for _, score in results], sorted((score for _, score in results), reverse=True))
+
+        with self.assertRaises(ValueError):
+            index.most_similar(['unknown'], 5)
+
+    def test_similar_playlist_selection(self):
+        """Test that the generator fetches features 100 per request and picks the closest library tracks"""
+        library_ids = [f"{i:022d}" for i in range(250)]
+        library_path = os.path.join(self.temp_dir.name, 'library.json')
+        with open(library_path, 'w') as f:
+            json.dump([{'id': track_id, 'name': f"Track {track_id[-3:]}", 'genres': []} for track_id in library_ids], f)
+
+        def responder(method, path, query, body):
+            return 200, {'audio_features': [make_features(track_id) for track_id in query['ids'].split(',')]}
+
+        with MockSpotifyServer(responder) as server:
+            client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+            playlist_generator = PlaylistGenerator(client)
+            playlist_generator.library_analyzer.LIBRARY_TRACKS_PATH = library_path
+            playlist_generator.audio_feature_matrix = AudioFeatureMatrix(self.cache_path)
+            tracks = playlist_generator.select_similar_tracks([library_ids[150]], 10)
+
+        self.assertEqual([len(request['query']['ids'].split(',')) for request in server.requests], [100, 100, 50])
+        self.assertEqual(len(tracks), 10)
+        self.assertTrue(all(int(track['id']) >= 100 for track in tracks))
+        self.assertIn('similarity', tracks[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import batch_endpoints
+from api_handler import SpotifyApiClient
+from batch_endpoints import BATCH_ENDPOINTS, BatchEndpoint, get_batch_endpoint
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+class TestBatchEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.ids = [f"{i:022d}" for i in range(45)]
+
+    def test_batches_use_endpoint_limits(self):
+        """Test that each endpoint packs up to its own maximum number of IDs"""
+        self.assertEqual([len(batch) for batch, _, _ in BATCH_ENDPOINTS['albums'].pack(self.ids)], [20, 20, 5])
+        self.assertEqual([len(batch) for batch, _, _ in BATCH_ENDPOINTS['artists'].pack(self.ids)], [45])
+        self.assertEqual([len(batch) for batch, _, _ in BATCH_ENDPOINTS['artists'].pack(self.ids, max_batch_size=30)], [30, 15])
+
+        batch, endpoint, body = BATCH_ENDPOINTS['tracks'].pack(self.ids[:2])[0]
+        self.assertEqual(endpoint, f"tracks?ids={self.ids[0]},{self.ids[1]}")
+        self.assertIsNone(body)
+
+    def test_ids_in_body(self):
+        """Test that body endpoints keep the path unchanged and put the IDs in the JSON body"""
+        requests = BATCH_ENDPOINTS['follow-artists'].pack(self.ids)
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0][1], 'me/following?type=artist')
+        self.assertEqual(requests[0][2], {'ids': self.ids})
+
+        uris = [f"spotify:track:{track_id}" for track_id in self.ids * 3]
+        requests = BATCH_ENDPOINTS['add-playlist-items'].pack(uris, path_parameters={'playlist_id': 'p1'})
+        self.assertEqual([len(body['uris']) for _, _, body in requests], [100, 35])
+        self.assertEqual(requests[0][1], 'playlists/p1/tracks')
+
+    def test_url_length_closes_batches_early(self):
+        """Test that query batches stay under MAX_URL_LENGTH even below the ID limit"""
+        endpoint = BatchEndpoint('me/following/contains?type=artist', 50)
+        original_length = batch_endpoints.MAX_URL_LENGTH
+        batch_endpoints.MAX_URL_LENGTH = 200
+        try:
+            requests = endpoint.pack(self.ids, base_url='https://api.spotify.com/v1/')
+        finally:
+            batch_endpoints.MAX_URL_LENGTH = original_length
+
+        self.assertEqual([batch_id for batch, _, _ in requests for batch_id in batch], self.ids)
+        for batch, path, _ in requests:
+            self.assertLessEqual(len('https://api.spotify.com/v1/' + path), 200)
+            self.assertTrue(path.startswith('me/following/contains?type=artist&ids='))
+        # 65 characters before the IDs, then 22 per ID plus the commas between them
+        self.assertEqual(len(requests[0][0]), 5)
+
+    def test_unknown_endpoint(self):
+        with self.assertRaises(ValueError):
+            get_batch_endpoint('playlists')
+
+    def test_make_batch_request_uses_registry(self):
+        """Test that album lookups are sent 20 at a time and results come back in order"""
+        def responder(method, path, query, body):
+            return 200, {'albums': [{'id': album_id} for album_id in query['ids'].split(',')]}
+
+        with MockSpotifyServer(responder) as server:
+            client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+            albums = client.make_batch_request(items=self.ids, endpoint='albums')
+
+        self.assertEqual([album['id'] for album in albums], self.ids)
+        self.assertEqual([len(request['query']['ids'].split(',')) for request in server.requests], [20, 20, 5])
+
+    def test_failed_batches_are_bisected(self):
+        """Test that invalid IDs are never sent and a rejected ID only fails itself"""
+        bad_id = 'X' * 22
+        unknown_id = 'U' * 22
+        def responder(method, path, query, body):
+            ids = query['ids'].split(',')
+            if bad_id in ids:
+                return 400, {'error': {'status': 400, 'message': 'invalid id'}}
+            return 200, {'tracks': [None if track_id == unknown_id else {'id': track_id} for track_id in ids]}
+
+        items = self.ids[:7] + [bad_id, None, 'local-file', unknown_id]
+        with MockSpotifyServer(responder) as server:
+            client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+            result = client.make_batch_request(items=items, endpoint='tracks')
+
+        self.assertEqual([track['id'] if track else None for track in result], self.ids[:7] + [None, None, None, None])
+        self.assertEqual(set(result.errors), {bad_id, None, 'local-file', unknown_id})
+        self.assertEqual(result.errors[unknown_id], 'Not found')
+        # 9 IDs: the full batch, then halves down to the bad ID
+        self.assertEqual(len(server.requests), 9)
+
+    def test_other_failures_are_not_bisected(self):
+        """Test that a server error fails its batch once instead of being split"""
+        with MockSpotifyServer(lambda method, path, query, body: (500, {})) as server:
+            client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+            result = client.make_batch_request(items=self.ids[:10], endpoint='artists')
+
+        self.assertEqual(list(result), [None] * 10)
+        self.assertEqual(len(result.errors), 10)
+        self.assertEqual(len(server.requests), 1)
+
+if __name__ == '__main__':
+    unittest.main()
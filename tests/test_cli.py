@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from cli import CliContext, run, split_chain
+from play_event import PlayEvent, parse_timestamp
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.temp_dir.name, 'processed'))
+
+        events = [
+            PlayEvent(parse_timestamp('2023-01-01 10:00:00'), 200000, 'Song A', 'Artist 1', 'Album X', 'id_a'),
+            PlayEvent(parse_timestamp('2023-01-01 10:04:00'), 150000, 'Song B', 'Artist 2', 'Album Y', 'id_b'),
+            PlayEvent(parse_timestamp('2023-01-02 09:00:00'), 10000, 'Song A', 'Artist 1', 'Album X', 'id_a')
+        ]
+        with open(os.path.join(self.temp_dir.name, 'processed', 'combined_spotify_data_modified.json'), 'w') as f:
+            json.dump([event.to_processed() for event in events], f)
+
+        # Point the shared analyzer at the temp data and count how often the history is read
+        self.context = CliContext()
+        file_handler = self.context.history_analyzer.file_handler
+        file_handler.export_path = self.temp_dir.name
+        self.reads = 0
+        iter_modified_data = file_handler.iter_modified_data
+        def counting_iter_modified_data():
+            self.reads += 1
+            return iter_modified_data()
+        file_handler.iter_modified_data = counting_iter_modified_data
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_cli(self, argv):
+        output = io.StringIO()
+        with redirect_stderr(io.StringIO()):
+            records = run(argv, self.context, output)
+        return records, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_split_chain(self):
+        """Test that '+' separates commands and empty commands are dropped"""
+        self.assertEqual(split_chain(['a', '--x', '1', '+', 'b', '+', '+']), [['a', '--x', '1'], ['b']])
+
+    def test_chained_commands_share_loaded_history(self):
+        """Test that chained analyses print one JSON line each and read the history once"""
+        records, lines = self.run_cli([
+            'analyze', 'top', '--entity', 'artists', '--start', '2023-01-01', '--end', '2023-02-01', '-n', '1',
+            '+', 'analyze', 'stats', '--start', '2023-01-01', '--end', '2023-02-01',
+            '+', 'analyze', 'new', '--entity', 'tracks', '--year', '2023'
+        ])
+
+        self.assertEqual(records, lines)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]['result'], ['1. Artist 1 - 2 plays'])
+        self.assertEqual(lines[1]['result']['plays'], 3)
+        self.assertEqual(lines[1]['result']['sessions']['count'], 2)
+        self.assertEqual(lines[2]['result'], ['1. Song A - Artist 1 - 2 plays', '2. Song B - Artist 2 - 1 plays'])
+        self.assertEqual(self.reads, 1)
+
+    def test_invalid_command_runs_nothing(self):
+        """Test that the whole chain is parsed before anything runs"""
+        with self.assertRaises(SystemExit), redirect_stderr(io.StringIO()):
+            run(['analyze', 'stats', '+', 'analyze', 'bogus'], self.context, io.StringIO())
+        self.assertEqual(self.reads, 0)
+
+    def test_failed_command_stops_chain(self):
+        """Test that an error is reported as JSON and later commands don't run"""
+        records, lines = self.run_cli(['sync-library', 'remove-duplicates', '+', 'analyze', 'stats'])
+        self.assertEqual(len(lines), 1)
+        self.assertIn('--yes', lines[0]['error'])
+        self.assertEqual(self.reads, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import co_listening
+from co_listening import TrackNeighbors, split_sessions, top_k_cosine
+from history_analyzer import HistoryAnalyzer
+from play_event import PlayEvent
+
+def make_sessions(sessions: list[list[str]], start: int = 1_700_000_000, duration_ms: int = 180000) -> list[PlayEvent]:
+    # Back-to-back plays within a session, two hours between sessions
+    events = []
+    timestamp = start
+    for session in sessions:
+        for track_id in session:
+            timestamp += duration_ms // 1000
+            events.append(PlayEvent(timestamp, duration_ms, f"Song {track_id}", 'Artist', 'Album', track_id))
+        timestamp += 7200
+    return events
+
+class TestCoListening(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # a and b always together, c with them once, d on its own
+        self.events = make_sessions([['a', 'b', 'c'], ['a', 'b'], ['b', 'a', 'd'], ['d', 'e'], ['c', 'e']])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_split_sessions(self):
+        """Test that idle gaps end sessions and skips are left out"""
+        events = self.events[:3] + [PlayEvent(self.events[2].timestamp + 10, 5000, 'Skipped', 'Artist', 'Album', 'x')]
+        self.assertEqual([[event.track_id for event in session] for session in split_sessions(events)], [['a', 'b', 'c']])
+        self.assertEqual(len(list(split_sessions(self.events))), 5)
+
+    def test_neighbors(self):
+        """Test cosine scores, the minimum co-session count and recommendations for several seeds"""
+        neighbors = TrackNeighbors.build(self.events, k=2, min_co_sessions=1)
+        self.assertEqual(neighbors.neighbors_of('a'), [('b', 1.0), ('c', 0.4082)])
+        self.assertEqual(neighbors.names['a'], 'Song a - Artist')
+
+        strict = TrackNeighbors.build(self.events, min_co_sessions=2)
+        self.assertEqual(strict.neighbors_of('a'), [('b', 1.0)])
+        self.assertEqual(strict.neighbors_of('d'), [])
+
+        self.assertEqual([track_id for track_id, _ in neighbors.recommend(['a', 'e'], 3)], ['b', 'c', 'd'])
+        with self.assertRaises(ValueError):
+            neighbors.recommend(['unknown'], 3)
+
+    def test_sparse_implementations_agree(self):
+        """Test that the scipy and Counter products give the same neighbours"""
+        if co_listening.sparse is None:
+            self.skipTest('scipy is not installed')
+        generator = random.Random(7)
+        baskets = [generator.sample(range(300), generator.randint(2, 12)) for _ in range(500)]
+        with_scipy = top_k_cosine(baskets, 300, 5, 2)
+        with patch.object(co_listening, 'sparse', None):
+            without_scipy = top_k_cosine(baskets, 300, 5, 2)
+
+        for scipy_row, python_row in zip(with_scipy, without_scipy):
+            self.assertEqual([item for item, _ in scipy_row], [item for item, _ in python_row])
+            for (_, scipy_score), (_, python_score) in zip(scipy_row, python_row):
+                self.assertAlmostEqual(scipy_score, python_score, places=5)
+
+    def test_analyzer_caches_table(self):
+        """Test that the table is saved next to the history and reused until the history changes"""
+        os.makedirs(os.path.join(self.temp_dir.name, 'processed'))
+        with open(os.path.join(self.temp_dir.name, 'processed', 'combined_spotify_data_modified.json'), 'w') as f:
+            json.dump([event.to_processed() for event in self.events], f)
+
+        history_analyzer = HistoryAnalyzer()
+        history_analyzer.file_handler.export_path = self.temp_dir.name
+        self.assertEqual(history_analyzer.get_similar_tracks(['a'], 1), [{'id': 'b', 'track': 'Song b - Artist', 'score': 1.0}])
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, 'processed', TrackNeighbors.FILE_NAME)))
+
+        reloaded = HistoryAnalyzer()
+        reloaded.file_handler.export_path = self.temp_dir.name
+        with patch.object(TrackNeighbors, 'build', side_effect=AssertionError('rebuilt')):
+            self.assertEqual(reloaded.load_track_neighbors().neighbors_of('a'), [('b', 1.0)])
+
+if __name__ == '__main__':
+    unittest.main()
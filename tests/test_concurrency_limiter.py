@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import AdaptiveConcurrencyLimiter, SpotifyApiClient
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+class ThrottlingServer:
+    """Stub that answers slowly and returns 429 when more than capacity requests overlap"""
+    def __init__(self, capacity: int, latency: float = 0.02) -> None:
+        self.capacity = capacity
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, query, body):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            over_capacity = self.active > self.capacity
+            if over_capacity:
+                self.throttled += 1
+        try:
+            if over_capacity:
+                return 429, {'error': {'status': 429}}, {'Retry-After': '0'}
+            time.sleep(self.latency)
+            return 200, {'id': path}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    def test_additive_increase_and_single_decrease_per_window(self):
+        """Test that the window grows with steady latency and one burst of 429s halves it once"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8)
+        for _ in range(20):
+            limiter.release(limiter.acquire(), latency=0.05)
+        self.assertGreater(limiter.limit, 6)
+
+        # Four requests sent in the same window are all throttled
+        tickets = [limiter.acquire() for _ in range(4)]
+        window = limiter.limit
+        for ticket in tickets:
+            limiter.release(ticket, latency=0.05, overloaded=True)
+        self.assertAlmostEqual(limiter.limit, window / 2)
+        self.assertEqual(limiter.get_status()['decreases'], 1)
+
+    def test_latency_spike_backs_off(self):
+        """Test that a request far slower than usual lowers the limit and small jitter doesn't"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8)
+        for latency in (0.05, 0.06, 0.05, 0.12):
+            limiter.release(limiter.acquire(), latency=latency)
+        self.assertEqual(limiter.get_status()['limit'], 8)
+
+        limiter.release(limiter.acquire(), latency=1.0)
+        self.assertEqual(limiter.get_status()['limit'], 4)
+
+    def test_stub_server_throttling(self):
+        """Test that the client backs off from a throttling server and still completes every request"""
+        stub = ThrottlingServer(capacity=3)
+        with MockSpotifyServer(stub) as server:
+            client = SpotifyApiClient(max_retries=6, base_url=server.base_url, auth_manager=FakeAuthManager())
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(lambda i: client.make_request(f'tracks/{i}'), range(60)))
+
+        self.assertEqual([result['id'] for result in results], [f'tracks/{i}' for i in range(60)])
+        status = client.concurrency_limiter.get_status()
+        self.assertLessEqual(status['limit'], 4)
+        self.assertEqual(status['in_flight'], 0)
+        # Most requests went through first time, the limiter kept the overlap near capacity
+        self.assertLess(stub.throttled, 20)
+
+    def test_window_grows_without_throttling(self):
+        """Test that the limit climbs towards its maximum when the server keeps up"""
+        stub = ThrottlingServer(capacity=100, latency=0.005)
+        with MockSpotifyServer(stub) as server:
+            client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                list(executor.map(lambda i: client.make_request(f'tracks/{i}'), range(100)))
+
+        self.assertGreater(client.concurrency_limiter.limit, 8)
+        self.assertGreater(stub.peak, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import SpotifyApiClient
+from data_loader import DataLoader
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+class TestDataLoader(unittest.TestCase):
+    def setUp(self):
+        self.ids = [f"artist{i:016d}" for i in range(60)]
+        self.fail_next = False
+
+    def responder(self, method, path, query, body):
+        if self.fail_next:
+            self.fail_next = False
+            return 500, {}
+        return 200, {path: [{'id': item_id, 'genres': ['rock']} for item_id in query['ids'].split(',')]}
+
+    def requested_ids(self, server):
+        return [request['query']['ids'].split(',') for request in server.requests]
+
+    def test_load_many_deduplicates_and_caches(self):
+        """Test that repeated IDs are sent once and cached IDs aren't sent again"""
+        with MockSpotifyServer(self.responder) as server:
+            loader = DataLoader(SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager()))
+
+            result = loader.load_many('artists', self.ids[:30] + self.ids[:30])
+            self.assertEqual([artist['id'] for artist in result], self.ids[:30] * 2)
+            self.assertEqual(self.requested_ids(server), [self.ids[:30]])
+
+            # Only the 30 new artists are requested, in one full batch
+            server.requests.clear()
+            result = loader.load_many('artists', self.ids)
+            self.assertEqual(len(result.by_id()), 60)
+            self.assertEqual(self.requested_ids(server), [self.ids[30:]])
+
+    def test_concurrent_loads_share_one_request(self):
+        """Test that loads from different threads within one tick are sent together"""
+        with MockSpotifyServer(self.responder) as server:
+            loader = DataLoader(SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager()), tick_seconds=0.05)
+
+            futures = []
+            def load(item_id):
+                futures.append(loader.load('artists', item_id))
+            threads = [threading.Thread(target=load, args=(item_id,)) for item_id in self.ids[:5] + self.ids[:5]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(sorted(future.result(timeout=5)['id'] for future in futures), sorted(self.ids[:5] * 2))
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual(sorted(self.requested_ids(server)[0]), self.ids[:5])
+
+    def test_failures_are_retried_and_primed_objects_are_used(self):
+        """Test that failed lookups aren't cached and primed objects need no request"""
+        with MockSpotifyServer(self.responder) as server:
+            loader = DataLoader(SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager()))
+            loader.prime('artists', self.ids[0], {'id': self.ids[0], 'genres': ['primed']})
+
+            self.fail_next = True
+            result = loader.load_many('artists', self.ids[:3])
+            self.assertEqual(result[0]['genres'], ['primed'])
+            self.assertEqual(set(result.errors), set(self.ids[1:3]))
+
+            result = loader.load_many('artists', self.ids[:3])
+            self.assertEqual(result.errors, {})
+            self.assertEqual(self.requested_ids(server), [self.ids[1:3], self.ids[1:3]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import SpotifyApiClient
+from library_analyzer import LibraryAnalyzer
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+class TestDuplicateRemoval(unittest.TestCase):
+    def setUp(self):
+        # Work in a scratch directory so the journal and history files are isolated
+        self.original_cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.makedirs('data/processed')
+
+        self.duplicate_tracks = [
+            {'Song A-Artist': {
+                'artist': 'Artist',
+                'ids': ['a1', 'a2', 'a3'],
+                'added_at': {'a1': '2021-05-01T00:00:00Z', 'a2': '2019-01-01T00:00:00Z', 'a3': '2023-01-01T00:00:00Z'}
+            }},
+            {'Song B-Artist': {
+                'artist': 'Artist',
+                'ids': ['b1', 'b2'],
+                'added_at': {'b1': '2020-01-01T00:00:00Z', 'b2': '2022-01-01T00:00:00Z'}
+            }}
+        ]
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.temp_dir.cleanup()
+
+    def build_analyzer(self, server):
+        client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+        return LibraryAnalyzer(spotify_api_handler=client)
+
+    def test_keeper_policies(self):
+        """Test that each policy keeps the expected copy"""
+        with MockSpotifyServer() as server:
+            analyzer = self.build_analyzer(server)
+        track_data = list(self.duplicate_tracks[0].values())[0]
+
+        self.assertEqual(analyzer.select_duplicate_keeper(track_data, 'first'), 'a1')
+        self.assertEqual(analyzer.select_duplicate_keeper(track_data, 'earliest_added'), 'a2')
+        self.assertEqual(analyzer.select_duplicate_keeper(track_data, 'most_played', {'a3': 5, 'a1': 2}), 'a3')
+        # No plays at all falls back to the earliest added copy
+        self.assertEqual(analyzer.select_duplicate_keeper(track_data, 'most_played', {}), 'a2')
+        with self.assertRaises(ValueError):
+            analyzer.select_duplicate_keeper(track_data, 'newest')
+
+    def test_remove_and_restore(self):
+        """Test that removals are journaled and restore re-adds them with their added_at dates"""
+        with MockSpotifyServer() as server:
+            analyzer = self.build_analyzer(server)
+            analyzer.MAX_REQUESTS = 2
+            journal_entry = analyzer.remove_duplicate_library_tracks(self.duplicate_tracks)
+
+            deleted_ids = sorted(track_id for request in server.requests if request['method'] == 'DELETE' for track_id in request['body']['ids'])
+            self.assertEqual(deleted_ids, ['a1', 'a3', 'b2'])
+            self.assertEqual(journal_entry['failed_ids'], [])
+
+            with open(analyzer.REMOVAL_JOURNAL_PATH, 'r') as f:
+                journal = json.load(f)
+            self.assertEqual(len(journal), 1)
+            self.assertFalse(journal[0]['restored'])
+
+            restored_count = analyzer.restore_removed_library_tracks()
+            self.assertEqual(restored_count, 3)
+
+            restored = {
+                track['id']: track['added_at']
+                for request in server.requests if request['method'] == 'PUT'
+                for track in request['body']['timestamped_ids']
+            }
+            self.assertEqual(restored['a3'], '2023-01-01T00:00:00Z')
+            self.assertEqual(set(restored), {'a1', 'a3', 'b2'})
+            self.assertTrue(analyzer.load_removal_journal()[0]['restored'])
+
+            # A second restore has nothing left to do
+            self.assertEqual(analyzer.restore_removed_library_tracks(), 0)
+
+    def test_failed_batches_are_journaled(self):
+        """Test that a failing batch is recorded and skipped on restore"""
+        def responder(method, path, query, body):
+            if method == 'DELETE' and 'b2' in body['ids']:
+                return 403, {'error': 'forbidden'}
+            return 200, {}
+
+        with MockSpotifyServer(responder) as server:
+            analyzer = self.build_analyzer(server)
+            analyzer.MAX_REQUESTS = 2
+            journal_entry = analyzer.remove_duplicate_library_tracks(self.duplicate_tracks, 'first')
+
+            self.assertEqual(journal_entry['failed_ids'], ['b2'])
+            self.assertEqual(analyzer.restore_removed_library_tracks(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
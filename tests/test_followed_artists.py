@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import SpotifyApiClient
+from library_analyzer import LibraryAnalyzer
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+# Follow requests only send well-formed Spotify IDs
+NEW_ARTIST_ID = '4newartist000000000000'
+
+class TestFollowedArtists(unittest.TestCase):
+    def setUp(self):
+        # Work in a scratch directory so the snapshots are isolated
+        self.original_cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        os.makedirs('data/processed')
+
+        self.followed = [{'name': f'Artist {i}', 'id': f'artist{i:02d}'} for i in range(5)]
+        with open('data/processed/library_tracks_simplified.json', 'w') as f:
+            json.dump([
+                {'name': 'Song 1', 'artist': 'Artist 1', 'artist_id': 'artist01', 'album': 'Album', 'album_id': 'album1', 'id': 't1', 'added_at': '', 'genres': []},
+                {'name': 'Song 2', 'artist': 'New Artist', 'artist_id': NEW_ARTIST_ID, 'album': 'Album', 'album_id': 'album1', 'id': 't2', 'added_at': '', 'genres': []},
+                {'name': 'Song 3', 'artist': 'New Artist', 'artist_id': NEW_ARTIST_ID, 'album': 'Album', 'album_id': 'album1', 'id': 't3', 'added_at': '', 'genres': []}
+            ], f)
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.temp_dir.cleanup()
+
+    def responder(self, method, path, query, body):
+        if method == 'PUT':
+            self.followed.extend({'name': artist_id, 'id': artist_id} for artist_id in body['ids'])
+            return 204, None
+
+        # Serve the followed artists two at a time with an 'after' cursor
+        ids = [artist['id'] for artist in self.followed]
+        start = ids.index(query['after']) + 1 if 'after' in query else 0
+        page = self.followed[start:start + 2]
+        after = page[-1]['id'] if start + 2 < len(self.followed) else None
+        return 200, {'artists': {'items': page, 'total': len(self.followed), 'cursors': {'after': after}}}
+
+    def test_snapshot_refresh_and_follow(self):
+        """Test that every refresh walks all pages and follows only the missing artist"""
+        with MockSpotifyServer(self.responder) as server:
+            analyzer = LibraryAnalyzer(SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager()))
+
+            # Every page is walked without a separate count request
+            self.assertEqual(len(analyzer.get_followed_artists()), 5)
+            self.assertEqual(len(server.requests), 3)
+
+            unfollowed = analyzer.find_unfollowed_library_artists()
+            self.assertEqual(unfollowed, [{'name': 'New Artist', 'id': NEW_ARTIST_ID}])
+
+            server.requests.clear()
+            analyzer.follow_library_artists()
+            follow_requests = [request for request in server.requests if request['method'] == 'PUT']
+            self.assertEqual([request['body']['ids'] for request in follow_requests], [[NEW_ARTIST_ID]])
+            self.assertEqual(analyzer.find_unfollowed_library_artists(), [])
+
+    def test_changes_beyond_first_page_are_seen(self):
+        """Test that an unfollow and a follow past the first page, same total, update the snapshot"""
+        with MockSpotifyServer(self.responder) as server:
+            analyzer = LibraryAnalyzer(SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager()))
+            analyzer.get_followed_artists()
+
+            # Swap the last followed artist for the library artist that wasn't followed
+            self.followed[-1] = {'name': 'New Artist', 'id': NEW_ARTIST_ID}
+            self.assertEqual(analyzer.find_unfollowed_library_artists(), [])
+            self.assertIn(NEW_ARTIST_ID, [artist['id'] for artist in analyzer.load_followed_artists_snapshot()['artists']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import genre_inference
+from file_handler import FileHandler
+from genre_inference import GenreInference, build_artist_graph
+from library_analyzer import LibraryAnalyzer
+from play_event import PlayEvent
+
+def make_sessions(sessions: list[list[str]], start: int = 1_700_000_000) -> list[PlayEvent]:
+    # One three-minute play per artist, two hours between sessions
+    events = []
+    timestamp = start
+    for session in sessions:
+        for artist in session:
+            timestamp += 180
+            events.append(PlayEvent(timestamp, 180000, f"{artist} song", artist, f"{artist} album", None))
+        timestamp += 7200
+    return events
+
+class TestGenreInference(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # Untagged is always played with the rock artists, Guest shares a compilation with Jazz 1
+        self.events = make_sessions([['Rock 1', 'Untagged', 'Rock 2'], ['Untagged', 'Rock 1'], ['Rock 2', 'Untagged'], ['Jazz 1', 'Jazz 2'], ['Jazz 2', 'Jazz 1']])
+        self.library_tracks = [
+            {'id': 't1', 'artist': 'Rock 1', 'album_id': 'a1', 'genres': ['rock']},
+            {'id': 't2', 'artist': 'Rock 2', 'album_id': 'a2', 'genres': ['rock', 'grunge']},
+            {'id': 't3', 'artist': 'Jazz 1', 'album_id': 'compilation', 'genres': ['jazz']},
+            {'id': 't4', 'artist': 'Guest', 'album_id': 'compilation', 'genres': []},
+            {'id': 't5', 'artist': 'Untagged', 'album_id': 'a3', 'genres': []},
+            {'id': 't6', 'artist': 'Loner', 'album_id': 'a4', 'genres': []}
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_artist_graph(self):
+        """Test that sessions shared at least twice and shared albums become edges"""
+        edges = build_artist_graph(self.events, self.library_tracks)
+        self.assertEqual(edges[('Rock 1', 'Untagged')], 2)
+        self.assertEqual(edges[('Guest', 'Jazz 1')], 2.0)
+        self.assertNotIn(('Rock 1', 'Rock 2'), edges)
+
+    def test_inferred_genres(self):
+        """Test that untagged artists take their neighbours' genres with both implementations"""
+        for sparse_module in (genre_inference.sparse, None):
+            with patch.object(genre_inference, 'sparse', sparse_module):
+                inference = GenreInference.build(self.events, self.library_tracks)
+
+            self.assertEqual(inference.genres_for('Rock 2'), ['grunge', 'rock'])
+            self.assertFalse(inference.is_inferred('Rock 2'))
+            self.assertEqual(inference.genres_for('Untagged')[0], 'rock')
+            self.assertTrue(inference.is_inferred('Untagged'))
+            self.assertEqual(inference.genres_for('Guest'), ['jazz'])
+            self.assertEqual(inference.genres_for('Guest', include_inferred=False), [])
+            self.assertEqual(inference.genres_for('Loner'), [])
+            confidences = inference.artists['Untagged']['genres']
+            self.assertAlmostEqual(confidences['rock'], 0.75, places=3)
+            self.assertAlmostEqual(confidences['grunge'], 0.25, places=3)
+
+    def test_library_genres_include_inferred(self):
+        """Test that library genre counts cover untagged artists and reuse the cache"""
+        library_analyzer = LibraryAnalyzer()
+        library_analyzer.LIBRARY_TRACKS_PATH = os.path.join(self.temp_dir.name, 'library.json')
+        library_analyzer.ARTIST_GENRES_PATH = os.path.join(self.temp_dir.name, 'artist_genres.json')
+        with open(library_analyzer.LIBRARY_TRACKS_PATH, 'w') as f:
+            json.dump(self.library_tracks, f)
+
+        file_handler = FileHandler()
+        file_handler.export_path = self.temp_dir.name
+        with patch('library_analyzer.FileHandler', return_value=file_handler):
+            self.assertEqual(dict(library_analyzer.get_library_genres()), {'rock': 2, 'grunge': 1, 'jazz': 2})
+            self.assertEqual(dict(library_analyzer.get_library_genres(include_inferred=False)), {'rock': 2, 'grunge': 1, 'jazz': 1})
+
+            with patch.object(GenreInference, 'build', side_effect=AssertionError('rebuilt')):
+                tracks = library_analyzer.add_inferred_genres(self.library_tracks)
+        self.assertEqual(tracks[3]['genres'], ['jazz'])
+        self.assertTrue(tracks[3]['genres_inferred'])
+        self.assertNotIn('genres_inferred', tracks[0])
+
+if __name__ == '__main__':
+    unittest.main()
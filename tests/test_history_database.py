@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from history_database import HistoryDatabase
+from play_event import PlayEvent, parse_timestamp
+
+class TestHistoryDatabase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.temp_dir.name, 'processed'))
+
+        self.database = HistoryDatabase()
+        self.database.file_handler.export_path = self.temp_dir.name
+
+        events = [
+            PlayEvent(parse_timestamp('2023-01-01 23:30:00'), 200000, 'Song A', 'Artist 1', 'Album X', 'id_a', utc_offset=3600),
+            PlayEvent(parse_timestamp('2023-01-02 10:00:00'), 150000, 'Song B', 'Artist 2', 'Album Y', 'id_b', utc_offset=3600),
+            PlayEvent(parse_timestamp('2023-01-03 10:00:00'), 100000, 'Song A', 'Artist 1', 'Album X', 'id_a', utc_offset=3600)
+        ]
+        self.write_processed('combined_spotify_data_modified.json', [event.to_processed() for event in events])
+        self.write_processed('library_tracks_simplified.json', [
+            {'name': 'Song A', 'artist': 'Artist 1', 'artist_id': 'artist_1', 'album': 'Album X', 'album_id': 'album_x',
+             'id': 'id_a', 'added_at': '2022-12-01T00:00:00Z', 'genres': ['rock', 'indie']}
+        ])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_processed(self, file_name, data):
+        with open(self.database.file_handler.processed_file_path(file_name), 'w') as f:
+            json.dump(data, f)
+
+    def test_query_builds_and_aggregates(self):
+        """Test that the first query builds the database and plays can be grouped"""
+        rows = self.database.query('SELECT artist, COUNT(*) AS plays, SUM(duration_s) AS seconds FROM plays GROUP BY artist ORDER BY plays DESC')
+        self.assertEqual(rows, [
+            {'artist': 'Artist 1', 'plays': 2, 'seconds': 300.0},
+            {'artist': 'Artist 2', 'plays': 1, 'seconds': 150.0}
+        ])
+
+    def test_local_date_uses_utc_offset(self):
+        """Test that a late-night UTC play lands on the next local day"""
+        rows = self.database.query('SELECT local_date FROM plays ORDER BY epoch')
+        self.assertEqual([row['local_date'] for row in rows], ['2023-01-02', '2023-01-02', '2023-01-03'])
+
+    def test_join_plays_to_library_genres(self):
+        """Test that plays can be joined to library metadata"""
+        rows = self.database.query(
+            'SELECT g.genre, COUNT(*) AS plays FROM plays p '
+            'JOIN library_tracks l ON l.id = p.track_id '
+            'JOIN artist_genres g ON g.artist_id = l.artist_id '
+            'GROUP BY g.genre ORDER BY g.genre'
+        )
+        self.assertEqual(rows, [{'genre': 'indie', 'plays': 2}, {'genre': 'rock', 'plays': 2}])
+
+    def test_rebuilds_only_when_sources_change(self):
+        """Test that the database is reused until a source file is newer"""
+        self.database.query('SELECT 1')
+        self.assertTrue(self.database.is_current())
+
+        # Age the database so the history looks newer
+        history_path = self.database.file_handler.processed_file_path('combined_spotify_data_modified.json')
+        earlier = os.path.getmtime(history_path) - 10
+        os.utime(self.database.database_path, (earlier, earlier))
+        self.assertFalse(self.database.is_current())
+
+        self.database.ensure_current()
+        self.assertTrue(self.database.is_current())
+
+    def test_queries_are_read_only(self):
+        """Test that a query can't modify the database"""
+        with self.assertRaises(sqlite3.OperationalError):
+            self.database.query('DELETE FROM plays')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from history_analyzer import HistoryAnalyzer
+from history_rollups import HistoryRollups
+from play_event import PlayEvent, to_epoch
+
+class TestHistoryRollups(unittest.TestCase):
+    def setUp(self):
+        # Two years of random plays over a small catalog
+        random.seed(7)
+        start = to_epoch(datetime(2022, 1, 1))
+        self.events = sorted((
+            PlayEvent(
+                timestamp=start + random.randrange(730 * 86400),
+                duration_ms=random.randrange(300000),
+                track=f"Track {random.randrange(30)}",
+                artist=f"Artist {random.randrange(8)}",
+                album=f"Album {random.randrange(12)}",
+                track_id=None
+            )
+            for _ in range(5000)
+        ), key=lambda event: event.timestamp)
+
+        self.rollups = HistoryRollups()
+        self.rollups.add_many(self.events)
+
+    def scan(self, entity_type, start, end):
+        # Brute force count over the raw plays for comparison
+        index = HistoryRollups.ENTITY_TYPES.index(entity_type)
+        totals = {}
+        for event in self.events:
+            if to_epoch(start) <= event.timestamp < to_epoch(end):
+                key = HistoryRollups.entity_keys(event)[index]
+                plays, milliseconds = totals.get(key, (0, 0))
+                totals[key] = (plays + 1, milliseconds + event.duration_ms)
+        return totals
+
+    def test_ranges_match_a_full_scan(self):
+        """Test that summed buckets equal a scan for ranges that mix months and days"""
+        ranges = [
+            (datetime(2022, 1, 1), datetime(2023, 1, 1)),
+            (datetime(2022, 3, 17), datetime(2022, 3, 18)),
+            (datetime(2022, 2, 20), datetime(2023, 5, 9)),
+            (datetime(2021, 6, 1), datetime(2030, 1, 1)),
+            (datetime(2022, 5, 5), datetime(2022, 5, 5))
+        ]
+        for start, end in ranges:
+            for entity_type in HistoryRollups.ENTITY_TYPES:
+                expected = self.scan(entity_type, start, end)
+                top = self.rollups.top(entity_type, 1000, start, end)
+                self.assertEqual({key: (plays, round(ms / 1000, 2)) for key, (plays, ms) in expected.items()},
+                                 {key: (plays, seconds) for key, plays, seconds in top})
+
+    def test_ranking_and_persistence(self):
+        """Test ordering by plays and by seconds, and a save/load round trip"""
+        start, end = datetime(2022, 1, 1), datetime(2024, 1, 1)
+        by_plays = self.rollups.top('artists', 3, start, end)
+        by_seconds = self.rollups.top('artists', 3, start, end, by='seconds')
+
+        self.assertEqual([item[1] for item in by_plays], sorted((item[1] for item in by_plays), reverse=True))
+        self.assertEqual([item[2] for item in by_seconds], sorted((item[2] for item in by_seconds), reverse=True))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, HistoryRollups.FILE_NAME)
+            self.rollups.save(file_path)
+            self.assertEqual(HistoryRollups.load(file_path).top('artists', 3, start, end), by_plays)
+
+        with self.assertRaises(ValueError):
+            self.rollups.top('genres', 3, start, end)
+
+    def test_scan_excludes_end_like_rollups(self):
+        """Test that a play at exactly the end of a range is left out by the scan path too"""
+        end = datetime(2022, 6, 1)
+        at_end = PlayEvent(to_epoch(end), 1000, 'Track 0', 'Artist 0', 'Album 0', None)
+        history_analyzer = HistoryAnalyzer()
+        history_analyzer._listening_history = self.events + [at_end]
+
+        start = datetime(2022, 5, 1)
+        scanned = history_analyzer.filter_listening_history(start, end)
+        self.assertNotIn(at_end, scanned)
+        self.assertEqual(len(scanned), sum(plays for plays, _ in self.scan('tracks', start, end).values()))
+
+if __name__ == '__main__':
+    unittest.main()
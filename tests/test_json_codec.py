@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import json_codec
+
+class TestJsonCodec(unittest.TestCase):
+    def setUp(self):
+        self.record = {'ts': '2024-01-01T00:00:00Z', 'ms_played': 1200, 'skipped': None, 'genres': ['rock', 'pop'], 'nested': {'shuffle': True}, 'track': 'Sóng B'}
+
+    def test_round_trip(self):
+        self.assertEqual(json_codec.loads(json_codec.dumps(self.record)), self.record)
+        self.assertEqual(json_codec.loads(json_codec.dumps(self.record).encode('utf-8')), self.record)
+
+    def test_matches_json_module(self):
+        """Test that output is the same whichever backend is installed"""
+        self.assertEqual(json_codec.dumps(self.record), json.dumps(self.record, separators=(',', ':'), ensure_ascii=False))
+        self.assertEqual(json_codec.dumps(self.record, indent=2), json.dumps(self.record, indent=2, ensure_ascii=False))
+        self.assertEqual(json_codec.dumps(self.record, indent=4), json.dumps(self.record, indent=4, ensure_ascii=False))
+
+    def test_json_module_fallback(self):
+        """Test that everything still works without orjson"""
+        with patch.object(json_codec, 'orjson', None):
+            encoded = json_codec.dumps(self.record)
+            self.assertEqual(encoded, json.dumps(self.record, separators=(',', ':'), ensure_ascii=False))
+            self.assertEqual(json_codec.loads(encoded.encode('utf-8')), self.record)
+            self.assertEqual(json_codec.dumps({'when': 1}, default=str), '{"when":1}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from json_stream import JsonArrayReader, JsonArrayWriter, append_records, iter_json_array, iter_records, read_last_json_line, write_json_array, write_records
+
+class TestJsonStream(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'data.json')
+        self.records = [
+            {'ts': '2023-01-01T10:00:00Z', 'ms_played': 123456, 'master_metadata_track_name': 'Song "A", [live]', 'skipped': None},
+            {'ts': '2023-01-01T10:05:00Z', 'ms_played': 7, 'master_metadata_track_name': 'Sóng B', 'skipped': True},
+            12345,
+            [1, 2, {'nested': ']'}]
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_reader_handles_items_split_across_chunks(self):
+        """Test that tiny read chunks still decode every item"""
+        with open(self.file_path, 'w') as f:
+            json.dump(self.records, f, indent=2)
+
+        for chunk_size in (1, 3, 7, 64):
+            self.assertEqual(list(JsonArrayReader(self.file_path, chunk_size=chunk_size)), self.records)
+
+    def test_writer_matches_json_dump(self):
+        """Test that indented streaming output is identical to json.dump"""
+        write_json_array(iter(self.records), self.file_path, indent=2)
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), json.dumps(self.records, indent=2, ensure_ascii=False))
+
+        write_json_array([], self.file_path, indent=2)
+        self.assertEqual(list(iter_json_array(self.file_path)), [])
+
+    def test_writer_can_replace_the_file_it_reads(self):
+        """Test that a file can be rewritten from its own stream"""
+        write_json_array(self.records[:2], self.file_path)
+        write_json_array((dict(item, ms_played=0) for item in iter_json_array(self.file_path)), self.file_path)
+        self.assertEqual([item['ms_played'] for item in iter_json_array(self.file_path)], [0, 0])
+
+    def test_failed_write_keeps_original(self):
+        """Test that an error while writing leaves the original file untouched"""
+        write_json_array(self.records, self.file_path)
+
+        with self.assertRaises(RuntimeError):
+            with JsonArrayWriter(self.file_path) as writer:
+                writer.write({'partial': True})
+                raise RuntimeError('boom')
+
+        self.assertEqual(list(iter_json_array(self.file_path)), self.records)
+        self.assertFalse(os.path.exists(f"{self.file_path}.tmp"))
+
+class TestOutputFormats(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.records = [
+            {'Timestamp': '2023-01-01 10:00:00', 'Epoch': 1672567200, 'Track': 'Song A', 'Arist': 'Artist', 'id': 'a'},
+            {'Timestamp': '2023-01-01 10:05:00', 'Epoch': 1672567500, 'Track': 'Song A', 'Arist': 'Artist', 'id': None, 'UTC Offset (s)': 3600},
+            {'Timestamp': '2023-01-01 10:09:00', 'Epoch': 1672567740, 'Track': 'Sóng B', 'Arist': 'Artist', 'id': 'b'}
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, file_name):
+        return os.path.join(self.temp_dir.name, file_name)
+
+    def test_round_trip_every_format(self):
+        """Test that every output format reads back the records it wrote, including optional fields"""
+        for output_format, file_name in (('json', 'data.json'), ('json_pretty', 'pretty.json'), ('jsonl', 'data.jsonl'), ('columnar', 'data.columns.json.gz')):
+            self.assertEqual(write_records(iter(self.records), self.path(file_name), output_format), 3)
+            self.assertEqual(list(iter_records(self.path(file_name))), self.records, output_format)
+            self.assertFalse(os.path.exists(self.path(f"{file_name}.tmp")))
+
+    def test_compact_json_has_no_padding(self):
+        """Test that the default JSON output has no whitespace between tokens"""
+        write_records(self.records, self.path('data.json'))
+        with open(self.path('data.json'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), json.dumps(self.records, separators=(',', ':'), ensure_ascii=False))
+
+    def test_append(self):
+        """Test that appending adds records to the end in every format"""
+        for file_name in ('data.json', 'data.jsonl', 'data.columns.json.gz'):
+            self.assertEqual(append_records(self.records[:2], self.path(file_name)), 2)
+            self.assertEqual(append_records(iter(self.records[2:]), self.path(file_name)), 1)
+            self.assertEqual(list(iter_records(self.path(file_name))), self.records, file_name)
+
+    def test_append_repairs_interrupted_line(self):
+        """Test that a half-written JSON Lines record is dropped before appending"""
+        write_records(self.records[:2], self.path('data.jsonl'), 'jsonl')
+        with open(self.path('data.jsonl'), 'a') as f:
+            f.write('{"Timestamp": "2023-01')
+
+        append_records(self.records[2:], self.path('data.jsonl'))
+        self.assertEqual(list(iter_records(self.path('data.jsonl'))), self.records)
+
+    def test_read_last_json_line(self):
+        """Test that the last complete record is read from the end, ignoring a half-written one"""
+        write_records(self.records, self.path('data.jsonl'), 'jsonl')
+        self.assertEqual(read_last_json_line(self.path('data.jsonl')), self.records[-1])
+        with open(self.path('data.jsonl'), 'a') as f:
+            f.write('{"Timestamp": "2023-01')
+        self.assertEqual(read_last_json_line(self.path('data.jsonl')), self.records[-1])
+
+        write_records([], self.path('empty.jsonl'), 'jsonl')
+        self.assertIsNone(read_last_json_line(self.path('empty.jsonl')))
+
+if __name__ == '__main__':
+    unittest.main()
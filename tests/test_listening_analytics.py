@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from listening_analytics import ListeningAnalytics
+from play_event import PlayEvent, to_epoch
+
+def play(end, seconds, track='Song', artist='Artist'):
+    # Timestamps mark when the play stopped, like Spotify's export
+    return PlayEvent(to_epoch(end), seconds * 1000, track, artist, 'Album', None)
+
+class TestListeningAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.events = [
+            # Session 1 on Monday 2024-01-01: two full plays and a skip
+            play(datetime(2024, 1, 1, 9, 3), 180),
+            play(datetime(2024, 1, 1, 9, 6), 180),
+            play(datetime(2024, 1, 1, 9, 6, 10), 10, track='Other'),
+            # Session 2 the same evening after a long gap, half a play
+            play(datetime(2024, 1, 1, 20, 1, 30), 90),
+            # Tuesday, then a gap day, then Thursday
+            play(datetime(2024, 1, 2, 12, 0), 180, artist='Someone Else'),
+            play(datetime(2024, 1, 4, 12, 0), 180)
+        ]
+
+    def test_sessions_skips_and_completion(self):
+        """Test the overall numbers for a small hand-built history"""
+        analytics = ListeningAnalytics(entity_type='artists')
+        analytics.add_many(self.events)
+        results = analytics.results()
+
+        self.assertEqual(results['plays'], 6)
+        self.assertEqual(results['skips'], 1)
+        self.assertEqual(results['sessions']['count'], 4)
+        # First session runs from 09:00:00 to 09:06:10
+        self.assertEqual(results['sessions']['longest_minutes'], round(370 / 60, 2))
+        # 'Song - Artist' completes 630s of 4 x 180s, everything else is its own longest play
+        self.assertEqual(results['average_completion'], round((630 / 720 * 4 + 1 + 1) / 6, 4))
+
+        self.assertEqual(results['heatmap']['Monday'][9], 3)
+        self.assertEqual(results['heatmap']['Monday'][20], 1)
+        self.assertEqual(results['heatmap']['Thursday'][12], 1)
+
+        self.assertEqual(results['streaks']['longest_days'], 2)
+        self.assertEqual(results['streaks']['longest_start'], '2024-01-01')
+        self.assertEqual(results['streaks']['last_streak_days'], 1)
+
+        self.assertEqual(list(results['artists']), ['Artist', 'Someone Else'])
+        self.assertEqual(results['artists']['Artist']['skip_rate'], 0.2)
+        self.assertEqual(results['artists']['Artist']['longest_streak_days'], 1)
+
+    def test_empty_and_invalid(self):
+        """Test an empty run and an unknown entity type"""
+        results = ListeningAnalytics().results()
+        self.assertEqual(results['plays'], 0)
+        self.assertEqual(results['streaks']['longest_days'], 0)
+
+        with self.assertRaises(ValueError):
+            ListeningAnalytics(entity_type='genres')
+
+if __name__ == '__main__':
+    unittest.main()
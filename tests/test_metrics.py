@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import SpotifyApiClient
+from metrics import METRICS, Metrics
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled_metrics_record_nothing(self):
+        """Test that every recording call is a no-op while metrics are off"""
+        metrics = Metrics()
+        items = [1, 2, 3]
+        metrics.increment('calls_total')
+        metrics.observe('request_seconds', 0.2)
+        with metrics.timer('block_seconds'):
+            pass
+
+        self.assertIs(metrics.timed_iter(items, 'stage'), items)
+        self.assertEqual(metrics.summary(), {'counters': {}, 'histograms': {}, 'cache_hit_rates': {}})
+
+    def test_counters_histograms_and_cache_hit_rates(self):
+        """Test counter totals, histogram quantiles and cache hit rates in the summary"""
+        metrics = Metrics(enabled=True)
+        metrics.increment('retries_total', reason='timeout')
+        metrics.increment('retries_total', 2, reason='timeout')
+        for seconds in (0.001, 0.002, 0.003, 0.2):
+            metrics.observe('request_seconds', seconds, endpoint='tracks')
+        metrics.cache_lookup('rollups', True)
+        metrics.cache_lookup('rollups', True)
+        metrics.cache_lookup('rollups', False)
+
+        summary = metrics.summary()
+        self.assertEqual(summary['counters']['retries_total'], [{'labels': {'reason': 'timeout'}, 'value': 3}])
+        histogram = summary['histograms']['request_seconds'][0]
+        self.assertEqual(histogram['count'], 4)
+        self.assertEqual(histogram['p50'], 0.005)
+        self.assertEqual(histogram['p95'], 0.2)
+        self.assertEqual(histogram['max'], 0.2)
+        self.assertEqual(summary['cache_hit_rates'], {'rollups': 0.6667})
+
+    def test_prometheus_output(self):
+        """Test the text exposition format with cumulative buckets and escaped labels"""
+        metrics = Metrics(enabled=True)
+        metrics.increment('requests_total', status='200')
+        metrics.observe('request_seconds', 0.03, endpoint='say "hi"')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'metrics.prom')
+            metrics.write(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{status="200"} 1', lines)
+        self.assertIn('request_seconds_bucket{endpoint="say \\"hi\\"",le="0.025"} 0', lines)
+        self.assertIn('request_seconds_bucket{endpoint="say \\"hi\\"",le="0.05"} 1', lines)
+        self.assertIn('request_seconds_bucket{endpoint="say \\"hi\\"",le="+Inf"} 1', lines)
+        self.assertIn('request_seconds_count{endpoint="say \\"hi\\""} 1', lines)
+
+    def test_timed_iter_excludes_upstream_time(self):
+        """Test that a downstream stage doesn't count the time spent in the stage it wraps"""
+        metrics = Metrics(enabled=True)
+        upstream = metrics.timed_iter(range(5), 'stage', stage='parse')
+        downstream = metrics.timed_iter((item * 2 for item in upstream), 'stage', exclude=upstream, stage='clean')
+        self.assertEqual(list(downstream), [0, 2, 4, 6, 8])
+
+        counters = metrics.summary()['counters']
+        self.assertEqual({row['labels']['stage']: row['value'] for row in counters['stage_items_total']}, {'parse': 5, 'clean': 5})
+        clean_seconds = next(row['value'] for row in counters['stage_seconds_total'] if row['labels']['stage'] == 'clean')
+        self.assertLessEqual(clean_seconds, downstream.seconds)
+
+    def test_api_requests_are_labelled_by_endpoint(self):
+        """Test that request timings and status counts use the endpoint with IDs removed"""
+        def responder(method, path, query, body):
+            return 200, {'id': path.rsplit('/', 1)[-1]}
+
+        METRICS.reset()
+        METRICS.enable()
+        try:
+            with MockSpotifyServer(responder) as server:
+                client = SpotifyApiClient(base_url=server.base_url, auth_manager=FakeAuthManager())
+                client.make_request('tracks/3BHFResGQiUvbYToUdaDQz')
+                client.make_request('tracks/246dkjvS1zLTtiykXe5h60')
+            summary = METRICS.summary()
+        finally:
+            METRICS.enabled = False
+            METRICS.reset()
+
+        histogram = summary['histograms']['spotify_api_request_seconds'][0]
+        self.assertEqual(histogram['labels'], {'endpoint': 'tracks/{id}', 'method': 'GET'})
+        self.assertEqual(histogram['count'], 2)
+        self.assertEqual(summary['counters']['spotify_api_requests_total'][0]['value'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from modify_data_exports import ModifyDataExports
+from play_event import PlayEvent
+
+def export_record(ts, track, artist='Artist'):
+    return {
+        'ts': ts,
+        'ms_played': 180000,
+        'master_metadata_track_name': track,
+        'master_metadata_album_artist_name': artist,
+        'master_metadata_album_album_name': 'Album',
+        'spotify_track_uri': None
+    }
+
+class TestModifyDataExports(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        raw_folder = os.path.join(self.temp_dir.name, 'raw')
+        os.makedirs(raw_folder)
+
+        # Two shards whose plays interleave, with a tie across them and one out of order within a shard
+        shards = {
+            'Streaming_History_Audio_2023.json': [
+                export_record('2023-01-03T10:00:00Z', 'C'),
+                export_record('2023-01-01T10:00:00Z', 'A'),
+                export_record('2023-01-05T10:00:00Z', 'Tie 1'),
+                export_record('2023-01-02T10:00:00Z', 'Dropped', artist='Bad Artist')
+            ],
+            'Streaming_History_Audio_2024.json': [
+                export_record('2023-01-02T10:00:00Z', 'B'),
+                export_record('2023-01-05T10:00:00Z', 'Tie 2'),
+                export_record('2023-01-04T10:00:00Z', 'D')
+            ]
+        }
+        for file_name, records in shards.items():
+            with open(os.path.join(raw_folder, file_name), 'w') as f:
+                json.dump(records, f)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def modify_data_exports(self, output_format='json'):
+        settings = {'ignore_artists': ['Bad Artist'], 'output_format': output_format}
+        with patch('modify_data_exports.Config') as config:
+            config.return_value.get.side_effect = lambda key, default=None: settings.get(key, default)
+            modify_data_exports = ModifyDataExports()
+        modify_data_exports.file_handler.export_path = self.temp_dir.name
+        modify_data_exports.file_handler.combine_spotify_exports()
+        return modify_data_exports
+
+    def test_serial_and_parallel_output_match(self):
+        """Test that both modes write plays sorted by time and report only their own run's filter counts"""
+        modify_data_exports = self.modify_data_exports()
+        expected_counts = {'null': 0, 'ignore_artists': 1, 'ignore_albums': 0, 'ignore_tracks': 0, 'kept': 6}
+
+        outputs = []
+        for process in (modify_data_exports.process_exports, modify_data_exports.process_exports_parallel, modify_data_exports.process_exports):
+            with patch('builtins.print'):
+                self.assertEqual(process(), expected_counts)
+            outputs.append(list(modify_data_exports.file_handler.iter_modified_data()))
+
+        self.assertEqual([item['Track'] for item in outputs[0]], ['A', 'B', 'C', 'D', 'Tie 1', 'Tie 2'])
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(outputs[2], outputs[0])
+
+    def test_serial_runs_are_merged(self):
+        """Test that plays spread over several sorted runs come out in one sorted file"""
+        modify_data_exports = self.modify_data_exports()
+        modify_data_exports.SORT_RUN_SIZE = 2
+        with patch('builtins.print'):
+            modify_data_exports.process_exports()
+
+        self.assertEqual([item['Track'] for item in modify_data_exports.file_handler.iter_modified_data()], ['A', 'B', 'C', 'D', 'Tie 1', 'Tie 2'])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, 'processed', 'runs')))
+
+    def test_append_skips_stored_plays(self):
+        """Test that appends find the last play without reading the history and don't count stored plays as kept"""
+        modify_data_exports = self.modify_data_exports('jsonl')
+        with patch('builtins.print'):
+            modify_data_exports.process_exports()
+
+        # A newer export overlapping the history
+        new_export = os.path.join(self.temp_dir.name, 'raw', 'Streaming_History_Audio_2025.json')
+        with open(new_export, 'w') as f:
+            json.dump([
+                export_record('2023-01-04T10:00:00Z', 'D'),
+                export_record('2023-01-07T10:00:00Z', 'F'),
+                export_record('2023-01-06T10:00:00Z', 'E'),
+                export_record('2023-01-08T10:00:00Z', 'Dropped', artist='Bad Artist')
+            ], f)
+
+        with patch('builtins.print'), patch.object(PlayEvent, 'from_processed', side_effect=AssertionError('history read')):
+            self.assertEqual(modify_data_exports.append_exports([new_export]), 2)
+        self.assertEqual(modify_data_exports.record_filter.hit_counts['kept'], 2)
+        self.assertEqual(modify_data_exports.record_filter.hit_counts['ignore_artists'], 1)
+        self.assertEqual([item['Track'] for item in modify_data_exports.file_handler.iter_modified_data()], ['A', 'B', 'C', 'D', 'Tie 1', 'Tie 2', 'E', 'F'])
+
+        # Without current rollups the last line of the JSON Lines file is used
+        os.remove(modify_data_exports.file_handler.processed_file_path('history_rollups.json'))
+        with patch('builtins.print'):
+            self.assertEqual(modify_data_exports.append_exports([new_export]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from zoneinfo import ZoneInfo
+
+from play_event import PlayEvent, get_utc_offset, parse_timestamp, to_epoch
+
+class TestPlayEvent(unittest.TestCase):
+    def setUp(self):
+        self.export_record = {
+            'ts': '2023-04-05T06:07:08Z',
+            'platform': 'ios',
+            'ms_played': 185432,
+            'master_metadata_track_name': 'Enough Is Enough',
+            'master_metadata_album_artist_name': 'Post Malone',
+            'master_metadata_album_album_name': 'Austin',
+            'spotify_track_uri': 'spotify:track:3BHFResGQiUvbYToUdaDQz'
+        }
+
+    def test_export_to_processed(self):
+        """Test that an export record converts to the processed layout"""
+        self.assertEqual(PlayEvent.from_export(self.export_record).to_processed(), {
+            'Timestamp': '2023-04-05 06:07:08',
+            'Epoch': 1680674828,
+            'Play Duration (s)': 185.43,
+            'Track': 'Enough Is Enough',
+            'Arist': 'Post Malone',
+            'Album': 'Austin',
+            'id': '3BHFResGQiUvbYToUdaDQz'
+        })
+
+    def test_processed_round_trip(self):
+        """Test that processed records survive a round trip and compare by integer timestamp"""
+        processed = PlayEvent.from_export(self.export_record).to_processed()
+        event = PlayEvent.from_processed(processed)
+
+        self.assertEqual(event.to_processed(), processed)
+        self.assertEqual(event.timestamp, to_epoch(datetime(2023, 4, 5, 6, 7, 8)))
+        self.assertEqual(event.played_at, datetime(2023, 4, 5, 6, 7, 8))
+
+    def test_parse_timestamp(self):
+        """Test the fixed-format parser against datetime for both layouts and the fallback"""
+        for value in ('1999-12-31 23:59:59', '2024-02-29T00:00:00Z', '2013-03-20 17:45:05'):
+            expected = to_epoch(datetime.strptime(value[:19].replace('T', ' '), '%Y-%m-%d %H:%M:%S'))
+            self.assertEqual(parse_timestamp(value), expected)
+
+        self.assertEqual(parse_timestamp('2023-04-05T06:07:08.250+00:00'), 1680674828)
+
+    def test_local_time_zone(self):
+        """Test that the UTC offset follows daylight saving time and shifts range comparisons"""
+        new_york = ZoneInfo('America/New_York')
+        self.assertEqual(get_utc_offset(parse_timestamp('2023-01-15 12:00:00'), new_york), -5 * 3600)
+        self.assertEqual(get_utc_offset(parse_timestamp('2023-07-15 12:00:00'), new_york), -4 * 3600)
+
+        # St. John's moves to daylight time at 05:30 UTC, mid-hour
+        st_johns = ZoneInfo('America/St_Johns')
+        self.assertEqual(get_utc_offset(parse_timestamp('2024-03-10 05:15:00'), st_johns), -12600)
+        self.assertEqual(get_utc_offset(parse_timestamp('2024-03-10 05:45:00'), st_johns), -9000)
+
+        # 02:00 UTC on Jan 1st is still New Year's Eve in New York
+        event = PlayEvent.from_export(dict(self.export_record, ts='2024-01-01T02:00:00Z'), new_york)
+        self.assertLess(event.local_timestamp, to_epoch(datetime(2024, 1, 1)))
+        self.assertEqual(PlayEvent.from_processed(event.to_processed()).utc_offset, -5 * 3600)
+
+    def test_strings_are_shared(self):
+        """Test that repeated plays share one copy of each string"""
+        first = PlayEvent.from_export(self.export_record)
+        second = PlayEvent.from_export(dict(self.export_record, master_metadata_album_artist_name=''.join(['Post ', 'Malone'])))
+
+        self.assertIs(first.artist, second.artist)
+        self.assertFalse(hasattr(first, '__dict__'))
+
+if __name__ == '__main__':
+    unittest.main()
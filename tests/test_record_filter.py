@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from record_filter import RecordFilter
+
+def record(track, artist, album):
+    return {
+        'master_metadata_track_name': track,
+        'master_metadata_album_artist_name': artist,
+        'master_metadata_album_album_name': album
+    }
+
+class TestRecordFilter(unittest.TestCase):
+    def test_null_and_ignore_rules(self):
+        """Test that each rule drops what it should and counts its hits"""
+        record_filter = RecordFilter(ignore_artists=['Bad Artist'], ignore_albums=['Bad Album'], ignore_tracks=['Bad Track'])
+        records = [
+            record(None, 'null', None),
+            record('Song', None, None),
+            record('Song', 'Bad Artist', 'Album'),
+            record('Song', 'Artist', 'Bad Album'),
+            record('Bad Track', 'Artist', 'Album'),
+            record('Song', 'Artist', 'Album')
+        ]
+
+        kept = list(record_filter.filter(records))
+
+        self.assertEqual(kept, records[1:2] + records[5:])
+        self.assertEqual(record_filter.hit_counts, {'null': 1, 'ignore_artists': 1, 'ignore_albums': 1, 'ignore_tracks': 1, 'kept': 2})
+
+    def test_case_insensitive_patterns(self):
+        """Test casefolded names and regex patterns"""
+        record_filter = RecordFilter(
+            ignore_artists=['SLEEP SOUNDS'],
+            ignore_patterns={'tracks': ['white noise', r'^rain\b']},
+            ignore_case=True
+        )
+
+        self.assertEqual(record_filter.ignored_by(record('Song', 'Sleep Sounds', 'Album')), 'ignore_artists')
+        self.assertEqual(record_filter.ignored_by(record('Pure White Noise 10h', 'Artist', 'Album')), 'ignore_tracks')
+        self.assertEqual(record_filter.ignored_by(record('Rain on a Tin Roof', 'Artist', 'Album')), 'ignore_tracks')
+        self.assertIsNone(record_filter.ignored_by(record('Purple Rain', 'Artist', 'Album')))
+
+        # Exact matching is the default
+        self.assertIsNone(RecordFilter(ignore_artists=['SLEEP SOUNDS']).ignored_by(record('Song', 'Sleep Sounds', 'Album')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import SpotifyApiClient
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+from response_cache import ResponseCache, request_key
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'http')
+        self.playlist_version = 'v1'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def responder(self, method, path, query, body):
+        if path == 'me':
+            return 200, {'id': 'user'}
+        if path == 'me/playlists':
+            etag = f'"{self.playlist_version}"'
+            if self.if_none_match(path) == etag:
+                return 304, None, {'ETag': etag}
+            return 200, {'items': [{'id': self.playlist_version}]}, {'ETag': etag}
+        return 200, {'path': path}
+
+    def if_none_match(self, path):
+        requests = [request for request in self.server.requests if request['path'] == path]
+        return requests[-1]['headers'].get('If-None-Match') if requests else None
+
+    def client(self, freshness=None):
+        return SpotifyApiClient(
+            base_url=self.server.base_url,
+            auth_manager=FakeAuthManager(),
+            response_cache=ResponseCache(self.cache_path, freshness)
+        )
+
+    def test_etag_revalidation_across_runs(self):
+        """Test that a stored response is revalidated with If-None-Match and a 304 is served from disk"""
+        with MockSpotifyServer(self.responder) as self.server:
+            self.assertEqual(self.client().make_request('me/playlists'), {'items': [{'id': 'v1'}]})
+
+            # A later run (new client, same cache folder) gets a 304 and the stored body
+            self.assertEqual(self.client().make_request('me/playlists', limit=50), {'items': [{'id': 'v1'}]})
+            self.assertEqual(self.client().make_request('me/playlists'), {'items': [{'id': 'v1'}]})
+            self.assertEqual(self.if_none_match('me/playlists'), '"v1"')
+
+            # Once the resource changes the new body replaces the stored one
+            self.playlist_version = 'v2'
+            self.assertEqual(self.client().make_request('me/playlists'), {'items': [{'id': 'v2'}]})
+
+        # limit=50 is a separate URL, so it was fetched in full the first time
+        self.assertEqual([request['headers'].get('If-None-Match') for request in self.server.requests], [None, None, '"v1"', '"v1"'])
+
+    def test_freshness_window_without_validators(self):
+        """Test that endpoints with a freshness window skip the request and others aren't stored"""
+        with MockSpotifyServer(self.responder) as self.server:
+            client = self.client({'me': 3600})
+            for _ in range(3):
+                self.assertEqual(client.make_request('me'), {'id': 'user'})
+                client.make_request('tracks/4iV5W9uYEdYUVa79Axb7Rh')
+
+            self.assertEqual([request['path'] for request in self.server.requests], ['me'] + ['tracks/4iV5W9uYEdYUVa79Axb7Rh'] * 3)
+
+            # With no window the profile is fetched every time
+            self.server.requests.clear()
+            self.client({}).make_request('me')
+            self.assertEqual(len(self.server.requests), 1)
+
+    def test_disabled_unless_configured(self):
+        """Test that no cache is created without http_cache.enabled and nothing is fresh by default"""
+        with patch('response_cache.Config.get', return_value=None):
+            self.assertIsNone(ResponseCache.from_config())
+        with patch('response_cache.Config.get', return_value={'enabled': True, 'path': self.cache_path, 'max_entries': 5}):
+            cache = ResponseCache.from_config()
+        self.assertEqual((cache.cache_path, cache.freshness, cache.max_entries), (self.cache_path, {}, 5))
+
+    def test_size_and_age_bounds(self):
+        """Test that the oldest entries are evicted beyond max_entries without rescanning the folder, and old ones expire"""
+        cache = ResponseCache(self.cache_path, max_entries=2, max_age_seconds=60)
+        keys = [request_key(f'https://api.spotify.com/v1/playlists/{number}') for number in range(4)]
+        with patch('response_cache.os.listdir', wraps=os.listdir) as listdir:
+            for number, key in enumerate(keys[:3]):
+                cache.store(key, 'playlists/{id}', {'ETag': f'"{number}"'}, {'number': number})
+        self.assertEqual(listdir.call_count, 1)
+
+        self.assertEqual(len(os.listdir(self.cache_path)), 2)
+        self.assertIsNone(cache.lookup(keys[0]))
+        # Revalidating keeps an entry, the least recently written one goes instead
+        cache.mark_validated(keys[1], cache.lookup(keys[1]))
+        cache.store(keys[3], 'playlists/{id}', {'ETag': '"3"'}, {'number': 3})
+        self.assertEqual(cache.lookup(keys[1])['data'], {'number': 1})
+        self.assertFalse(os.path.exists(cache._entry_path(keys[2])))
+
+        # An entry already in memory expires as well
+        with patch('response_cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.lookup(keys[1]))
+        self.assertFalse(os.path.exists(cache._entry_path(keys[1])))
+
+        # Across runs the oldest files are found by modification time
+        os.utime(cache._entry_path(keys[3]), (0, 0))
+        cache.store(keys[0], 'playlists/{id}', {'ETag': '"0"'}, {'number': 0})
+        reloaded = ResponseCache(self.cache_path, max_entries=1)
+        reloaded.store(keys[2], 'playlists/{id}', {'ETag': '"2"'}, {'number': 2})
+        self.assertEqual(sorted(os.listdir(self.cache_path)), [os.path.basename(reloaded._entry_path(keys[2]))])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import random
+import sys
+import unittest
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from sketches import SpaceSaving
+
+class TestSpaceSaving(unittest.TestCase):
+    def setUp(self):
+        # Zipf-like stream, a few heavy keys and a long tail
+        random.seed(11)
+        self.stream = [f"key {int(random.paretovariate(1.1))}" for _ in range(50000)]
+        self.exact = {}
+        for key in self.stream:
+            self.exact[key] = self.exact.get(key, 0) + 1
+
+    def assert_within_bounds(self, summary, total):
+        # Every tracked count is an overestimate by at most its error, and errors are at most total / capacity
+        for key, (count, error) in summary.counters.items():
+            self.assertLessEqual(error, total / summary.capacity)
+            self.assertGreaterEqual(count, self.exact.get(key, 0))
+            self.assertLessEqual(count - error, self.exact.get(key, 0))
+
+        # Anything above the error bound must be tracked
+        for key, count in self.exact.items():
+            if count > total / summary.capacity:
+                self.assertIn(key, summary.counters)
+
+    def test_error_bounds(self):
+        """Test the Space-Saving guarantees on a skewed stream"""
+        summary = SpaceSaving(epsilon=0.01)
+        summary.add_many(self.stream)
+
+        self.assertEqual(summary.capacity, 100)
+        self.assertEqual(summary.total, len(self.stream))
+        self.assertLessEqual(len(summary.counters), summary.capacity)
+        self.assert_within_bounds(summary, len(self.stream))
+
+        # The heaviest keys come out in the right order
+        exact_top = sorted(self.exact.items(), key=lambda x: x[1], reverse=True)[:3]
+        self.assertEqual([key for key, _, _ in summary.top(3)], [key for key, _ in exact_top])
+
+    def test_exact_when_capacity_fits(self):
+        """Test that counts are exact while there are fewer keys than the capacity"""
+        summary = SpaceSaving(capacity=len(self.exact))
+        summary.add_many(self.stream)
+        self.assertEqual({key: count for key, count, _ in summary.top(len(self.exact))}, self.exact)
+        self.assertTrue(all(error == 0 for _, _, error in summary.top(len(self.exact))))
+
+    def test_merge_shards(self):
+        """Test that merging per-shard summaries keeps the bound over the whole stream"""
+        shards = [self.stream[i::4] for i in range(4)]
+        summaries = []
+        for shard in shards:
+            summary = SpaceSaving(capacity=100)
+            summary.add_many(shard)
+            summaries.append(summary)
+
+        merged = summaries[0]
+        for summary in summaries[1:]:
+            merged = merged.merge(summary)
+
+        self.assertEqual(merged.total, len(self.stream))
+        self.assertLessEqual(len(merged.counters), merged.capacity)
+        self.assert_within_bounds(merged, len(self.stream))
+
+    def test_serialization_round_trip(self):
+        """Test that a summary can be saved and keeps counting after it's loaded"""
+        summary = SpaceSaving(capacity=50)
+        summary.add_many(self.stream[:25000])
+
+        restored = SpaceSaving.from_dict(summary.to_dict())
+        restored.add_many(self.stream[25000:])
+        summary.add_many(self.stream[25000:])
+
+        self.assertEqual(restored.total, summary.total)
+        self.assert_within_bounds(restored, len(self.stream))
+
+if __name__ == '__main__':
+    unittest.main()
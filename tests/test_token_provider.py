@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Add src to Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from api_handler import SpotifyApiClient, TokenProvider
+from mock_spotify_server import FakeAuthManager, MockSpotifyServer
+
+class TestTokenProvider(unittest.TestCase):
+    def responder(self, method, path, query, body):
+        return 200, {'path': path}
+
+    def authorized(self, server):
+        return [request['headers']['Authorization'] for request in server.requests]
+
+    def test_expiring_token_refreshed_once_across_workers(self):
+        """Test that a token about to expire is replaced before any request, by one refresh shared by every client"""
+        auth_manager = FakeAuthManager(expires_at=int(time.time()) + 30, refresh_delay=0.05)
+        provider = TokenProvider(auth_manager)
+
+        with MockSpotifyServer(self.responder) as server:
+            clients = [SpotifyApiClient(base_url=server.base_url, token_provider=provider) for _ in range(3)]
+            with ThreadPoolExecutor(max_workers=12) as executor:
+                list(executor.map(lambda i: clients[i % 3].make_request(f'tracks/{i}'), range(24)))
+
+        self.assertEqual(auth_manager.refreshes, 1)
+        self.assertEqual(auth_manager.cache_reads, 1)
+        self.assertEqual(set(self.authorized(server)), {'Bearer test-token-1'})
+
+    def test_rejected_token_retry_keeps_parameters(self):
+        """Test that a 401 refreshes the token and the retry sends the same limit and offset"""
+        auth_manager = FakeAuthManager()
+        rejected = []
+        def revoking_responder(method, path, query, body):
+            # The first token is revoked server-side before it expires
+            if not rejected:
+                rejected.append(query)
+                return 401, {'error': {'status': 401}}
+            return 200, {'items': [], 'query': query}
+
+        with MockSpotifyServer(revoking_responder) as server:
+            client = SpotifyApiClient(base_url=server.base_url, auth_manager=auth_manager)
+            response = client.make_request('me/tracks', limit=50, offset=100)
+
+        self.assertEqual(response['query'], {'limit': '50', 'offset': '100'})
+        self.assertEqual(self.authorized(server), ['Bearer test-token', 'Bearer test-token-1'])
+        self.assertEqual(auth_manager.refreshes, 1)
+
+    def test_stale_invalidate_is_ignored(self):
+        """Test that a 401 for a token that was already replaced doesn't refresh again"""
+        auth_manager = FakeAuthManager()
+        provider = TokenProvider(auth_manager)
+        old_token = provider.get_token()
+        provider.invalidate(old_token)
+        new_token = provider.get_token()
+
+        provider.invalidate(old_token)
+        self.assertEqual(provider.get_token(), new_token)
+        self.assertEqual(auth_manager.refreshes, 1)
+
+if __name__ == '__main__':
+    unittest.main()